@@ -0,0 +1,291 @@
+"""
+Admission control for upstream provider capacity
+Providers cap concurrent streaming sessions per account. Instead of
+connecting regardless and failing once the cap is hit, every session takes
+a slot here first:
+
+- per provider: at most `limits[provider]` sessions (0 = unlimited)
+- per tenant (API key): at most `tenant_limit` sessions across providers
+- a fair queue when full: a freed slot goes to the waiting tenant holding
+  the fewest slots of that provider relative to its weight, so under
+  overload tenants share capacity in proportion to their weights
+- a queue-time budget: a request whose expected wait is over budget is
+  rejected at once, and one still waiting when the budget runs out is
+  rejected then; both with a retry-after hint
+- spillover: a request may list other providers to use when its own is full
+"""
+
+import asyncio
+import math
+import time
+from collections import defaultdict
+
+OTHER_TENANTS = "other"  # outcome counts of tenants without a configured weight
+
+
+class Rejected(Exception):
+    """No slot within the queue-time budget"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request for `slots` slots of one of `providers`, in preference order"""
+
+    __slots__ = ("tenant", "weight", "providers", "slots", "enqueued_at", "future")
+
+    def __init__(self, tenant, weight, providers, slots, now, future):
+        self.tenant = tenant
+        self.weight = weight
+        self.providers = providers
+        self.slots = slots
+        self.enqueued_at = now
+        self.future = future
+
+
+class Grant:
+    """Slots held by a session until released"""
+
+    __slots__ = ("tenant", "provider", "slots", "waited")
+
+    def __init__(self, tenant, provider, slots, waited):
+        self.tenant = tenant
+        self.provider = provider
+        self.slots = slots
+        self.waited = waited
+
+
+class AdmissionController:
+    """Slots per provider and tenant, handed out through a weighted fair queue
+
+    `weights` maps tenants to their share (default 1). Tenants are whatever
+    API key a client sends, so only those in `weights` get outcome counts
+    of their own; the rest are counted together as "other", and slot
+    counts are dropped once a tenant holds none. Wait times are
+    recorded into `wait_histograms[provider]` if given. The expected wait is
+    the number of requests ahead times the recent interval between slot
+    releases of the provider; until a release has been seen, requests just
+    wait up to `queue_seconds`.
+    """
+
+    def __init__(self, limits: dict, tenant_limit=0, weights=None, queue_seconds=5.0,
+                 max_retry_after=60, wait_histograms=None):
+        self.limits = limits
+        self.tenant_limit = tenant_limit
+        self.weights = weights or {}
+        self.queue_seconds = queue_seconds
+        self.max_retry_after = max_retry_after
+        self.wait_histograms = wait_histograms or {}
+        self.active = {name: 0 for name in limits}
+        self.held = {name: {} for name in limits}  # provider -> tenant -> slots
+        self.tenant_active = {}
+        self.queue = []
+        self.release_interval = {name: None for name in limits}  # EWMA, seconds
+        self.released_at = {name: None for name in limits}
+
+        self.outcomes = defaultdict(int)  # (provider, outcome) -> count
+        self.tenants = defaultdict(lambda: defaultdict(int))  # tenant or "other" -> outcome -> count
+
+    def counted_as(self, tenant) -> str:
+        """Key of `tenant` in the outcome counts"""
+        return tenant if tenant in self.weights else OTHER_TENANTS
+
+    def free(self, provider) -> float:
+        limit = self.limits[provider]
+        return limit - self.active[provider] if limit else math.inf
+
+    def eligible(self, ticket: Ticket, provider) -> bool:
+        """Whether `ticket` may take `provider` now: there is room, its tenant
+        is under its limit, and every provider it prefers is full"""
+        if self.free(provider) < ticket.slots:
+            return False
+        if self.tenant_limit and self.tenant_active.get(ticket.tenant, 0) + ticket.slots > self.tenant_limit:
+            return False
+        for preferred in ticket.providers:
+            if preferred == provider:
+                return True
+            if self.free(preferred) >= ticket.slots:
+                return False
+        return False
+
+    def dispatch(self):
+        """Grant queued tickets while slots are free, most under-served tenant first"""
+        granted = True
+        while granted and self.queue:
+            granted = False
+            for provider in self.limits:
+                candidates = [t for t in self.queue if provider in t.providers and self.eligible(t, provider)]
+                if not candidates:
+                    continue
+                ticket = min(candidates, key=lambda t: (
+                    t.providers.index(provider) > 0,  # spillover after native requests
+                    self.held[provider].get(t.tenant, 0) / t.weight,
+                    t.enqueued_at,
+                ))
+                self.queue.remove(ticket)
+                self.grant(ticket, provider)
+                granted = True
+
+    def grant(self, ticket: Ticket, provider):
+        self.active[provider] += ticket.slots
+        held = self.held[provider]
+        held[ticket.tenant] = held.get(ticket.tenant, 0) + ticket.slots
+        self.tenant_active[ticket.tenant] = self.tenant_active.get(ticket.tenant, 0) + ticket.slots
+        waited = time.monotonic() - ticket.enqueued_at
+        outcome = "admitted" if provider == ticket.providers[0] else "spilled"
+        self.outcomes[(ticket.providers[0], outcome)] += 1
+        self.tenants[self.counted_as(ticket.tenant)][outcome] += 1
+        if provider in self.wait_histograms:
+            self.wait_histograms[provider].observe(waited)
+        ticket.future.set_result(Grant(ticket.tenant, provider, ticket.slots, waited))
+
+    def expected_wait(self, providers) -> float:
+        """Rough wait for a new request, None if there is nothing to go by"""
+        waits = []
+        for provider in providers:
+            interval = self.release_interval[provider]
+            if interval is None:
+                return None
+            ahead = sum(1 for t in self.queue if provider in t.providers)
+            waits.append((ahead + 1) * interval)
+        return min(waits)
+
+    def retry_after(self, providers) -> int:
+        wait = self.expected_wait(providers)
+        if wait is None:
+            wait = self.queue_seconds
+        return max(1, min(self.max_retry_after, math.ceil(wait)))
+
+    def reject(self, tenant, providers, reason):
+        self.outcomes[(providers[0], "rejected")] += 1
+        self.tenants[self.counted_as(tenant)]["rejected"] += 1
+        return Rejected(reason, self.retry_after(providers))
+
+    def try_acquire(self, tenant, provider):
+        """A slot of `provider` if one is free for this tenant now, else None"""
+        future = asyncio.get_running_loop().create_future()
+        ticket = Ticket(tenant, self.weights.get(tenant, 1.0), (provider,), 1, time.monotonic(), future)
+        self.queue.append(ticket)
+        self.dispatch()
+        if future.done():
+            return future.result()
+        self.queue.remove(ticket)
+        return None
+
+    def unhold(self, grant: Grant):
+        self.active[grant.provider] -= grant.slots
+        for counts in (self.held[grant.provider], self.tenant_active):
+            counts[grant.tenant] -= grant.slots
+            if not counts[grant.tenant]:
+                del counts[grant.tenant]
+
+    def give_back(self, grant: Grant):
+        """Undo a grant that was never used: not an admission, nor a release"""
+        self.unhold(grant)
+        self.outcomes[(grant.provider, "admitted")] -= 1
+        self.tenants[self.counted_as(grant.tenant)]["admitted"] -= 1
+        self.dispatch()
+
+    async def acquire_all(self, tenant, providers) -> list:
+        """One slot of every one of `providers`, all or none; raises Rejected
+
+        Slots are never held while queueing for another provider, where they
+        would count against the fair share of other tenants: when one is
+        full, the slots taken so far are given back, the request queues for
+        that provider alone and then takes the others if they are free.
+        """
+        deadline = time.monotonic() + self.queue_seconds
+        grants = []
+        while True:
+            for provider in providers:
+                if any(grant.provider == provider for grant in grants):
+                    continue
+                grant = self.try_acquire(tenant, provider)
+                if grant is None:
+                    break
+                grants.append(grant)
+            else:
+                return grants
+            for grant in grants:
+                self.give_back(grant)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self.reject(tenant, tuple(providers), "all sessions busy")
+            grants = [await self.acquire(tenant, [provider], queue_seconds=remaining)]
+
+    async def acquire(self, tenant, providers, slots=1, queue_seconds=None) -> Grant:
+        """Wait for `slots` slots of one of `providers`; raises Rejected
+
+        The wait is bounded by `queue_seconds` (default: the configured budget).
+        """
+        if queue_seconds is None:
+            queue_seconds = self.queue_seconds
+        providers = tuple(providers)
+        for provider in providers:
+            limit = self.limits[provider]
+            if (limit and slots > limit) or (self.tenant_limit and slots > self.tenant_limit):
+                raise self.reject(tenant, providers, f"{slots} sessions exceed the limit")
+        future = asyncio.get_running_loop().create_future()
+        ticket = Ticket(tenant, self.weights.get(tenant, 1.0), providers, slots, time.monotonic(), future)
+        self.queue.append(ticket)
+        self.dispatch()
+        if future.done():
+            return future.result()
+
+        expected = self.expected_wait(providers)
+        if expected is not None and expected > queue_seconds:
+            self.queue.remove(ticket)
+            raise self.reject(tenant, providers, "all sessions busy")
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), queue_seconds)
+        except asyncio.TimeoutError:
+            if future.done():
+                return future.result()
+            self.queue.remove(ticket)
+            raise self.reject(tenant, providers, "all sessions busy")
+        except asyncio.CancelledError:
+            # The waiting session went away; give back a slot granted meanwhile
+            if future.done():
+                self.release(future.result())
+            else:
+                self.queue.remove(ticket)
+            raise
+
+    def release(self, grant: Grant):
+        provider = grant.provider
+        self.unhold(grant)
+        now = time.monotonic()
+        last = self.released_at[provider]
+        if last is not None:
+            interval = (now - last) / grant.slots
+            previous = self.release_interval[provider]
+            self.release_interval[provider] = interval if previous is None else 0.8 * previous + 0.2 * interval
+        self.released_at[provider] = now
+        self.dispatch()
+
+    def waiting(self, provider) -> int:
+        return sum(1 for t in self.queue if t.providers[0] == provider)
+
+    def stats(self) -> dict:
+        active = defaultdict(int)
+        for tenant, slots in self.tenant_active.items():
+            active[self.counted_as(tenant)] += slots
+        return {
+            "providers": {
+                name: {
+                    "limit": self.limits[name],
+                    "active": self.active[name],
+                    "waiting": self.waiting(name),
+                    "admitted": self.outcomes[(name, "admitted")],
+                    "spilled": self.outcomes[(name, "spilled")],
+                    "rejected": self.outcomes[(name, "rejected")],
+                }
+                for name in self.limits
+            },
+            "tenants": {
+                tenant: dict(counts, active=active[tenant])
+                for tenant, counts in self.tenants.items()
+            },
+        }
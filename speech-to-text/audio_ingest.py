@@ -0,0 +1,283 @@
+"""
+Inbound audio ingest: downmix, resample and re-frame
+Clients may send 44.1/48 kHz and stereo PCM16 in whatever frame size their
+audio stack produces. Providers want 16 kHz mono PCM16 in packets of a fixed
+duration. Working buffers are preallocated and reused across frames; the
+only per-packet allocation is the outgoing bytes object itself.
+"""
+
+from math import gcd
+
+import numpy as np
+
+BYTES_PER_SAMPLE = 2
+
+
+def lowpass_kernel(up: int, down: int, half_taps_per_phase=10, beta=5.0):
+    """Windowed-sinc anti-aliasing filter for rational resampling by up/down"""
+    max_rate = max(up, down)
+    half_len = half_taps_per_phase * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 1.0 / max_rate
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(2 * half_len + 1, beta)
+    return h * up
+
+
+class PolyphaseResampler:
+    """Streaming rational resampler (NumPy polyphase FIR)
+
+    Output sample n sits at position n*down on the upsampled grid, i.e. just
+    after input sample i = n*down // up using filter phase p = n*down % up.
+    Only the taps of that phase are evaluated, so nothing is ever computed at
+    the upsampled rate.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int):
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        h = lowpass_kernel(self.up, self.down)
+        self.taps = -(-len(h) // self.up)
+        h = np.concatenate([h, np.zeros(self.taps * self.up - len(h))])
+        # phases[p, k] multiplies x[i - k]
+        self.phases = h.reshape(self.taps, self.up).T.astype(np.float32).copy()
+        self.history = self.taps - 1
+        self.consumed = 0      # input samples before the current buffer start
+        self.next_output = 0   # index of the next output sample
+        self.buffer = np.zeros(self.history, dtype=np.float32)
+        self.fill = self.history
+        self.tap_offsets = np.arange(self.taps)
+        self.gathered = np.empty((0, self.taps), dtype=np.float32)
+        self.weights = np.empty((0, self.taps), dtype=np.float32)
+        self.out = np.empty(0, dtype=np.float32)
+
+    def reserve(self, samples: int, outputs: int):
+        """Grow the working buffers if this chunk is larger than any before"""
+        if self.fill + samples > len(self.buffer):
+            grown = np.zeros(self.fill + samples, dtype=np.float32)
+            grown[:self.fill] = self.buffer[:self.fill]
+            self.buffer = grown
+        if outputs > len(self.out):
+            self.gathered = np.empty((outputs, self.taps), dtype=np.float32)
+            self.weights = np.empty((outputs, self.taps), dtype=np.float32)
+            self.out = np.empty(outputs, dtype=np.float32)
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Resample a mono float32 chunk; returns a view into a reused buffer"""
+        end = self.consumed + self.fill - self.history + len(x)  # inputs seen so far
+        # Outputs whose newest input sample has arrived
+        last = (end * self.up - 1) // self.down + 1 if end else 0
+        count = max(0, last - self.next_output)
+        self.reserve(len(x), count)
+        self.buffer[self.fill:self.fill + len(x)] = x
+        self.fill += len(x)
+
+        if count:
+            n = np.arange(self.next_output, last)
+            t = n * self.down
+            newest = t // self.up - self.consumed + self.history
+            idx = newest[:, None] - self.tap_offsets[None, :]
+            gathered = self.gathered[:count]
+            weights = self.weights[:count]
+            np.take(self.buffer, idx, out=gathered)
+            np.take(self.phases, t % self.up, axis=0, out=weights)
+            np.multiply(gathered, weights, out=gathered)
+            out = gathered.sum(axis=1, out=self.out[:count])
+            self.next_output = last
+        else:
+            out = self.out[:0]
+
+        # Keep only the history the next chunk needs
+        keep_from = self.fill - self.history
+        self.buffer[:self.history] = self.buffer[keep_from:self.fill]
+        self.consumed += keep_from
+        self.fill = self.history
+        return out
+
+
+class Reframer:
+    """Re-packs a PCM16 byte stream into fixed-size packets
+
+    The last, partial packet is zero-padded to `min_bytes`: providers reject
+    packets shorter than their minimum duration.
+    """
+
+    def __init__(self, packet_bytes: int, min_bytes: int = 0):
+        self.packet_bytes = packet_bytes
+        self.min_bytes = min_bytes
+        self.buffer = bytearray(packet_bytes * 8)
+        self.view = memoryview(self.buffer)
+        self.fill = 0
+
+    def write(self, data) -> list:
+        """Append bytes-like `data`, return the complete packets"""
+        size = len(data)
+        if self.fill + size > len(self.buffer):
+            grown = bytearray(self.fill + size + self.packet_bytes)
+            grown[:self.fill] = self.view[:self.fill]
+            self.buffer = grown
+            self.view = memoryview(grown)
+        self.view[self.fill:self.fill + size] = data
+        self.fill += size
+
+        packets = []
+        start = 0
+        while self.fill - start >= self.packet_bytes:
+            packets.append(bytes(self.view[start:start + self.packet_bytes]))
+            start += self.packet_bytes
+        if start:
+            remainder = self.fill - start
+            self.view[:remainder] = self.view[start:self.fill]
+            self.fill = remainder
+        return packets
+
+    def flush(self) -> list:
+        """Emit whatever partial packet is left, padded with silence"""
+        if not self.fill:
+            return []
+        packet = bytes(self.view[:self.fill]) + bytes(max(0, self.min_bytes - self.fill))
+        self.fill = 0
+        return [packet]
+
+
+class AudioIngest:
+    """Turns client PCM16 into provider-ready 16 kHz mono packets
+
+    `min_packet_ms` (default `packet_ms`) is the shortest packet the
+    provider accepts, the length the final packet is padded to.
+    """
+
+    def __init__(self, in_rate=16000, channels=1, out_rate=16000, packet_ms=50, min_packet_ms=None):
+        self.in_rate = in_rate
+        self.channels = channels
+        self.out_rate = out_rate
+        self.frame_bytes = channels * BYTES_PER_SAMPLE
+        self.passthrough = in_rate == out_rate and channels == 1
+        self.resampler = None if in_rate == out_rate else PolyphaseResampler(in_rate, out_rate)
+        self.reframer = Reframer(
+            out_rate * packet_ms // 1000 * BYTES_PER_SAMPLE,
+            out_rate * (min_packet_ms or packet_ms) // 1000 * BYTES_PER_SAMPLE
+        )
+        self.carry = bytearray()
+        self.mono = np.empty(0, dtype=np.float32)
+        self.pcm = np.empty(0, dtype="<i2")
+
+    def process(self, chunk: bytes) -> list:
+        """Ingest one client frame, return the packets ready to send"""
+        if self.passthrough:
+            return self.reframer.write(chunk)
+
+        if self.carry:
+            self.carry += chunk
+            chunk = self.carry
+        usable = len(chunk) - len(chunk) % self.frame_bytes
+        frames = np.frombuffer(chunk, dtype="<i2", count=usable // BYTES_PER_SAMPLE)
+        frames = frames.reshape(-1, self.channels)
+        self.carry = bytearray(chunk[usable:])
+
+        if self.channels == 1:
+            return self.process_samples(frames[:, 0])
+        count = len(frames)
+        if count > len(self.mono):
+            self.mono = np.empty(count, dtype=np.float32)
+        mono = self.mono[:count]
+        np.mean(frames, axis=1, dtype=np.float32, out=mono)
+        return self.resample(mono)
+
+    def process_samples(self, samples: np.ndarray) -> list:
+        """Ingest mono int16 samples, e.g. a strided view of one channel"""
+        if self.resampler is None:
+            return self.reframer.write(np.ascontiguousarray(samples))
+        count = len(samples)
+        if count > len(self.mono):
+            self.mono = np.empty(count, dtype=np.float32)
+        mono = self.mono[:count]
+        mono[:] = samples
+        return self.resample(mono)
+
+    def resample(self, mono: np.ndarray) -> list:
+        samples = self.resampler.process(mono) if self.resampler else mono
+        if len(samples) > len(self.pcm):
+            self.pcm = np.empty(len(samples), dtype="<i2")
+        pcm = self.pcm[:len(samples)]
+        np.clip(samples, -32768, 32767, out=samples)
+        np.rint(samples, out=samples)
+        pcm[:] = samples
+        return self.reframer.write(memoryview(pcm).cast("B"))
+
+    def flush(self) -> list:
+        return self.reframer.flush()
+
+    def set_packet_ms(self, packet_ms: int):
+        """Re-frame into packets of `packet_ms` from the next one on"""
+        self.reframer.packet_bytes = self.out_rate * packet_ms // 1000 * BYTES_PER_SAMPLE
+
+
+class ChannelSplitter:
+    """Splits interleaved N-channel PCM16 into one mono packet stream per channel
+
+    The client frame is read as an (N, samples) strided view of itself, so
+    no deinterleaved copy is made. When no resampling is needed, one
+    assignment copies every channel straight into a shared per-channel
+    packet buffer; otherwise each channel's view feeds its own resampler.
+    """
+
+    def __init__(self, in_rate=16000, channels=2, out_rate=16000, packet_ms=50, min_packet_ms=None):
+        self.channels = channels
+        self.frame_bytes = channels * BYTES_PER_SAMPLE
+        self.packet_samples = out_rate * packet_ms // 1000
+        self.min_samples = out_rate * (min_packet_ms or packet_ms) // 1000
+        self.carry = bytearray()
+        self.ingests = None
+        if in_rate != out_rate:
+            self.ingests = [AudioIngest(in_rate, 1, out_rate, packet_ms, min_packet_ms)
+                            for _ in range(channels)]
+        self.pending = np.empty((channels, self.packet_samples * 8), dtype="<i2")
+        self.fill = 0
+
+    def process(self, chunk: bytes) -> list:
+        """Ingest one client frame, return the packets ready per channel"""
+        if self.carry:
+            self.carry += chunk
+            chunk = self.carry
+        usable = len(chunk) - len(chunk) % self.frame_bytes
+        frames = np.frombuffer(chunk, dtype="<i2", count=usable // BYTES_PER_SAMPLE)
+        by_channel = frames.reshape(-1, self.channels).T
+        if self.ingests:
+            packets = [ingest.process_samples(samples)
+                       for samples, ingest in zip(by_channel, self.ingests)]
+        else:
+            packets = self.write(by_channel)
+        self.carry = bytearray(chunk[usable:])
+        return packets
+
+    def write(self, by_channel: np.ndarray) -> list:
+        count = by_channel.shape[1]
+        if self.fill + count > self.pending.shape[1]:
+            grown = np.empty((self.channels, self.fill + count + self.packet_samples), dtype="<i2")
+            grown[:, :self.fill] = self.pending[:, :self.fill]
+            self.pending = grown
+        self.pending[:, self.fill:self.fill + count] = by_channel
+        self.fill += count
+
+        packets = [[] for _ in range(self.channels)]
+        start = 0
+        while self.fill - start >= self.packet_samples:
+            for c in range(self.channels):
+                packets[c].append(self.pending[c, start:start + self.packet_samples].tobytes())
+            start += self.packet_samples
+        if start:
+            remainder = self.fill - start
+            self.pending[:, :remainder] = self.pending[:, start:self.fill]
+            self.fill = remainder
+        return packets
+
+    def flush(self) -> list:
+        if self.ingests:
+            return [ingest.flush() for ingest in self.ingests]
+        if not self.fill:
+            return [[] for _ in range(self.channels)]
+        padding = bytes(max(0, self.min_samples - self.fill) * BYTES_PER_SAMPLE)
+        packets = [[self.pending[c, :self.fill].tobytes() + padding] for c in range(self.channels)]
+        self.fill = 0
+        return packets
@@ -0,0 +1,141 @@
+"""
+Audio sources for the test clients
+A source yields (frame, captured_at) pairs as a microphone would: each frame
+is handed over once its last sample exists, stamped with that moment on the
+time.monotonic() clock. Clients send frames as they arrive and measure
+transcript latency from the capture time of the audio it covers.
+
+- MicSource: PyAudio in callback mode; the capture thread hands frames to
+  the event loop through an asyncio queue, so nothing blocks the loop
+- WavSource: a PCM16 WAV file, replayed in real time
+- SyntheticSource: tone bursts separated by pauses
+- BufferSource: any byte buffer, e.g. audio pre-encoded for the uplink
+"""
+
+import asyncio
+import time
+import wave
+
+import numpy as np
+
+from uplink_codecs import BITS, PCM16
+
+try:
+    import pyaudio
+except ImportError:  # Headless hosts (e.g. load_test.py) don't need a microphone
+    pyaudio = None
+
+SAMPLE_RATE = 16000
+FRAMES_PER_BUFFER = 3200  # 0.2 seconds at 16kHz
+
+
+def synthetic_speech(seconds: float, sample_rate=SAMPLE_RATE) -> bytes:
+    """Tone bursts separated by pauses, for runs without a WAV file"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = (t % 3.0) < 2.4
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * voiced
+    return (signal * 32767).astype("<i2").tobytes()
+
+
+class BufferSource:
+    """Frames of a byte buffer, released at the pace they would be recorded"""
+
+    def __init__(self, data: bytes, sample_rate=SAMPLE_RATE, channels=1,
+                 frames_per_buffer=FRAMES_PER_BUFFER, encoding=PCM16):
+        self.data = data
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoding = encoding
+        self.frame_seconds = frames_per_buffer / sample_rate
+        self.frame_bytes = frames_per_buffer * channels * BITS[encoding] // 8
+        self.stopped = False
+
+    def open(self):
+        pass
+
+    def stop(self):
+        self.stopped = True
+
+    async def frames(self):
+        start = time.monotonic()
+        for i, offset in enumerate(range(0, len(self.data), self.frame_bytes)):
+            # Frame i is complete one frame after it starts
+            captured_at = start + (i + 1) * self.frame_seconds
+            delay = captured_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.stopped:
+                return
+            yield self.data[offset:offset + self.frame_bytes], captured_at
+
+
+class SyntheticSource(BufferSource):
+    def __init__(self, seconds: float, frames_per_buffer=FRAMES_PER_BUFFER):
+        super().__init__(synthetic_speech(seconds), frames_per_buffer=frames_per_buffer)
+
+
+class WavSource(BufferSource):
+    """A PCM16 WAV file at its own rate and channel count"""
+
+    def __init__(self, path, frames_per_buffer=FRAMES_PER_BUFFER):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: expected 16-bit PCM")
+            rate, channels = wav.getframerate(), wav.getnchannels()
+            data = wav.readframes(wav.getnframes())
+        super().__init__(data, rate, channels, frames_per_buffer)
+
+
+class MicSource:
+    """Microphone frames from a PyAudio callback"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, channels=1, frames_per_buffer=FRAMES_PER_BUFFER):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoding = PCM16
+        self.frames_per_buffer = frames_per_buffer
+        self.frame_seconds = frames_per_buffer / sample_rate
+        self.audio = None
+        self.stream = None
+        self.queue = None
+
+    def open(self):
+        """Start capturing; call from the event loop that reads frames()"""
+        if pyaudio is None:
+            raise RuntimeError("PyAudio is not installed")
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+        def callback(in_data, frame_count, time_info, status):
+            # Capture thread: stamp and hand over, never touch the loop directly
+            loop.call_soon_threadsafe(self.queue.put_nowait, (in_data, time.monotonic()))
+            return None, pyaudio.paContinue
+
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(
+            input=True,
+            frames_per_buffer=self.frames_per_buffer,
+            channels=self.channels,
+            format=pyaudio.paInt16,
+            rate=self.sample_rate,
+            stream_callback=callback,
+        )
+
+    def stop(self):
+        """Stop capturing; frames() ends after the frames already captured"""
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.audio:
+            self.audio.terminate()
+            self.audio = None
+        if self.queue:
+            self.queue.put_nowait(None)
+
+    async def frames(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            yield item
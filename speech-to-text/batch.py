@@ -0,0 +1,213 @@
+"""
+Offline transcription of recorded audio
+An uploaded WAV or raw PCM16 file is memory-mapped, split into chunks at
+silences and the chunks are streamed faster than real time over several
+concurrent upstream sessions, bounded per provider. Each chunk's finals come
+back on its own clock and are shifted onto the file's clock and stitched in
+order. Pages are released once a chunk is done, so RSS stays flat however
+long the recording is.
+"""
+
+import asyncio
+import mmap
+import struct
+import time
+
+import numpy as np
+
+from audio_ingest import AudioIngest
+
+WINDOW_MS = 20          # silence search resolution
+BLOCK_SECONDS = 1.0     # audio handed to the ingest stage at a time
+
+
+def parse_wav(data) -> tuple:
+    """(data offset, data size, sample rate, channels) of a PCM16 WAV"""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a WAV file")
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(data):
+        chunk_id = bytes(data[pos:pos + 4])
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(data):
+                raise ValueError("truncated WAV fmt chunk")
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", data, body)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE
+            if audio_format not in (1, 0xFFFE) or bits != 16:
+                raise ValueError(f"unsupported WAV encoding (format {audio_format}, {bits} bit)")
+            fmt = (sample_rate, channels)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data before fmt chunk")
+            # Streamed WAVs may leave the size unset
+            size = min(size, len(data) - body)
+            return (body, size) + fmt
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+class AudioFile:
+    """PCM16 audio in a memory-mapped file"""
+
+    def __init__(self, fileobj, sample_rate=16000, channels=1):
+        self.mm = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self.mm[:4] == b"RIFF":
+                offset, size, sample_rate, channels = parse_wav(self.mm)
+            else:
+                offset, size = 0, len(self.mm)
+            if not sample_rate or not channels:
+                raise ValueError("invalid audio format")
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                self.mm.madvise(mmap.MADV_SEQUENTIAL)
+            self.offset = offset
+            self.sample_rate = sample_rate
+            self.channels = channels
+            self.frame_bytes = 2 * channels
+            self.frames = size // self.frame_bytes
+            if not self.frames:
+                raise ValueError("no audio")
+        except BaseException:
+            self.mm.close()
+            raise
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def view(self, start, end) -> memoryview:
+        """Frames [start, end) without copying; release() it after use"""
+        return memoryview(self.mm)[self.offset + start * self.frame_bytes:
+                                   self.offset + end * self.frame_bytes]
+
+    def release(self, start, end):
+        """Drop the pages of frames [start, end) from this process"""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        first = self.offset + start * self.frame_bytes
+        last = self.offset + end * self.frame_bytes
+        first -= first % mmap.PAGESIZE
+        if last > first:
+            self.mm.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+    def close(self):
+        self.mm.close()
+
+
+def split_at_silence(audio: AudioFile, min_seconds=20.0, max_seconds=40.0) -> list:
+    """(start, end) frame ranges, each cut at the quietest 20 ms between
+    `min_seconds` and `max_seconds` into the chunk"""
+    window = audio.sample_rate * WINDOW_MS // 1000
+    min_frames = int(min_seconds * audio.sample_rate)
+    max_frames = int(max_seconds * audio.sample_rate)
+    cuts = [0]
+    while audio.frames - cuts[-1] > max_frames:
+        lo = cuts[-1] + min_frames
+        hi = cuts[-1] + max_frames
+        count = (hi - lo) // window
+        if count < 1:
+            # Bounds closer than one window: nothing to search, cut at the limit
+            cuts.append(hi)
+            continue
+        view = audio.view(lo, lo + count * window)
+        samples = np.frombuffer(view, dtype="<i2").astype(np.float32)
+        energy = np.square(samples).reshape(count, -1).mean(axis=1)
+        del samples
+        view.release()
+        audio.release(lo, hi)
+        cuts.append(lo + int(np.argmin(energy)) * window + window // 2)
+    cuts.append(audio.frames)
+    return list(zip(cuts, cuts[1:]))
+
+
+async def transcribe_chunk(provider, audio: AudioFile, start, end, speed) -> list:
+    """Finals for frames [start, end), on the file's clock"""
+    ingest = AudioIngest(audio.sample_rate, audio.channels, provider.sample_rate, provider.packet_ms,
+                         provider.min_packet_ms)
+    results = []
+    ws = await provider.connect()
+
+    async def send():
+        # Paced at `speed` x real time (0 = as fast as the socket takes it)
+        started = time.monotonic()
+        sent_seconds = 0.0
+        block = int(BLOCK_SECONDS * audio.sample_rate)
+        for pos in range(start, end, block):
+            view = audio.view(pos, min(pos + block, end))
+            packets = ingest.process(view)
+            view.release()
+            for packet in packets:
+                await ws.send(packet)
+            sent_seconds += (min(pos + block, end) - pos) / audio.sample_rate
+            if speed:
+                ahead = sent_seconds / speed - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        for packet in ingest.flush():
+            await ws.send(packet)
+        await ws.send(provider.terminate_message)
+
+    async def receive():
+        # The provider closes the socket after its last final
+        async for message in ws:
+            for payload, _ in provider.translate(message):
+                result = provider.normalize(payload)
+                if result and result["is_final"]:
+                    results.append(result)
+
+    sender = asyncio.create_task(send())
+    try:
+        await receive()
+        await sender
+    finally:
+        sender.cancel()
+        await ws.close()
+        audio.release(start, end)
+
+    offset = start / audio.sample_rate
+    return [
+        {
+            "start": round(offset + result["start_ms"] / 1000, 3),
+            "end": round(offset + result["end_ms"] / 1000, 3),
+            "text": result["text"],
+        }
+        for result in sorted(results, key=lambda result: result["start_ms"])
+    ]
+
+
+async def transcribe(audio: AudioFile, provider, limiter: asyncio.Semaphore,
+                     min_chunk_seconds=20.0, max_chunk_seconds=40.0, speed=4.0,
+                     attempts=2) -> dict:
+    """Transcribe a whole recording over concurrent upstream sessions
+
+    `limiter` bounds how many sessions are open to the provider at once,
+    across all requests sharing it.
+    """
+    started = time.perf_counter()
+    chunks = await asyncio.to_thread(split_at_silence, audio, min_chunk_seconds, max_chunk_seconds)
+
+    async def run(start, end):
+        async with limiter:
+            for attempt in range(attempts):
+                try:
+                    return await transcribe_chunk(provider, audio, start, end, speed)
+                except Exception:
+                    if attempt == attempts - 1:
+                        raise
+
+    parts = await asyncio.gather(*(run(start, end) for start, end in chunks))
+    segments = [segment for part in parts for segment in part]
+    elapsed = time.perf_counter() - started
+    return {
+        "provider": provider.name,
+        "duration": round(audio.duration, 3),
+        "chunks": len(chunks),
+        "elapsed": round(elapsed, 3),
+        "speedup": round(audio.duration / elapsed, 2) if elapsed else None,
+        "text": " ".join(segment["text"] for segment in segments),
+        "segments": segments,
+    }
@@ -0,0 +1,159 @@
+"""
+Admission control fairness under overload
+Runs the relay (relay_harness.py) against the mock provider with a
+Deepgram session limit and weighted tenants, then has every tenant try to
+hold far more sessions than the limit allows: each user connects, streams a
+few seconds of audio, hangs up and reconnects, backing off for the
+retry-after it is given when turned away. Reports each tenant's share of the
+session time against its fair share, admission waits and rejections.
+
+    python bench_admission.py --limit 12 --users 15 --weights gold=2 silver=1 bronze=1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import urllib.request
+
+import websockets
+
+import mock_provider
+import relay_harness
+from load_test import percentile, synthetic_speech
+
+FRAME_BYTES = 6400  # 0.2 s at 16 kHz
+
+
+class Tenant:
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.held_seconds = 0.0
+        self.waits = []
+        self.sessions = 0
+        self.rejected = 0
+        self.errors = 0
+
+
+async def user(url, tenant, pcm, deadline, rng):
+    """Connect, stream, hang up, repeat until `deadline`"""
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            async with websockets.connect(url) as ws:
+                reply = json.loads(await ws.recv())
+                if reply.get("type") == "error":
+                    tenant.rejected += 1
+                    await asyncio.sleep(reply.get("retry_after", 1) * rng.uniform(0.5, 1.5))
+                    continue
+                admitted = time.monotonic()
+                tenant.waits.append(admitted - started)
+                tenant.sessions += 1
+
+                async def drain():
+                    async for _ in ws:
+                        pass
+
+                receiving = asyncio.create_task(drain())
+                for offset in range(0, len(pcm), FRAME_BYTES):
+                    await ws.send(pcm[offset:offset + FRAME_BYTES])
+                    await asyncio.sleep(0.2)
+                await ws.send(json.dumps({"type": "terminate"}))
+                await receiving
+                # Count time inside the run only, so shares are over the overload window
+                tenant.held_seconds += max(0.0, min(time.monotonic(), deadline) - admitted)
+        except (OSError, websockets.exceptions.WebSocketException):
+            tenant.errors += 1
+            await asyncio.sleep(1)
+
+
+def fetch_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+async def run(args):
+    tenants = []
+    for item in args.weights:
+        name, weight = item.split("=")
+        tenants.append(Tenant(name, float(weight)))
+
+    mock_port = relay_harness.free_port()
+    relay_port = relay_harness.free_port()
+    config = mock_provider.MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+    env = dict(
+        os.environ,
+        DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+        DEEPGRAM_MAX_SESSIONS=str(args.limit),
+        TENANT_WEIGHTS=",".join(args.weights),
+        ADMISSION_QUEUE_SECONDS=str(args.queue_seconds),
+    )
+    relay = subprocess.Popen(
+        relay_harness.relay_command(relay_port),
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                fetch_stats(relay_port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.2)
+
+        pcm = synthetic_speech(args.session_seconds)
+        rng = random.Random(1)
+        deadline = time.monotonic() + args.seconds
+        await asyncio.gather(*(
+            user(f"ws://127.0.0.1:{relay_port}/ws/deepgram?api_key={tenant.name}",
+                 tenant, pcm, deadline, rng)
+            for tenant in tenants for _ in range(args.users)
+        ))
+        admission = fetch_stats(relay_port)["admission"]
+    finally:
+        relay.terminate()
+        relay.wait()
+        mock.cancel()
+
+    total_weight = sum(t.weight for t in tenants)
+    total_held = sum(t.held_seconds for t in tenants) or 1.0
+    print(f"\n{args.limit} Deepgram slots, {args.users} users per tenant, {args.seconds:.0f} s\n")
+    print(f"{'tenant':<8} {'weight':>6} {'fair':>6} {'share':>6} {'sessions':>9} "
+          f"{'wait p50':>9} {'wait p99':>9} {'rejected':>9} {'errors':>7}")
+    for tenant in tenants:
+        print(
+            f"{tenant.name:<8} {tenant.weight:>6.1f} "
+            f"{tenant.weight / total_weight:>6.0%} {tenant.held_seconds / total_held:>6.0%} "
+            f"{tenant.sessions:>9} "
+            f"{percentile(tenant.waits, 50):>8.2f}s {percentile(tenant.waits, 99):>8.2f}s "
+            f"{tenant.rejected:>9} {tenant.errors:>7}"
+        )
+    deepgram = admission["providers"]["deepgram"]
+    attempts = deepgram["admitted"] + deepgram["rejected"]
+    print(f"\nrelay: {deepgram['admitted']} admitted, {deepgram['rejected']} rejected "
+          f"({deepgram['rejected'] / max(1, attempts):.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admission control fairness under overload")
+    parser.add_argument("--limit", type=int, default=12, help="Deepgram session limit")
+    parser.add_argument("--users", type=int, default=15, help="Concurrent users per tenant")
+    parser.add_argument("--weights", nargs="+", default=["gold=2", "silver=1", "bronze=1"])
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--session-seconds", type=float, default=4.0)
+    parser.add_argument("--queue-seconds", type=float, default=3.0)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Offline transcription speedup and memory
+Writes a synthetic recording to disk, transcribes it with batch.transcribe
+against an in-process mock provider at several concurrency levels and
+streaming speeds, and reports wall-clock speedup over real-time streaming
+and how much RSS grew while the file was memory-mapped.
+
+    python bench_batch.py --minutes 60 --concurrency 1 4 8 --speed 0 4
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import wave
+
+from batch import AudioFile, transcribe
+from load_test import ProcessSampler, synthetic_speech
+from mock_provider import MockConfig, serve
+from provider_deepgram import DeepgramProvider
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_recording(path, minutes):
+    """Synthetic 16 kHz mono speech, written a minute at a time"""
+    minute = synthetic_speech(60)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        for _ in range(minutes):
+            wav.writeframes(minute)
+
+
+async def run(args, path):
+    port = free_port()
+    mock = asyncio.create_task(serve("127.0.0.1", port, MockConfig(latency_ms=args.mock_latency_ms)))
+    await asyncio.sleep(0.5)
+    provider = DeepgramProvider(f"ws://127.0.0.1:{port}/v1/listen", {"interim_results": True}, "key")
+    sampler = ProcessSampler(os.getpid())
+
+    print(f"\n{args.minutes} min recording, mock latency {args.mock_latency_ms:.0f} ms")
+    print(f"{'concurrency':>11} {'speed':>6} {'chunks':>7} {'wall s':>8} {'speedup':>8} "
+          f"{'segments':>9} {'RSS +MiB':>9}")
+    for speed in args.speed:
+        for concurrency in args.concurrency:
+            baseline = sampler.rss_bytes()
+            sampler.peak_rss = baseline
+            watcher = asyncio.create_task(sampler.watch(0.05))
+            with open(path, "rb") as f:
+                audio = AudioFile(f)
+                try:
+                    result = await transcribe(
+                        audio, provider, asyncio.Semaphore(concurrency),
+                        args.min_chunk_seconds, args.max_chunk_seconds, speed
+                    )
+                finally:
+                    audio.close()
+            watcher.cancel()
+            growth = (sampler.peak_rss - baseline) / 2**20
+            print(f"{concurrency:>11} {speed or 'max':>6} {result['chunks']:>7} "
+                  f"{result['elapsed']:>8.1f} {result['speedup']:>7.1f}x "
+                  f"{len(result['segments']):>9} {growth:>9.1f}")
+    mock.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline transcription benchmark")
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--speed", type=float, nargs="+", default=[0.0, 4.0],
+                        help="Streaming speed as a multiple of real time, 0 = unpaced")
+    parser.add_argument("--min-chunk-seconds", type=float, default=20.0)
+    parser.add_argument("--max-chunk-seconds", type=float, default=40.0)
+    parser.add_argument("--mock-latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.wav")
+        write_recording(path, args.minutes)
+        asyncio.run(run(args, path))
+
+
+if __name__ == "__main__":
+    main()
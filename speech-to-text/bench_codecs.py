@@ -0,0 +1,146 @@
+"""
+Uplink decode cost and bandwidth saved
+Encodes synthetic speech-band audio in each uplink encoding, decodes it the
+way the relay does and reports microseconds per client frame, the share of
+one core per real-time stream, wire bitrate against PCM16 and the
+signal-to-noise ratio of the decoded audio. The vectorized IMA ADPCM decoder
+is checked against a sample-by-sample reference, whose cost is shown too.
+
+    python bench_codecs.py --frames 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from uplink_codecs import (
+    BITS, IMA_ADPCM, IMA_INDEX_ADJUST, IMA_STEPS, MULAW, PCM16,
+    ima_encode, make_decoder, mulaw_encode,
+)
+
+FORMATS = [
+    # (label, sample rate, channels, samples per client frame)
+    ("16 kHz mono / 4096", 16000, 1, 4096),
+    ("48 kHz mono / 4096", 48000, 1, 4096),
+    ("48 kHz stereo / 4096", 48000, 2, 4096),
+]
+
+
+def speech_band(rate, channels, seconds=2.0) -> bytes:
+    """Harmonics of a gliding 120-240 Hz voice plus noise, with pauses"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 180 + 60 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    signal = 0.15 * voice * ((t % 1.0) < 0.7) + 0.005 * rng.standard_normal(len(t))
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+    return np.repeat(pcm, channels).tobytes()
+
+
+def encode(pcm: bytes, encoding, channels) -> bytes:
+    if encoding == MULAW:
+        return mulaw_encode(pcm)
+    if encoding == IMA_ADPCM:
+        return ima_encode(pcm, channels)[0]
+    return pcm
+
+
+def reference_ima_decode(data: bytes, channels) -> bytes:
+    """Sample-by-sample IMA ADPCM decoder"""
+    steps = IMA_STEPS.tolist()
+    adjust = IMA_INDEX_ADJUST.tolist()
+    predictors = [0] * channels
+    indexes = [0] * channels
+    out = []
+    for n, nibble in enumerate(x for byte in data for x in (byte & 0x0F, byte >> 4)):
+        c = n % channels
+        step = steps[indexes[c]]
+        delta = step >> 3
+        if nibble & 4:
+            delta += step
+        if nibble & 2:
+            delta += step >> 1
+        if nibble & 1:
+            delta += step >> 2
+        predictor = predictors[c] - delta if nibble & 8 else predictors[c] + delta
+        predictors[c] = max(-32768, min(32767, predictor))
+        indexes[c] = max(0, min(88, indexes[c] + adjust[nibble]))
+        out.append(predictors[c])
+    return np.array(out, dtype="<i2").tobytes()
+
+
+def snr_db(original: bytes, decoded: bytes) -> float:
+    x = np.frombuffer(original, dtype="<i2").astype(np.float64)
+    y = np.frombuffer(decoded, dtype="<i2").astype(np.float64)
+    x = x[:len(y)]
+    noise = np.sum((x - y) ** 2)
+    return float("inf") if noise == 0 else 10 * np.log10(np.sum(x ** 2) / noise)
+
+
+def timed(new_decoder, frames, count):
+    """(wall seconds per frame, CPU seconds) over `count` frames
+
+    Streams carry decoder state from frame to frame, so each pass over
+    `frames` starts a fresh decoder.
+    """
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for i in range(count):
+        if i % len(frames) == 0:
+            decode = new_decoder()
+        decode(frames[i % len(frames)])
+    return (time.perf_counter() - started) / count, time.process_time() - cpu_started
+
+
+def bench(rate, channels, samples, encoding, count):
+    pcm = speech_band(rate, channels, seconds=10.0)
+    wire = encode(pcm, encoding, channels)
+    frame_bytes = samples * channels * BITS[encoding] // 8
+    frames = [wire[i:i + frame_bytes] for i in range(0, len(wire) - frame_bytes + 1, frame_bytes)]
+
+    def new_decoder():
+        decoder = make_decoder(encoding, channels)
+        return decoder.decode if decoder else (lambda frame: frame)
+
+    decode = new_decoder()
+    decoded = b"".join(bytes(decode(frame)) for frame in frames)
+    if encoding == IMA_ADPCM:
+        assert decoded == reference_ima_decode(b"".join(frames), channels), "decoder mismatch"
+
+    per_frame, cpu = timed(new_decoder, frames, count)
+    audio_seconds = count * samples / rate
+    kbits = rate * channels * BITS[encoding] / 1000
+    return per_frame, cpu / audio_seconds, kbits, snr_db(pcm, decoded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uplink decode cost and bandwidth")
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"\n{'input':<22} {'encoding':<10} {'us/frame':>9} {'core/stream':>12} "
+          f"{'kbit/s':>8} {'saved':>6} {'SNR dB':>7}")
+    for label, rate, channels, samples in FORMATS:
+        baseline = None
+        for encoding in (PCM16, MULAW, IMA_ADPCM):
+            per_frame, core_share, kbits, snr = bench(rate, channels, samples, encoding, args.frames)
+            baseline = baseline or kbits
+            print(f"{label:<22} {encoding:<10} {per_frame*1e6:>9.1f} {core_share*100:>11.3f}% "
+                  f"{kbits:>8.0f} {1 - kbits / baseline:>6.0%} {snr:>7.1f}")
+
+    # What the vectorized decoder saves over decoding one sample at a time,
+    # and its worst case: random bytes clamp on most samples
+    samples = 4096
+    speech = encode(speech_band(16000, 1), IMA_ADPCM, 1)[:samples // 2]
+    noise = np.random.default_rng(0).integers(0, 256, samples // 2, dtype=np.uint8).tobytes()
+    scalar, _ = timed(lambda: lambda frame: reference_ima_decode(frame, 1), [speech], 50)
+    print(f"\nIMA ADPCM 16 kHz mono / 4096: sample-by-sample {scalar*1e6:.0f} us/frame")
+    for label, frame in (("speech", speech), ("random bytes", noise)):
+        vectorized, _ = timed(lambda: make_decoder(IMA_ADPCM, 1).decode, [frame], 500)
+        print(f"  vectorized, {label:<13} {vectorized*1e6:>6.0f} us/frame ({scalar / vectorized:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
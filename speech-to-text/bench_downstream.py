@@ -0,0 +1,108 @@
+"""
+Downstream bytes and CPU per session
+Replays the transcript stream the mock provider produces for one session
+through the relay's downstream path in each mode and reports bytes per second
+sent to the browser, messages per second and server CPU per session.
+
+    python bench_downstream.py --seconds 60 --interim-ms 100 --utterance-ms 6000
+"""
+
+import argparse
+import json
+import time
+
+from downstream import DownstreamEncoder
+from mock_provider import MockAssemblyAI, MockConfig, MockDeepgram
+from pipeline import INTERIM
+from provider_assemblyai import AssemblyAIProvider
+from provider_deepgram import DeepgramProvider
+
+PACKET_MS = 50
+
+MODES = [
+    # (label, forward raw text, delta, interim_hz)
+    ("parse + re-serialize", False, False, 0.0),
+    ("passthrough", True, False, 0.0),
+    ("delta", True, True, 0.0),
+    ("delta @ 5 Hz", True, True, 5.0),
+    ("full @ 5 Hz", True, False, 5.0),
+]
+
+
+def provider_stream(session_class, seconds, config):
+    """(audio time in s, provider message text) for `seconds` of speech"""
+    session = session_class(None, config)
+    messages = []
+    packet = bytes(PACKET_MS * 32)
+    for message in session.opening():
+        messages.append((0.0, json.dumps(message)))
+    for _ in range(int(seconds * 1000 / PACKET_MS)):
+        session.on_audio(packet)
+        while not session.outbox.empty():
+            _, message = session.outbox.get_nowait()
+            messages.append((session.audio_ms / 1000, json.dumps(message)))
+    return messages
+
+
+def serialize(message) -> str:
+    """What the browser socket writes: text as-is, dicts like send_json"""
+    if isinstance(message, str):
+        return message
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def run(provider, stream, raw, delta, interim_hz):
+    encoder = DownstreamEncoder(provider.transcript_text, delta=delta, interim_hz=interim_hz)
+    sent_bytes = 0
+    sent = 0
+
+    def write(messages):
+        nonlocal sent_bytes, sent
+        for message in messages:
+            sent_bytes += len(serialize(message).encode())
+            sent += 1
+
+    cpu_started = time.process_time()
+    for now, message in stream:
+        # Held-back interims whose slot came before this message
+        wait = encoder.wait_time(now)
+        if wait is not None and wait <= 0:
+            write(encoder.flush(now))
+        for payload, kind in provider.translate(message):
+            forward_raw = raw and provider.passthrough and not (delta and kind == INTERIM)
+            write(encoder.push(message if forward_raw else payload, kind, now))
+    cpu = time.process_time() - cpu_started
+    return sent_bytes, sent, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downstream bytes and CPU per session")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Audio per session")
+    parser.add_argument("--interim-ms", type=int, default=100)
+    parser.add_argument("--utterance-ms", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=20, help="Sessions replayed per mode")
+    args = parser.parse_args()
+
+    providers = [
+        (AssemblyAIProvider("ws://mock", {"format_turns": True}, "key"), MockAssemblyAI),
+        (DeepgramProvider("ws://mock", {"interim_results": True}, "key"), MockDeepgram),
+    ]
+    for provider, session_class in providers:
+        config = MockConfig(latency_ms=0, interim_ms=args.interim_ms, utterance_ms=args.utterance_ms)
+        stream = provider_stream(session_class, args.seconds, config)
+        upstream = sum(len(message) for _, message in stream)
+        print(f"\n{provider.label}: {len(stream)} upstream messages, "
+              f"{upstream / args.seconds / 1024:.1f} KiB/s")
+        print(f"{'mode':<22} {'KiB/s':>8} {'msgs/s':>8} {'us/msg':>8} {'core/session':>13}")
+        for label, raw, delta, interim_hz in MODES:
+            sent_bytes = sent = cpu = 0
+            for _ in range(args.repeat):
+                b, n, c = run(provider, stream, raw, delta, interim_hz)
+                sent_bytes, sent, cpu = sent_bytes + b, sent + n, cpu + c
+            sessions = args.seconds * args.repeat
+            print(f"{label:<22} {sent_bytes / sessions / 1024:>8.2f} {sent / sessions:>8.1f} "
+                  f"{cpu / (len(stream) * args.repeat) * 1e6:>8.1f} {cpu / sessions * 100:>12.4f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Entity spotting cost per transcript update
+Builds vocabularies of 100 to 10,000 terms, replays utterances as a provider
+sends them (an interim per word, then the final) and reports, per update:
+- incremental: EntitySpotter, scanning only the changed suffix
+- rescan: the same automaton over the whole text on every update
+- naive: a regex alternation of every term over the whole text
+plus compile time and automaton memory.
+
+    python bench_entities.py --terms 100 1000 10000
+"""
+
+import argparse
+import gc
+import random
+import re
+import time
+import tracemalloc
+
+from entities import EntityAutomaton, EntitySpotter, normalize
+from load_test import percentile
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def random_words(count, rng):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(LETTERS, k=rng.randint(3, 9))))
+    return sorted(words)
+
+
+def vocabulary(count, rng):
+    """Everyday words for the speech, and `count` one- to three-word terms
+    (names, projects) built from words of their own"""
+    words = random_words(2000 + count, rng)
+    common, names = words[::2][:2000], words[1::2]
+    terms = {" ".join(rng.choices(names, k=rng.randint(1, 3))) for _ in range(count)}
+    return common, sorted(terms)
+
+
+def utterances(words, terms, count, rng):
+    """Results as a provider sends them: one interim per word, then the final"""
+    for _ in range(count):
+        spoken = []
+        for _ in range(rng.randint(5, 30)):
+            spoken.extend((rng.choice(terms) if rng.random() < 0.1 else rng.choice(words)).split())
+        for n in range(1, len(spoken) + 1):
+            yield {"text": " ".join(spoken[:n]), "is_final": False, "start_ms": 0.0, "end_ms": 0.0}
+        yield {"text": " ".join(spoken) + ".", "is_final": True, "start_ms": 0.0, "end_ms": 0.0}
+
+
+def timed(update, results):
+    samples = []
+    for result in results:
+        started = time.perf_counter()
+        update(result)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity spotting cost per update")
+    parser.add_argument("--terms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--utterances", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"\n{'terms':>6} {'compile':>9} {'memory':>8} {'method':<12} "
+          f"{'p50':>8} {'p99':>8} {'max':>8}")
+    for count in args.terms:
+        rng = random.Random(count)
+        words, terms = vocabulary(count, rng)
+        results = list(utterances(words, terms, args.utterances, rng))
+
+        started = time.perf_counter()
+        automaton = EntityAutomaton(terms)
+        compile_seconds = time.perf_counter() - started
+        tracemalloc.start()
+        copy = EntityAutomaton(terms)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del copy
+
+        spotter = EntitySpotter(automaton)
+
+        def rescan(result):
+            EntitySpotter(automaton).update(dict(result, is_final=True))
+
+        pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(re.escape(normalize(t).strip()) for t in terms) + r")(?!\w)"
+        )
+
+        def naive(result):
+            pattern.findall(normalize(result["text"]))
+
+        gc.disable()  # time the matching, not collector pauses
+        try:
+            for name, update in (("incremental", spotter.update), ("rescan", rescan), ("naive", naive)):
+                samples = timed(update, results)
+                print(
+                    f"{count:>6} {compile_seconds*1000:>7.1f}ms {memory/1e6:>6.1f}MB {name:<12} "
+                    f"{percentile(samples, 50)*1e6:>6.1f}us "
+                    f"{percentile(samples, 99)*1e6:>6.1f}us "
+                    f"{max(samples)*1e6:>6.1f}us"
+                )
+        finally:
+            gc.enable()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Transcript fan-out latency benchmark
+Runs the relay in a subprocess against the local mock provider, streams one
+/ws/deepgram session and follows it with N read-only subscribers on
+/ws/sessions/{id}/subscribe. Reports how much later than the publishing
+client each subscriber received a message (as seen by this process, which
+also runs all N sockets), the relay's own publish-to-write latency, and
+messages subscribers lost to their drop-to-latest queues.
+
+    python bench_fanout.py --subscribers 10 100 1000 --seconds 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+import mock_provider
+from load_test import LoadSession, percentile, synthetic_speech
+from relay_harness import free_port
+
+
+def serve_relay(port):
+    """Subprocess mode: the relay plus the fan-out histogram as JSON"""
+    import uvicorn
+    import main
+
+    @main.app.get("/bench/fanout")
+    async def fanout():
+        return {"buckets": main.FANOUT_SECONDS.buckets, "counts": main.FANOUT_SECONDS.counts}
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def fetch_fanout(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/bench/fanout") as response:
+        return json.load(response)
+
+
+def bucket_quantile(buckets, counts, q):
+    """Upper bound of the bucket holding the q-th observation"""
+    rank, seen = q * sum(counts), 0
+    for bound, count in zip(buckets + [float("inf")], counts):
+        seen += count
+        if seen >= rank and seen:
+            return bound
+    return float("nan")
+
+
+class Publisher(LoadSession):
+    """The session being followed; waits for its subscribers before streaming"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session_id = None
+        self.joined = asyncio.Event()
+        self.go = asyncio.Event()
+        self.received = {}  # message text -> when this client got it
+
+    async def send_audio(self):
+        await self.go.wait()
+        await super().send_audio()
+
+    async def receive_transcripts(self):
+        try:
+            async for message in self.websocket:
+                self.received.setdefault(message, time.monotonic())
+                data = json.loads(message)
+                if data.get("session"):
+                    self.session_id = data["session"]
+                    self.joined.set()
+                self.handle_response(data)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+async def follow(url, received, connected):
+    async with websockets.connect(url, max_queue=None) as websocket:
+        connected()
+        async for message in websocket:
+            received.append((message, time.monotonic()))
+
+
+async def run_level(port, subscribers, pcm):
+    publisher = Publisher("deepgram", f"ws://127.0.0.1:{port}/ws/deepgram", pcm)
+    before = fetch_fanout(port)["counts"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        publishing = asyncio.create_task(publisher.run())
+        await publisher.joined.wait()
+        url = f"ws://127.0.0.1:{port}/ws/sessions/{publisher.session_id}/subscribe"
+        received = [[] for _ in range(subscribers)]
+        pending = [subscribers]
+        all_connected = asyncio.Event()
+
+        def connected():
+            pending[0] -= 1
+            if not pending[0]:
+                all_connected.set()
+
+        following = [asyncio.create_task(follow(url, r, connected)) for r in received]
+        await all_connected.wait()
+        started = time.monotonic()
+        publisher.go.set()
+        await publishing
+        await asyncio.gather(*following)
+
+    after = fetch_fanout(port)
+    counts = [b - a for a, b in zip(before, after["counts"])]
+    published = sum(1 for at in publisher.received.values() if at >= started)
+    delays = [
+        at - publisher.received[message]
+        for messages in received for message, at in messages
+        if message in publisher.received
+    ]
+    lost = sum(max(0, published - len(messages)) for messages in received)
+    return delays, (after["buckets"], counts), lost, published
+
+
+async def run(args):
+    mock_port = free_port()
+    relay_port = free_port()
+    config = mock_provider.MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+
+    env = dict(os.environ, DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen")
+    relay = subprocess.Popen(
+        [sys.executable, __file__, "--serve-relay", str(relay_port)],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                fetch_fanout(relay_port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.2)
+
+        pcm = synthetic_speech(args.seconds)
+        print(f"\n{'subscribers':>11} {'messages':>9} {'client p50':>11} {'client p99':>11} "
+              f"{'relay p50':>10} {'relay p99':>10} {'lost':>6}")
+        for subscribers in args.subscribers:
+            delays, (buckets, counts), lost, published = await run_level(relay_port, subscribers, pcm)
+            print(
+                f"{subscribers:>11} {published:>9} "
+                f"{percentile(delays, 50)*1000:>9.1f}ms "
+                f"{percentile(delays, 99)*1000:>9.1f}ms "
+                f"{'<=':>2}{bucket_quantile(buckets, counts, 0.5)*1000:>6.1f}ms "
+                f"{'<=':>2}{bucket_quantile(buckets, counts, 0.99)*1000:>6.1f}ms "
+                f"{lost:>6}"
+            )
+    finally:
+        relay.terminate()
+        relay.wait()
+        mock.cancel()
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve-relay":
+        serve_relay(int(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description="Fan-out latency to read-only subscribers")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="Audio streamed by the followed session at each level")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Hot-path micro-benchmarks for the relay's per-frame and per-message code
+Runs main.py's own session code in-process against fake sockets, with no
+network and no provider:
+
+- client_audio: `receive_from_client` dispatching binary frames (100 ms of
+  16 kHz PCM16) through ingest and the uplink queue to `send_upstream`
+- client_text: the same dispatch for text (control) messages
+- deepgram_translate: Deepgram `translate` + `normalize` of Results messages
+- downstream_full / downstream_delta: `receive_from_upstream` and
+  `send_downstream` taking provider messages to the browser, forwarded
+  verbatim or as interim deltas (json.loads and re-serialization)
+- relay_<n>: whole `ASRManager.relay` sessions, n at once, each against an
+  in-process mock Deepgram, frames sent as fast as the relay takes them
+
+For each it reports ns per op (best of --repeat), and the memory traced
+while one op is processed (alloc B/op: the peak above the live baseline,
+less what the harness itself takes, with the loop settled between ops);
+relay_<n> also reports throughput in frames and messages per second.
+--save writes the results as JSON; --baseline compares against such a file
+and exits with status 1 when ns/op or alloc B/op grew by more than
+--max-regression / --max-alloc-regression percent.
+
+    python bench_hotpath.py --save hotpath.json
+    python bench_hotpath.py --baseline hotpath.json --max-regression 15
+"""
+
+import os
+
+# In-process only: no capture or transcript files, no upstream connections
+os.environ.update(CAPTURE_DIR="", TRANSCRIPT_DB="", ASSEMBLYAI_POOL_SIZE="0", DEEPGRAM_POOL_SIZE="0",
+                  DEBUG_ENDPOINTS="0")
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from starlette.websockets import WebSocketState
+
+import main
+from audio_sources import synthetic_speech
+from bench_downstream import provider_stream
+from mock_provider import MockConfig, MockDeepgram
+from upstream_link import UpstreamLink
+from upstream_pool import PooledConnection
+
+FRAME_BYTES = 3200  # 100 ms of 16 kHz mono PCM16
+SETTLE_STEPS = 20   # loop iterations for one op to travel through a pipeline
+
+
+class FakeClient:
+    """Browser side of a session: what ASRManager and send_downstream use of
+    a starlette WebSocket"""
+
+    def __init__(self, query_params=None):
+        self.query_params = dict(query_params or {})
+        self.inbox = asyncio.Queue()
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+        self.sent = 0
+        self.sent_bytes = 0
+
+    def feed_bytes(self, data):
+        self.inbox.put_nowait({"type": "websocket.receive", "bytes": data})
+
+    def feed_text(self, text):
+        self.inbox.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def receive(self):
+        # One socket read per loop iteration, like a real connection
+        await asyncio.sleep(0)
+        return await self.inbox.get()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent += 1
+        self.sent_bytes += len(text)
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self, code=1000):
+        self.client_state = self.application_state = WebSocketState.DISCONNECTED
+
+
+class FakeUpstream:
+    """Relay side of a provider socket: what UpstreamLink uses of a
+    websockets connection. Sent frames go to `peer` (the mock provider's
+    side) if there is one; provider messages are read from `inbox`."""
+
+    def __init__(self, peer=None):
+        self.peer = peer
+        self.inbox = asyncio.Queue()
+        self.sent = 0
+        self.sent_bytes = 0
+
+    async def send(self, payload):
+        self.sent += 1
+        self.sent_bytes += len(payload)
+        if self.peer is not None:
+            self.peer.inbox.put_nowait(payload)
+
+    async def close(self):
+        if self.peer is not None:
+            self.peer.inbox.put_nowait(None)
+
+    async def __aiter__(self):
+        while True:
+            # One socket read per loop iteration, like a real connection
+            await asyncio.sleep(0)
+            message = await self.inbox.get()
+            if message is None:
+                return
+            yield message
+
+
+class MockEnd:
+    """The mock provider's side of a FakeUpstream"""
+
+    def __init__(self, relay_side: FakeUpstream):
+        self.relay_side = relay_side
+        self.inbox = asyncio.Queue()
+
+    async def send(self, message):
+        self.relay_side.inbox.put_nowait(message)
+
+    async def close(self, code=1000, reason=""):
+        self.relay_side.inbox.put_nowait(None)
+
+    async def __aiter__(self):
+        while True:
+            frame = await self.inbox.get()
+            if frame is None:
+                return
+            yield frame
+
+
+class FakePool:
+    """Stands in for an UpstreamPool: each acquire starts an in-process mock
+    provider session, or a sink that answers nothing without one"""
+
+    def __init__(self, session_class=None, config=None):
+        self.session_class = session_class
+        self.config = config
+        self.mocks = set()
+
+    async def acquire(self):
+        if self.session_class is None:
+            return FakeUpstream()
+        relay_side = FakeUpstream()
+        relay_side.peer = MockEnd(relay_side)
+        mock = asyncio.create_task(self.run_mock(relay_side.peer))
+        self.mocks.add(mock)
+        mock.add_done_callback(self.mocks.discard)
+        return relay_side
+
+    async def acquire_connection(self):
+        return PooledConnection(await self.acquire(), time.monotonic())
+
+    async def run_mock(self, end):
+        await self.session_class(end, self.config).run()
+        await end.close()
+
+
+def new_session(provider, client, pool):
+    sample_rate, channels = main.audio_format(client)
+    session = main.Session(
+        provider,
+        main.AudioIngest(sample_rate, channels, provider.sample_rate, provider.packet_ms,
+                         provider.min_packet_ms),
+        adaptive=main.ADAPTIVE_PACKETS
+    )
+    session.encoder = main.downstream_encoder(client, provider.transcript_text)
+    session.link = UpstreamLink(provider, pool)
+    return session, channels
+
+
+async def settle():
+    for _ in range(SETTLE_STEPS):
+        await asyncio.sleep(0)
+
+
+class Benchmark:
+    """One hot path: `setup` builds the session and its tasks, `feed(i)`
+    queues op i, `finish` waits until every queued op has been processed"""
+
+    name = ""
+
+    async def setup(self):
+        pass
+
+    def feed(self, i):
+        raise NotImplementedError
+
+    async def finish(self):
+        pass
+
+    async def timed(self, ops) -> float:
+        """Seconds to process `ops` ops queued at once"""
+        await self.setup()
+        gc.collect()
+        started = time.perf_counter()
+        for i in range(ops):
+            self.feed(i)
+        await self.finish()
+        return time.perf_counter() - started
+
+    async def allocated(self, ops) -> float:
+        """Mean traced memory peak above the settled baseline while one op
+        is processed, including what settling the loop takes"""
+        await self.setup()
+        for i in range(min(ops, 50)):
+            # Warm up caches and lazily built state
+            self.feed(i)
+            await settle()
+        total = 0
+        tracemalloc.start()
+        try:
+            for i in range(ops):
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                self.feed(i)
+                await settle()
+                total += tracemalloc.get_traced_memory()[1] - current
+        finally:
+            tracemalloc.stop()
+        await self.finish()
+        return total / ops
+
+
+class Idle(Benchmark):
+    """Nothing to process: what `allocated` measures of the loop itself"""
+
+    name = "idle"
+
+    def feed(self, i):
+        pass
+
+
+class ClientAudio(Benchmark):
+    name = "client_audio"
+
+    def __init__(self, provider):
+        self.provider = provider
+        audio = synthetic_speech(10.0)
+        self.frames = [audio[i:i + FRAME_BYTES] for i in range(0, len(audio) - FRAME_BYTES + 1, FRAME_BYTES)]
+
+    async def setup(self):
+        self.client = FakeClient()
+        self.session, channels = new_session(self.provider, self.client, FakePool())
+        await self.session.link.open()
+        self.tasks = [
+            asyncio.create_task(main.receive_from_client(self.client, self.session, channels)),
+            asyncio.create_task(main.send_upstream(self.session)),
+        ]
+
+    def feed(self, i):
+        self.client.feed_bytes(self.frames[i % len(self.frames)])
+
+    async def finish(self):
+        self.client.feed_text('{"type": "terminate"}')
+        await asyncio.gather(*self.tasks)
+
+
+class ClientText(ClientAudio):
+    name = "client_text"
+    message = json.dumps({"type": "ping", "sequence": 1})
+
+    def feed(self, i):
+        self.client.feed_text(self.message)
+
+
+class DeepgramTranslate(Benchmark):
+    """Synchronous; `feed` does the work"""
+
+    name = "deepgram_translate"
+
+    def __init__(self, provider, messages):
+        self.provider = provider
+        self.messages = messages
+
+    def feed(self, i):
+        for payload, _ in self.provider.translate(self.messages[i % len(self.messages)]):
+            self.provider.normalize(payload)
+
+
+class Downstream(Benchmark):
+    def __init__(self, provider, messages, interim):
+        self.provider = provider
+        self.messages = messages
+        self.interim = interim
+        self.name = f"downstream_{interim}"
+
+    async def setup(self):
+        self.client = FakeClient({"interim": self.interim})
+        self.session, _ = new_session(self.provider, self.client, FakePool())
+        await self.session.link.open()
+        # The provider socket ends once the queued messages are read
+        self.session.link.terminated = True
+        self.tasks = [
+            asyncio.create_task(main.receive_from_upstream(self.session, self.provider)),
+            asyncio.create_task(main.send_downstream(self.client, self.session)),
+        ]
+
+    def feed(self, i):
+        self.session.link.ws.inbox.put_nowait(self.messages[i % len(self.messages)])
+
+    async def finish(self):
+        self.session.link.ws.inbox.put_nowait(None)
+        await asyncio.gather(*self.tasks)
+
+
+async def relay_sessions(provider, sessions, frames_per_session):
+    """Whole relay sessions against the mock; (cpu s, wall s, frames, messages
+    sent to the clients)"""
+    pool = FakePool(MockDeepgram, MockConfig(latency_ms=0))
+    main.pools[provider.name] = pool
+    audio = synthetic_speech(frames_per_session * FRAME_BYTES / 32000)
+    frames = [audio[i:i + FRAME_BYTES] for i in range(0, frames_per_session * FRAME_BYTES, FRAME_BYTES)]
+    clients = []
+    for _ in range(sessions):
+        client = FakeClient()
+        for frame in frames:
+            client.feed_bytes(frame)
+        client.feed_text('{"type": "terminate"}')
+        clients.append(client)
+    gc.collect()
+    cpu_started, started = time.process_time(), time.perf_counter()
+    # Without the relay's per-session log lines
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(main.ASRManager.relay(client, provider) for client in clients))
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - started
+    return cpu, wall, sessions * len(frames), sum(client.sent for client in clients)
+
+
+async def run(args) -> dict:
+    provider = main.PROVIDERS["deepgram"]
+    messages = [message for _, message in provider_stream(MockDeepgram, 60.0, MockConfig(latency_ms=0))]
+    results = {}
+    benchmarks = [
+        ClientAudio(provider),
+        ClientText(provider),
+        DeepgramTranslate(provider, messages),
+        Downstream(provider, messages, "full"),
+        Downstream(provider, messages, "delta"),
+    ]
+    # Settling the loop between traced ops allocates too; not the op's cost
+    harness = await Idle().allocated(args.alloc_ops)
+    print(f"\n{'benchmark':<20} {'ns/op':>10} {'ops/s':>12} {'alloc B/op':>11}")
+    for benchmark in benchmarks:
+        if args.only and benchmark.name not in args.only:
+            continue
+        best = min([await benchmark.timed(args.ops) for _ in range(args.repeat)])
+        alloc = max(0.0, await benchmark.allocated(args.alloc_ops) - harness)
+        results[benchmark.name] = {"ns_per_op": best / args.ops * 1e9, "alloc_bytes_per_op": alloc}
+        print(f"{benchmark.name:<20} {best / args.ops * 1e9:>10.0f} {args.ops / best:>12,.0f} {alloc:>11.0f}")
+
+    print(f"\n{'relay sessions':<20} {'ns/frame':>10} {'frames/s':>12} {'msgs/s':>10} {'wall s':>8}")
+    for sessions in args.sessions:
+        name = f"relay_{sessions}"
+        if args.only and name not in args.only:
+            continue
+        frames_per_session = max(20, args.frames // sessions)
+        runs = [await relay_sessions(provider, sessions, frames_per_session) for _ in range(args.repeat)]
+        cpu, wall, frames, messages = min(runs)
+        results[name] = {
+            "ns_per_op": cpu / frames * 1e9,
+            "frames_per_second": frames / wall,
+            "messages_per_second": messages / wall,
+        }
+        print(f"{sessions:<20} {cpu / frames * 1e9:>10.0f} {frames / wall:>12,.0f} "
+              f"{messages / wall:>10,.0f} {wall:>8.2f}")
+    return results
+
+
+def regressions(results, baseline, max_regression, max_alloc_regression) -> list:
+    """Descriptions of the metrics that got worse than allowed"""
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, limit, floor in (
+            ("ns_per_op", max_regression, 0.0),
+            # A few bytes either way are noise of the tracer, not the code
+            ("alloc_bytes_per_op", max_alloc_regression, 64.0),
+        ):
+            if metric not in result or metric not in before:
+                continue
+            allowed = max(before[metric], floor) * (1 + limit / 100)
+            if result[metric] > allowed:
+                change = (result[metric] / before[metric] - 1) * 100 if before[metric] else float("inf")
+                found.append(f"{name} {metric}: {before[metric]:.0f} -> {result[metric]:.0f} "
+                             f"(+{change:.0f}%, limit {limit:g}%)")
+    return found
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Relay hot-path micro-benchmarks")
+    parser.add_argument("--ops", type=int, default=5000, help="Ops per timed run")
+    parser.add_argument("--alloc-ops", type=int, default=500, help="Ops traced for alloc B/op")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs, the best is kept")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--frames", type=int, default=20000, help="Frames per relay_<n> run, across sessions")
+    parser.add_argument("--only", nargs="+", help="Benchmarks to run, e.g. client_audio relay_100")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from --save to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed ns/op growth, percent")
+    parser.add_argument("--max-alloc-regression", type=float, default=20.0,
+                        help="Allowed alloc B/op growth, percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "benchmarks": results,
+            }, f, indent=2)
+        print(f"\nSaved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+        found = regressions(results, baseline, args.max_regression, args.max_alloc_regression)
+        if found:
+            print(f"\n{len(found)} regressions against {args.baseline}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main_cli()
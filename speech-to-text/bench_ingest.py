@@ -0,0 +1,63 @@
+"""
+Per-frame CPU cost of the audio ingest stage
+Feeds synthetic client frames through AudioIngest for the input formats the
+relay accepts and reports microseconds per frame and the share of one core
+needed per real-time stream.
+
+    python bench_ingest.py --frames 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from audio_ingest import AudioIngest
+
+FORMATS = [
+    # (label, sample rate, channels, samples per client frame)
+    ("16 kHz mono / 4096", 16000, 1, 4096),
+    ("16 kHz mono / 3200", 16000, 1, 3200),
+    ("48 kHz mono / 4096", 48000, 1, 4096),
+    ("48 kHz stereo / 4096", 48000, 2, 4096),
+    ("44.1 kHz mono / 4096", 44100, 1, 4096),
+    ("44.1 kHz stereo / 4096", 44100, 2, 4096),
+]
+
+
+def client_frame(rate, channels, samples):
+    t = np.arange(samples) / rate
+    tone = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    return np.repeat(tone, channels).tobytes()
+
+
+def bench(rate, channels, samples, frames, packet_ms):
+    ingest = AudioIngest(rate, channels, 16000, packet_ms)
+    frame = client_frame(rate, channels, samples)
+    for _ in range(20):  # warm up buffers
+        ingest.process(frame)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    packets = 0
+    for _ in range(frames):
+        packets += len(ingest.process(frame))
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    audio_seconds = frames * samples / rate
+    return wall / frames, cpu / audio_seconds, packets / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AudioIngest per-frame cost")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--packet-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"\n{'input':<24} {'us/frame':>9} {'core/stream':>12} {'packets/frame':>14}")
+    for label, rate, channels, samples in FORMATS:
+        per_frame, core_share, packets = bench(rate, channels, samples, args.frames, args.packet_ms)
+        print(f"{label:<24} {per_frame*1e6:>9.1f} {core_share*100:>11.3f}% {packets:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Event-loop lag benchmark for concurrent Deepgram sessions
+Runs the relay in a subprocess against the local mock provider, streams N
+concurrent /ws/deepgram sessions and reports how late the relay's event loop
+wakes up. A relay that never blocks the loop keeps lag flat as N grows.
+
+    python bench_loop_lag.py --sessions 1 10 50 100 --seconds 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import time
+
+import mock_provider
+from load_test import LoadSession, percentile, synthetic_speech
+from relay_harness import fetch_lag, free_port, relay_command
+
+
+async def run_level(port, sessions, pcm):
+    clients = [
+        LoadSession("deepgram", f"ws://127.0.0.1:{port}/ws/deepgram", pcm)
+        for _ in range(sessions)
+    ]
+    fetch_lag(port)  # discard samples from the idle period
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(client.run() for client in clients))
+    lag = fetch_lag(port)
+    finals = [x for client in clients for x in client.final]
+    errors = sum(client.errors for client in clients)
+    return lag, finals, errors
+
+
+async def run(args):
+    mock_port = free_port()
+    relay_port = free_port()
+    config = mock_provider.MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+
+    env = dict(os.environ, DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen")
+    relay = subprocess.Popen(
+        relay_command(relay_port),
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                fetch_lag(relay_port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.2)
+
+        pcm = synthetic_speech(args.seconds)
+        print(f"\n{'sessions':>8} {'lag p50':>9} {'lag p99':>9} {'lag max':>9} "
+              f"{'final p50':>10} {'errors':>7}")
+        for sessions in args.sessions:
+            lag, finals, errors = await run_level(relay_port, sessions, pcm)
+            print(
+                f"{sessions:>8} "
+                f"{percentile(lag, 50)*1000:>7.2f}ms "
+                f"{percentile(lag, 99)*1000:>7.2f}ms "
+                f"{max(lag, default=float('nan'))*1000:>7.2f}ms "
+                f"{percentile(finals, 50)*1000:>8.1f}ms "
+                f"{errors:>7}"
+            )
+    finally:
+        relay.terminate()
+        relay.wait()
+        mock.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay event-loop lag under Deepgram load")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="Audio streamed per session at each level")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
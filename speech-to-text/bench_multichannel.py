@@ -0,0 +1,79 @@
+"""
+Multi-channel ingest throughput per core
+Feeds interleaved 8- and 16-channel PCM16 through ChannelSplitter (a strided
+view of the frame, copied once into the per-channel packet buffers) and, for
+comparison, through a split that copies each channel out of the frame and
+ingests it separately.
+Reports microseconds per client frame and how many real-time channels one
+core could split.
+
+    python bench_multichannel.py --frames 1000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from audio_ingest import AudioIngest, ChannelSplitter
+
+FORMATS = [
+    # (label, sample rate, channels, samples per channel per client frame)
+    ("16 kHz x 8 / 4096", 16000, 8, 4096),
+    ("16 kHz x 16 / 4096", 16000, 16, 4096),
+    ("48 kHz x 8 / 4096", 48000, 8, 4096),
+    ("48 kHz x 16 / 4096", 48000, 16, 4096),
+]
+
+
+def client_frame(rate, channels, samples):
+    t = np.arange(samples) / rate
+    tones = [0.3 * np.sin(2 * np.pi * (200 + 40 * c) * t) for c in range(channels)]
+    return (np.stack(tones, axis=1) * 32767).astype("<i2").tobytes()
+
+
+class CopySplitter:
+    """Deinterleaves by copying each channel out, then ingests it as bytes"""
+
+    def __init__(self, rate, channels, out_rate, packet_ms):
+        self.channels = channels
+        self.ingests = [AudioIngest(rate, 1, out_rate, packet_ms) for _ in range(channels)]
+
+    def process(self, chunk):
+        frames = np.frombuffer(chunk, dtype="<i2").reshape(-1, self.channels)
+        return [
+            ingest.process(frames[:, c].copy().tobytes())
+            for c, ingest in enumerate(self.ingests)
+        ]
+
+
+def bench(splitter, frame, frames, rate, channels, samples):
+    for _ in range(20):  # warm up buffers
+        splitter.process(frame)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(frames):
+        splitter.process(frame)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    channel_seconds = frames * channels * samples / rate
+    return wall / frames, channel_seconds / cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-channel ingest throughput")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--packet-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"\n{'input':<20} {'split':<8} {'us/frame':>9} {'channels/core':>14}")
+    for label, rate, channels, samples in FORMATS:
+        frame = client_frame(rate, channels, samples)
+        for name, make in (("strided", ChannelSplitter), ("copy", CopySplitter)):
+            splitter = make(rate, channels, 16000, args.packet_ms)
+            per_frame, per_core = bench(splitter, frame, args.frames, rate, channels, samples)
+            print(f"{label:<20} {name:<8} {per_frame*1e6:>9.1f} {per_core:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Multiplexed streams vs one socket per stream
+Starts a fresh relay (relay_harness.py) against the mock provider
+for each run and streams N concurrent Deepgram streams, either as N sockets
+to /ws/deepgram or as N logical streams on one /ws/mux socket. Both send the
+same 100 ms frames on the same schedule. Reports the relay's resident
+memory and CPU time per stream, and the finals received.
+
+    python bench_mux.py --streams 100 200 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+import urllib.request
+
+import websockets
+
+import mock_provider
+import relay_harness
+from load_test import synthetic_speech
+from mux import frame
+
+FRAME_BYTES = 3200  # 100 ms at 16 kHz
+TICK = FRAME_BYTES / 32000
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss(pid) -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def cpu_seconds(pid) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+
+
+def fetch_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+async def drain(ws, finals):
+    async for message in ws:
+        if '"is_final":true' in message:
+            finals.append(message)
+
+
+async def sockets_mode(port, streams, pcm, sampler):
+    finals = []
+    sockets = [await websockets.connect(f"ws://127.0.0.1:{port}/ws/deepgram") for _ in range(streams)]
+    for ws in sockets:
+        await ws.recv()  # status
+    readers = [asyncio.create_task(drain(ws, finals)) for ws in sockets]
+    await sampler.start()
+    for offset in range(0, len(pcm), FRAME_BYTES):
+        started = time.monotonic()
+        chunk = pcm[offset:offset + FRAME_BYTES]
+        for ws in sockets:
+            await ws.send(chunk)
+        sampler.sample()
+        await asyncio.sleep(max(0.0, TICK - (time.monotonic() - started)))
+    for ws in sockets:
+        await ws.send(json.dumps({"type": "terminate"}))
+    await asyncio.gather(*readers)
+    return finals
+
+
+async def mux_mode(port, streams, pcm, sampler):
+    finals = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/mux", max_size=None) as ws:
+        await ws.recv()  # ready
+        for stream_id in range(streams):
+            await ws.send(json.dumps({"type": "open", "stream": stream_id, "provider": "deepgram"}))
+        connected = 0
+        while connected < streams:
+            if '"Connected' in await ws.recv():
+                connected += 1
+        reader = asyncio.create_task(drain(ws, finals))
+        await sampler.start()
+        for offset in range(0, len(pcm), FRAME_BYTES):
+            started = time.monotonic()
+            chunk = pcm[offset:offset + FRAME_BYTES]
+            for stream_id in range(streams):
+                await ws.send(frame(stream_id, chunk))
+            sampler.sample()
+            await asyncio.sleep(max(0.0, TICK - (time.monotonic() - started)))
+        await ws.send(json.dumps({"type": "terminate"}))
+        await reader
+    return finals
+
+
+class Sampler:
+    """Relay memory and CPU while the streams are open"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.idle_rss = rss(pid)
+        self.peak_rss = self.idle_rss
+        self.cpu_started = None
+
+    async def start(self):
+        await asyncio.sleep(0.5)  # let connection setup settle
+        self.peak_rss = max(self.peak_rss, rss(self.pid))
+        self.cpu_started = cpu_seconds(self.pid)
+        self.started = time.monotonic()
+
+    def sample(self):
+        self.peak_rss = max(self.peak_rss, rss(self.pid))
+
+    def stop(self):
+        self.cpu = cpu_seconds(self.pid) - self.cpu_started
+        self.elapsed = time.monotonic() - self.started
+
+
+async def run_once(mode, streams, pcm, mock_port):
+    port = relay_harness.free_port()
+    env = dict(
+        os.environ,
+        DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+        PYTHONWARNINGS="ignore::DeprecationWarning",
+    )
+    relay = subprocess.Popen(
+        relay_harness.relay_command(port), env=env
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                fetch_stats(port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.1)
+        sampler = Sampler(relay.pid)
+        run = sockets_mode if mode == "sockets" else mux_mode
+        finals = await run(port, streams, pcm, sampler)
+        sampler.stop()
+        return sampler, finals
+    finally:
+        relay.terminate()
+        relay.wait()
+
+
+async def run(args):
+    mock_port = relay_harness.free_port()
+    config = mock_provider.MockConfig(latency_ms=args.latency_ms, jitter_ms=0)
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+    pcm = synthetic_speech(args.seconds)
+    try:
+        print(f"\n{'streams':>7} {'mode':<8} {'RSS/stream':>11} {'CPU/stream-s':>13} "
+              f"{'relay CPU':>10} {'finals':>7}")
+        for streams in args.streams:
+            for mode in ("sockets", "mux"):
+                sampler, finals = await run_once(mode, streams, pcm, mock_port)
+                per_stream = (sampler.peak_rss - sampler.idle_rss) / streams
+                print(
+                    f"{streams:>7} {mode:<8} {per_stream/1024:>9.0f}KB "
+                    f"{sampler.cpu / (streams * sampler.elapsed) * 1e3:>11.2f}ms "
+                    f"{sampler.cpu / sampler.elapsed:>9.0%} {len(finals):>7}"
+                )
+    finally:
+        mock.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiplexed streams vs one socket per stream")
+    parser.add_argument("--streams", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Audio per stream")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Adaptive upstream packet sizing under simulated network conditions
+For each network condition the mock provider simulates (a cost per message
+and/or a bandwidth cap), starts the relay (relay_harness.py) with
+fixed 50 ms packets, fixed 250 ms packets and adaptive sizing, streams a few
+concurrent Deepgram sessions in real time and reports time to first interim
+and to final, measured by the client, and the packet sizes sessions chose.
+
+    python bench_packets.py --sessions 5 --seconds 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import time
+import urllib.request
+
+import mock_provider
+import relay_harness
+from load_test import LoadSession, percentile, synthetic_speech
+
+CONDITIONS = [
+    # (label, per-message cost in ms, bandwidth in kbps)
+    ("good link", 0.0, 0.0),
+    ("30 ms/msg", 30.0, 0.0),
+    ("60 ms/msg", 60.0, 0.0),
+    ("300 kbps+10ms", 10.0, 300.0),
+]
+
+MODES = [
+    # (label, relay environment)
+    ("fixed 50 ms", {"ADAPTIVE_PACKETS": "0", "DEEPGRAM_PACKET_MS": "50"}),
+    ("fixed 250 ms", {"ADAPTIVE_PACKETS": "0", "DEEPGRAM_PACKET_MS": "250"}),
+    ("adaptive", {"ADAPTIVE_PACKETS": "1", "DEEPGRAM_PACKET_MS": "50"}),
+]
+
+
+def fetch_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+async def watch_packets(port, sizes):
+    """Latest packet size of every session, polled while they run"""
+    while True:
+        await asyncio.sleep(0.5)
+        try:
+            sessions = fetch_stats(port)["sessions"]
+        except OSError:
+            continue
+        for session_id, session in sessions.items():
+            if "packets" in session:
+                sizes[session_id] = session["packets"]["packet_ms"]
+
+
+async def run_mode(mock_port, env_overrides, sessions, pcm):
+    port = relay_harness.free_port()
+    env = dict(
+        os.environ,
+        DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+        PYTHONWARNINGS="ignore::DeprecationWarning",
+        **env_overrides,
+    )
+    relay = subprocess.Popen(
+        relay_harness.relay_command(port),
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                fetch_stats(port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.1)
+        clients = [
+            LoadSession("deepgram", f"ws://127.0.0.1:{port}/ws/deepgram", pcm)
+            for _ in range(sessions)
+        ]
+        sizes = {}
+        watcher = asyncio.create_task(watch_packets(port, sizes))
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(client.run() for client in clients))
+        watcher.cancel()
+        first_interim = [x for client in clients for x in client.first_interim]
+        finals = [x for client in clients for x in client.final]
+        return first_interim, finals, sorted(sizes.values())
+    finally:
+        relay.terminate()
+        relay.wait()
+
+
+async def run(args):
+    pcm = synthetic_speech(args.seconds)
+    print(f"\n{args.sessions} sessions x {args.seconds:.0f} s, 100 ms client frames\n")
+    print(f"{'condition':<15} {'packets':<13} {'1st interim p50':>16} {'p95':>8} "
+          f"{'final p50':>10} {'p95':>8}  chosen")
+    for label, message_ms, bandwidth_kbps in CONDITIONS:
+        config = mock_provider.MockConfig(
+            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+            message_ms=message_ms, bandwidth_kbps=bandwidth_kbps,
+        )
+        mock_port = relay_harness.free_port()
+        with contextlib.redirect_stdout(io.StringIO()):
+            mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+            await asyncio.sleep(0.2)
+        try:
+            for mode, env in MODES:
+                first_interim, finals, sizes = await run_mode(mock_port, env, args.sessions, pcm)
+                chosen = f"{min(sizes)}-{max(sizes)} ms" if sizes else ""
+                print(
+                    f"{label:<15} {mode:<13} "
+                    f"{percentile(first_interim, 50)*1000:>14.0f}ms "
+                    f"{percentile(first_interim, 95)*1000:>6.0f}ms "
+                    f"{percentile(finals, 50)*1000:>8.0f}ms "
+                    f"{percentile(finals, 95)*1000:>6.0f}ms  {chosen}"
+                )
+        finally:
+            mock.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive packet sizing benchmark")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
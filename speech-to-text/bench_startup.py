@@ -0,0 +1,140 @@
+"""
+Relay startup cost
+Reports what `import main` loads eagerly (from `python -X importtime` in a
+fresh interpreter, grouped by top-level package), then starts the relay
+(relay_harness.py) with all providers and with one enabled and
+measures the time until it answers HTTP, and the time to the first and
+second sessions against the mock provider. The first session includes
+loading the provider plugin.
+
+    python bench_startup.py --runs 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+import mock_provider
+import relay_harness
+
+CONFIGS = [
+    ("all providers", "assemblyai,deepgram"),
+    ("deepgram only", "deepgram"),
+]
+
+
+def import_profile():
+    """Import time (s) by top-level package, and the modules loaded
+
+    Each module's own time is charged to its top-level package, so fastapi's
+    dependencies (pydantic, starlette) show up separately.
+    """
+    code = "import sys, main; print('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1e6
+    return totals, result.stdout.split()
+
+
+def fetch_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+async def start_relay(env):
+    """Start the relay; returns (process, port, seconds until /stats answers)"""
+    port = relay_harness.free_port()
+    started = time.perf_counter()
+    relay = subprocess.Popen(
+        relay_harness.relay_command(port), env=env
+    )
+    while True:
+        try:
+            fetch_stats(port)
+            return relay, port, time.perf_counter() - started
+        except OSError:
+            if time.perf_counter() - started > 30:
+                relay.terminate()
+                raise RuntimeError("relay did not start")
+            await asyncio.sleep(0.005)
+
+
+async def connect_time(port, provider):
+    """Seconds from connecting to the relay's status message"""
+    started = time.perf_counter()
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/{provider}") as ws:
+        await ws.recv()
+        elapsed = time.perf_counter() - started
+        await ws.send(json.dumps({"type": "terminate"}))
+        async for _ in ws:
+            pass
+    return elapsed
+
+
+async def run(args):
+    totals, modules = import_profile()
+    print("\nimport main, time by top-level package\n")
+    for package, seconds in sorted(totals.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<24} {seconds*1000:>7.1f}ms")
+    print(f"  {'total':<24} {sum(totals.values())*1000:>7.1f}ms ({len(modules)} modules)")
+    plugins = [name for name in modules if name.startswith("provider_") and name != "provider_registry"]
+    print(f"  provider plugins loaded at import: {', '.join(plugins) or 'none'}")
+
+    mock_port = relay_harness.free_port()
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, mock_provider.MockConfig()))
+    try:
+        print(f"\n{'config':<16} {'ready p50':>10} {'ready max':>10} "
+              f"{'1st session':>12} {'2nd session':>12}")
+        for label, enabled in CONFIGS:
+            env = dict(
+                os.environ,
+                ENABLED_PROVIDERS=enabled,
+                PYTHONWARNINGS="ignore::DeprecationWarning",
+                ASSEMBLYAI_URL=f"ws://127.0.0.1:{mock_port}/v3/ws",
+                DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+            )
+            ready, first, second = [], [], []
+            for _ in range(args.runs):
+                relay, port, seconds = await start_relay(env)
+                try:
+                    ready.append(seconds)
+                    first.append(await connect_time(port, "deepgram"))
+                    second.append(await connect_time(port, "deepgram"))
+                finally:
+                    relay.terminate()
+                    relay.wait()
+            print(
+                f"{label:<16} {statistics.median(ready)*1000:>8.0f}ms {max(ready)*1000:>8.0f}ms "
+                f"{statistics.median(first)*1000:>10.1f}ms {statistics.median(second)*1000:>10.1f}ms"
+            )
+    finally:
+        mock.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay startup cost")
+    parser.add_argument("--runs", type=int, default=5, help="Relay starts per config")
+    parser.add_argument("--top", type=int, default=12, help="Packages to list")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Transcript log cost benchmark
+1. In-process: appends synthetic finals at increasing rates while probing
+   event-loop lag, and reports rows per commit, commit time, write
+   amplification (bytes the process wrote, WAL and checkpoints included, per
+   byte of transcript) and loop lag with the log on and off.
+2. End to end: runs the relay (relay_harness.py) against the mock
+   provider with and without TRANSCRIPT_DB and compares final latency and
+   loop lag over N concurrent sessions.
+
+    python bench_transcripts.py --rates 100 1000 10000 --sessions 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+import bench_loop_lag
+import mock_provider
+import relay_harness
+from load_test import percentile, synthetic_speech
+from transcript_store import TranscriptStore
+
+WORDS = ("the quick brown fox jumps over lazy dog meeting agenda budget review "
+         "customer launch timeline action item follow up next quarter").split()
+TICK = 0.01
+
+
+def written_bytes() -> int:
+    """Bytes this process has passed to write() so far (Linux)"""
+    with open("/proc/self/io") as f:
+        return int(next(line for line in f if line.startswith("wchar:")).split()[1])
+
+
+def disk_bytes(path) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+async def probe_lag(samples):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - started - 0.005)
+
+
+async def append_at(store, rate, seconds, rng):
+    """Append `rate` finals per second, in a burst every TICK; return logical bytes"""
+    logical = 0
+    per_tick = rate * TICK
+    due = 0.0
+    deadline = time.monotonic() + seconds
+    start_ms = 0.0
+    while time.monotonic() < deadline:
+        due += per_tick
+        while due >= 1:
+            due -= 1
+            text = " ".join(rng.choices(WORDS, k=rng.randint(4, 16)))
+            session = f"{rng.randrange(1000):012x}"
+            result = {"text": text, "start_ms": start_ms, "end_ms": start_ms + 2400.0,
+                      "is_final": True}
+            start_ms += 2400.0
+            logical += len(text.encode()) + len(session) + len("deepgram") + 3 * 8
+            if store:
+                store.append(session, "deepgram", result)
+        await asyncio.sleep(TICK)
+    return logical
+
+
+async def run_store(rate, seconds, enabled, directory):
+    path = os.path.join(directory, f"bench-{rate}-{int(enabled)}.db")
+    store = TranscriptStore(path) if enabled else None
+    if store:
+        await store.start()
+    lag = []
+    probe = asyncio.create_task(probe_lag(lag))
+    before = written_bytes()
+    logical = await append_at(store, rate, seconds, random.Random(rate))
+    if store:
+        await store.close()
+    probe.cancel()
+    return lag, logical, written_bytes() - before, disk_bytes(path), store
+
+
+async def bench_store(args):
+    print(f"\n{'finals/s':>8} {'log':>4} {'rows/commit':>12} {'commit avg':>11} {'commit max':>11} "
+          f"{'write amp':>10} {'on disk':>8} {'lag p99':>9} {'lag max':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rate in args.rates:
+            for enabled in (False, True):
+                lag, logical, written, on_disk, store = await run_store(
+                    rate, args.seconds, enabled, directory)
+                line = f"{rate:>8} {'on' if enabled else 'off':>4} "
+                if store:
+                    stats = store.stats()
+                    line += (f"{stats['rows_per_batch']:>12.1f} {stats['commit_avg_ms']:>9.2f}ms "
+                             f"{stats['commit_max_ms']:>9.2f}ms {written / logical:>9.1f}x "
+                             f"{on_disk / logical:>7.1f}x ")
+                else:
+                    line += f"{'':>12} {'':>11} {'':>11} {'':>10} {'':>8} "
+                line += (f"{percentile(lag, 99)*1000:>7.2f}ms "
+                         f"{max(lag, default=float('nan'))*1000:>7.2f}ms")
+                print(line)
+
+
+async def bench_relay(args):
+    mock_port = relay_harness.free_port()
+    config = mock_provider.MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, config))
+    pcm = synthetic_speech(args.relay_seconds)
+    print(f"\n{'log':>4} {'sessions':>8} {'lag p99':>9} {'lag max':>9} {'final p50':>10} "
+          f"{'final p99':>10} {'errors':>7}")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for enabled in (False, True):
+                env = dict(os.environ, DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+                           TRANSCRIPT_DB=os.path.join(directory, "relay.db") if enabled else "")
+                port = relay_harness.free_port()
+                relay = subprocess.Popen(
+                    relay_harness.relay_command(port),
+                    env=env,
+                )
+                try:
+                    deadline = time.monotonic() + 15
+                    while True:
+                        try:
+                            relay_harness.fetch_lag(port)
+                            break
+                        except OSError:
+                            if time.monotonic() > deadline:
+                                raise RuntimeError("relay did not start")
+                            await asyncio.sleep(0.2)
+                    lag, finals, errors = await bench_loop_lag.run_level(port, args.sessions, pcm)
+                    print(
+                        f"{'on' if enabled else 'off':>4} {args.sessions:>8} "
+                        f"{percentile(lag, 99)*1000:>7.2f}ms "
+                        f"{max(lag, default=float('nan'))*1000:>7.2f}ms "
+                        f"{percentile(finals, 50)*1000:>8.1f}ms "
+                        f"{percentile(finals, 99)*1000:>8.1f}ms "
+                        f"{errors:>7}"
+                    )
+                finally:
+                    relay.terminate()
+                    relay.wait()
+    finally:
+        mock.cancel()
+
+
+async def run(args):
+    await bench_store(args)
+    if args.sessions:
+        await bench_relay(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript log write cost and latency impact")
+    parser.add_argument("--rates", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Finals appended per second in the in-process run")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--sessions", type=int, default=50,
+                        help="Concurrent relay sessions in the end-to-end run (0 to skip)")
+    parser.add_argument("--relay-seconds", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
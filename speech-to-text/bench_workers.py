@@ -0,0 +1,152 @@
+"""
+Sessions per node vs worker count
+For each worker count, starts the multi-process relay (workers.py) against
+local mock providers and raises the number of concurrent sessions step by
+step until the p95 final latency breaks the SLO or sessions fail. The last
+passing step is the node's capacity at that worker count; with enough cores
+it should grow linearly with the number of workers.
+
+Load generators and mock providers run in their own processes so they do
+not compete with the relay for one core.
+
+    python bench_workers.py --workers 1 2 4 --step 25 --max-sessions 400
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from load_test import LoadSession, percentile, synthetic_speech
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def client_batch(url, provider, sessions, duration, ramp_ms):
+    """Run `sessions` load sessions in this process; (final latencies, errors)"""
+    pcm = synthetic_speech(duration)
+
+    async def run():
+        group = [LoadSession(provider, f"{url}/ws/{provider}", pcm) for _ in range(sessions)]
+
+        async def staggered(i, session):
+            await asyncio.sleep(i * ramp_ms / 1000)
+            try:
+                await session.run()
+            except Exception:
+                session.errors += 1
+
+        await asyncio.gather(*(staggered(i, s) for i, s in enumerate(group)))
+        return [x for s in group for x in s.final], sum(s.errors for s in group)
+
+    # LoadSession reports every connection on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(run())
+
+
+def run_step(pool, args, sessions):
+    per_proc = [sessions // args.client_procs] * args.client_procs
+    for i in range(sessions % args.client_procs):
+        per_proc[i] += 1
+    ramp_ms = args.ramp_seconds * 1000 / max(1, max(per_proc))
+    results = pool.starmap(client_batch, [
+        (f"ws://127.0.0.1:{args.port}", args.provider, n, args.duration, ramp_ms)
+        for n in per_proc if n
+    ])
+    finals = [x for latencies, _ in results for x in latencies]
+    errors = sum(errors for _, errors in results)
+    return percentile(finals, 95), errors
+
+
+def capacity(pool, args, workers):
+    """Highest passing session count for this worker count"""
+    env = dict(
+        os.environ,
+        ASSEMBLYAI_URL=f"ws://127.0.0.1:{args.mock_port}/v3/ws",
+        DEEPGRAM_URL=f"ws://127.0.0.1:{args.mock_port}/v1/listen",
+    )
+    relay = subprocess.Popen(
+        [sys.executable, "workers.py", "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(args.port), "--drain-timeout", "1"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    passed = 0
+    try:
+        wait_for_port(args.port)
+        time.sleep(1.0)  # every worker listening
+        for sessions in range(args.step, args.max_sessions + 1, args.step):
+            p95, errors = run_step(pool, args, sessions)
+            ok = errors == 0 and p95 * 1000 <= args.slo_ms
+            print(f"  {workers} workers  {sessions:>5} sessions  final p95 {p95*1000:7.1f} ms  "
+                  f"errors {errors:<3} {'ok' if ok else 'FAIL'}")
+            if not ok:
+                break
+            passed = sessions
+    finally:
+        relay.send_signal(signal.SIGTERM)
+        relay.wait(30)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay capacity vs worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--provider", default="deepgram", choices=["assemblyai", "deepgram"])
+    parser.add_argument("--step", type=int, default=25, help="Sessions added per step")
+    parser.add_argument("--max-sessions", type=int, default=400)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of audio per session")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="Spread of session starts")
+    parser.add_argument("--slo-ms", type=float, default=600.0, help="Final latency p95 budget")
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--mock-procs", type=int, default=2)
+    parser.add_argument("--mock-latency-ms", type=float, default=150.0)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--mock-port", type=int, default=8300)
+    args = parser.parse_args()
+
+    mocks = [
+        subprocess.Popen(
+            [sys.executable, "mock_provider.py", "--port", str(args.mock_port),
+             "--latency-ms", str(args.mock_latency_ms), "--reuse-port"],
+            cwd=HERE, stdout=subprocess.DEVNULL,
+        )
+        for _ in range(args.mock_procs)
+    ]
+    results = {}
+    try:
+        wait_for_port(args.mock_port)
+        with multiprocessing.get_context("spawn").Pool(args.client_procs) as pool:
+            for workers in args.workers:
+                results[workers] = capacity(pool, args, workers)
+    finally:
+        for mock in mocks:
+            mock.terminate()
+
+    base = results[args.workers[0]] / args.workers[0] if results[args.workers[0]] else 0
+    print(f"\n{os.cpu_count()} CPUs, SLO final p95 <= {args.slo_ms:.0f} ms")
+    print(f"{'workers':>8} {'sessions':>9} {'per worker':>11} {'scaling':>8}")
+    for workers, sessions in results.items():
+        scaling = sessions / (base * workers) if base else 0.0
+        print(f"{workers:>8} {sessions:>9} {sessions / workers:>11.1f} {scaling:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
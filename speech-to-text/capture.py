@@ -0,0 +1,198 @@
+"""
+Session capture for reproducing transcripts
+A recorded session is two files in the capture directory:
+
+- `<session>.pcm`: every audio frame exactly as the client sent it (PCM16,
+  or the compressed uplink encoding it negotiated)
+- `<session>.jsonl`: one event per line with `t`, seconds since the session
+  started on the monotonic clock: the session's format, each audio frame's
+  offset and length in the .pcm file, client text messages, every upstream
+  provider message, and the normalized finals
+
+replay.py feeds a recording back through the relay. Sessions only hand
+events to the recorder; a writer task appends them on a dedicated thread
+every `flush_interval` seconds, so the event loop never waits on the disk.
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Recording:
+    """One session's capture; its events are queued on the store"""
+
+    def __init__(self, store, session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.audio_bytes = 0
+        self.events = 0
+        self.truncated = False
+        self.closed = False
+
+    def event(self, event: str, audio=None, **fields):
+        if self.closed or self.truncated:
+            return
+        fields = dict({"t": round(time.monotonic() - self.started, 6), "event": event}, **fields)
+        if not self.store.enqueue(self, json.dumps(fields, ensure_ascii=False), audio):
+            # A gap would make the replay wrong; keep what was written
+            self.truncated = True
+            return
+        self.events += 1
+
+    def audio(self, data):
+        """A client audio frame (bytes or a view of them; not copied)"""
+        size = len(data)
+        self.event("audio", data, offset=self.audio_bytes, bytes=size)
+        self.audio_bytes += size
+
+    def client(self, text: str):
+        """A text message from the client (config, vocabulary, terminate)"""
+        self.event("client", message=text)
+
+    def upstream(self, message):
+        """A provider message, before translation"""
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", "replace")
+        self.event("upstream", message=message)
+
+    def final(self, result: dict):
+        """A normalized final, for comparing replays"""
+        self.event("final", text=result["text"], start_ms=result["start_ms"], end_ms=result["end_ms"])
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Written even past the buffer limit, so a truncated recording says so
+        line = json.dumps({
+            "t": round(time.monotonic() - self.started, 6), "event": "end", "truncated": self.truncated
+        })
+        self.store.enqueue(self, line, None, closing=True)
+
+
+class CaptureStore:
+    """Batched, bounded writer for session recordings
+
+    At most `max_pending_bytes` of audio and events wait for the writer; a
+    recording that would go past it is truncated (and marked so in its end
+    event) rather than letting memory grow while the disk is stalled.
+    Write times are recorded into `write_histogram` if given.
+    """
+
+    def __init__(self, directory, flush_interval=0.2, max_pending_bytes=64 * 1024 * 1024,
+                 write_histogram=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self.write_histogram = write_histogram
+        self.pending = []  # (recording, line, audio, closing)
+        self.pending_bytes = 0
+        self.closing = False
+        self.task = None
+        # One thread owns the files, so batches are written in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+        self.files = {}  # session id -> (audio file, event file)
+
+        self.recordings = 0
+        self.active = 0
+        self.truncated = 0
+        self.written_bytes = 0
+        self.batches = 0
+        self.failed = 0
+
+    async def start(self):
+        """Create the directory and start the writer (call from a running loop)"""
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, lambda: os.makedirs(self.directory, exist_ok=True)
+        )
+        self.task = asyncio.create_task(self.write_batches())
+
+    def record(self, session_id: str, **meta) -> Recording:
+        """Start a recording; `meta` (provider, sample_rate, ...) is its first event"""
+        recording = Recording(self, session_id)
+        recording.event("start", session=session_id, **meta)
+        self.recordings += 1
+        self.active += 1
+        return recording
+
+    def enqueue(self, recording, line, audio, closing=False) -> bool:
+        size = (len(line) if line else 0) + (len(audio) if audio is not None else 0)
+        if not closing and self.pending_bytes + size > self.max_pending_bytes:
+            self.truncated += 1
+            return False
+        self.pending.append((recording.session_id, line, audio, closing))
+        self.pending_bytes += size
+        if closing:
+            self.active -= 1
+        return True
+
+    def write(self, batch):
+        written = 0
+        for session_id, line, audio, closing in batch:
+            files = self.files.get(session_id)
+            if files is None:
+                path = os.path.join(self.directory, session_id)
+                files = self.files[session_id] = (open(path + ".pcm", "ab"), open(path + ".jsonl", "a"))
+            if audio is not None:
+                files[0].write(audio)
+                written += len(audio)
+            if line is not None:
+                files[1].write(line + "\n")
+                written += len(line) + 1
+            if closing:
+                for f in self.files.pop(session_id):
+                    f.close()
+        for audio_file, event_file in self.files.values():
+            audio_file.flush()
+            event_file.flush()
+        return written
+
+    async def write_batches(self):
+        loop = asyncio.get_running_loop()
+        while not (self.closing and not self.pending):
+            if not self.closing:
+                await asyncio.sleep(self.flush_interval)
+            if not self.pending:
+                continue
+            batch, self.pending, self.pending_bytes = self.pending, [], 0
+            started = time.perf_counter()
+            try:
+                self.written_bytes += await loop.run_in_executor(self.executor, self.write, batch)
+            except OSError as e:
+                self.failed += len(batch)
+                print(f"Session capture write failed, {len(batch)} events lost: {e}")
+                continue
+            self.batches += 1
+            if self.write_histogram:
+                self.write_histogram.observe(time.perf_counter() - started)
+
+    def close_files(self):
+        for audio_file, event_file in self.files.values():
+            audio_file.close()
+            event_file.close()
+        self.files.clear()
+
+    async def close(self):
+        """Write what is still pending, then close every file"""
+        if self.task:
+            self.closing = True
+            await self.task
+            self.task = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.close_files)
+        self.executor.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "recordings": self.recordings,
+            "active": self.active,
+            "pending_bytes": self.pending_bytes,
+            "written_bytes": self.written_bytes,
+            "batches": self.batches,
+            "truncated": self.truncated,
+            "failed": self.failed,
+        }
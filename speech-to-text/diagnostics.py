@@ -0,0 +1,296 @@
+"""
+Runtime diagnostics for the /debug endpoints
+Three views of what the event loop is doing, none of which hooks the loop's
+callbacks, so they work on uvloop as well as asyncio's own loop and nothing
+is added to the per-frame path:
+
+- SamplingProfiler: samples the loop thread's Python stack every few ms of
+  CPU time for a time window and aggregates the stacks (top functions,
+  folded stacks for flame graphs, samples per session)
+- StallMonitor: a heartbeat callback on the loop and a watchdog thread; when
+  the heartbeat is late by more than a threshold the watchdog captures the
+  stack and the task that is holding the loop, and the stall is logged with
+  its duration, handler and session once the loop gets back to it
+- TaskRegistry: a task factory remembering the session each task was
+  created for, so live tasks can be listed per session
+
+Handlers mark the session they serve with `current_session.set(id)`; tasks
+created afterwards inherit it through their context.
+"""
+
+import asyncio
+import collections
+import contextvars
+import os
+import signal
+import sys
+import threading
+import time
+import weakref
+
+current_session = contextvars.ContextVar("current_session", default=None)
+
+MAX_DEPTH = 64
+# Innermost frames of a loop thread that is waiting for I/O, not running code
+IDLE_FRAMES = {("selectors.py", "select"), ("runners.py", "run"), ("base_events.py", "run_forever")}
+
+
+def describe(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_qualname}"
+
+
+def stack_of(frame, depth=MAX_DEPTH) -> list:
+    """Frame descriptions, outermost first"""
+    stack = []
+    while frame is not None and len(stack) < depth:
+        stack.append(describe(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def awaiting(task) -> str:
+    """Where a task's coroutine chain is suspended"""
+    coro = task.get_coro()
+    where = None
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        where = describe(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return where
+
+
+def handler_of(task) -> str:
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", type(coro).__name__)
+
+
+class TaskRegistry:
+    """Session of each task, recorded by a task factory when it is created"""
+
+    def __init__(self):
+        self.sessions = weakref.WeakKeyDictionary()
+        self.previous = None
+
+    def install(self, loop):
+        self.previous = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            if self.previous is not None:
+                task = self.previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            context = kwargs.get("context")
+            session_id = context.get(current_session) if context is not None else current_session.get()
+            if session_id is not None:
+                self.sessions[task] = session_id
+            return task
+
+        loop.set_task_factory(factory)
+
+    def session_of(self, task):
+        return self.sessions.get(task) if task is not None else None
+
+    def snapshot(self, loop) -> dict:
+        """Live tasks by session ("" for the relay's own), with where each waits"""
+        by_session = collections.defaultdict(list)
+        for task in asyncio.all_tasks(loop):
+            by_session[self.sessions.get(task, "")].append({
+                "name": task.get_name(),
+                "handler": handler_of(task),
+                "awaiting": awaiting(task),
+            })
+        return dict(by_session)
+
+
+class ProfileError(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """On-demand sampling CPU profile of the event loop thread
+
+    A SIGPROF timer interrupts the process every `interval` seconds of CPU
+    time, and the handler records the loop thread's stack, so samples land
+    where Python code is running rather than where the GIL happens to be
+    released. Samples taken while the loop waits for I/O are CPU time of
+    other threads (capture and transcript writers, uploads). One profile
+    runs at a time, and only on a loop running in the main thread.
+    """
+
+    def __init__(self, loop, tasks: TaskRegistry):
+        self.loop = loop
+        self.tasks = tasks
+        self.running = False
+        self.profiles = 0
+
+    async def sample(self, seconds, interval) -> dict:
+        if self.running:
+            raise ProfileError("a profile is already running")
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            raise ProfileError("profiling needs SIGPROF and the event loop on the main thread")
+        stacks = collections.Counter()
+        sessions = collections.Counter()
+        other = 0
+
+        def on_sample(signum, frame):
+            nonlocal other
+            if frame is None:
+                return
+            if is_idle(frame):
+                other += 1
+                return
+            stacks[tuple(stack_of(frame))] += 1
+            session_id = self.tasks.session_of(asyncio.current_task(self.loop))
+            if session_id is not None:
+                sessions[session_id] += 1
+
+        self.running = True
+        previous = signal.signal(signal.SIGPROF, on_sample)
+        cpu = time.process_time()
+        try:
+            signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            await asyncio.sleep(seconds)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, previous)
+            self.running = False
+        self.profiles += 1
+        return {
+            "stacks": stacks,
+            "sessions": sessions,
+            "other_threads": other,
+            "cpu_seconds": time.process_time() - cpu,
+        }
+
+    @staticmethod
+    def report(profile, seconds, interval, top=30) -> dict:
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        for stack, count in profile["stacks"].items():
+            self_counts[stack[-1]] += count
+            for function in set(stack):
+                total_counts[function] += count
+        samples = sum(profile["stacks"].values())
+        # The timer fires at the kernel's tick at best, so CPU time is
+        # measured and split between the loop and other threads by samples
+        loop_share = samples / (samples + profile["other_threads"]) if samples else 0.0
+        return {
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "other_threads_samples": profile["other_threads"],
+            "process_cpu_share": profile["cpu_seconds"] / seconds,
+            "loop_cpu_share": profile["cpu_seconds"] * loop_share / seconds,
+            "top_self": [
+                {"function": function, "samples": count, "share": count / samples}
+                for function, count in self_counts.most_common(top)
+            ],
+            "top_total": [
+                {"function": function, "samples": count, "share": count / samples}
+                for function, count in total_counts.most_common(top)
+            ],
+            "sessions": dict(profile["sessions"].most_common()),
+        }
+
+    @staticmethod
+    def folded(profile) -> str:
+        """Folded stacks ("a;b;c count"), for flamegraph.pl or speedscope"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+class StallMonitor:
+    """Logs every event loop step that holds the loop past `threshold` seconds
+
+    The loop runs a heartbeat every `interval` seconds. A watchdog thread
+    checks it several times per threshold; when the heartbeat is overdue it
+    captures the loop thread's stack and current task, i.e. the code
+    blocking the loop while it still is. The heartbeat, once it runs again,
+    measures how late it was, logs the stall with what was captured and
+    keeps the last `keep` of them. Stall counts go to `counter` (a metric
+    family labelled by handler) if given.
+    """
+
+    def __init__(self, loop, thread_id, tasks: TaskRegistry, threshold=0.05, interval=0.01,
+                 keep=100, counter=None):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.tasks = tasks
+        self.threshold = threshold
+        self.interval = interval
+        self.counter = counter
+        self.recent = collections.deque(maxlen=keep)
+        self.beat_at = time.perf_counter()
+        self.captured = None
+        self.timer = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+        self.stalls = 0
+        self.longest = 0.0
+
+    def start(self):
+        self.beat_at = time.perf_counter()
+        self.timer = self.loop.call_later(self.interval, self.beat)
+        self.thread = threading.Thread(target=self.watch, name="stall-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.timer:
+            self.timer.cancel()
+        if self.thread:
+            self.thread.join()
+
+    def beat(self):
+        now = time.perf_counter()
+        late = now - self.beat_at - self.interval
+        captured, self.captured = self.captured, None
+        if late > self.threshold:
+            self.report(late, captured)
+        self.beat_at = now
+        self.timer = self.loop.call_later(self.interval, self.beat)
+
+    def watch(self):
+        check = self.threshold / 4
+        while not self.stopping.wait(check):
+            overdue = time.perf_counter() - self.beat_at - self.interval
+            if overdue <= self.threshold or self.captured is not None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            self.captured = {
+                "handler": handler_of(task) if task is not None else describe(frame),
+                "session": self.tasks.session_of(task),
+                "stack": stack_of(frame, depth=16),
+            }
+
+    def report(self, seconds, captured):
+        captured = captured or {"handler": "unknown", "session": None, "stack": []}
+        self.stalls += 1
+        self.longest = max(self.longest, seconds)
+        if self.counter is not None:
+            self.counter.labels(captured["handler"]).inc()
+        self.recent.append(dict(captured, at=time.time(), ms=round(seconds * 1000, 1)))
+        where = captured["stack"][-1] if captured["stack"] else "?"
+        session = f" (session {captured['session']})" if captured["session"] else ""
+        print(f"Slow callback: event loop blocked {seconds * 1000:.0f} ms in "
+              f"{captured['handler']}{session} at {where}")
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "longest_ms": self.longest * 1000,
+            "recent": list(self.recent),
+        }
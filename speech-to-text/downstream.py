@@ -0,0 +1,81 @@
+"""
+Downstream transcript encoding
+By default every provider message is forwarded as it arrives. Clients can opt
+in to cheaper updates: interims sent as deltas against the previous
+hypothesis (`?interim=delta`) and/or coalesced to a maximum rate
+(`?interim_hz=5`). Finals always go out immediately.
+"""
+
+from os.path import commonprefix
+
+from pipeline import FINAL, INTERIM
+
+
+class DownstreamEncoder:
+    """Decides what is written to the client socket, and when
+
+    `text_of(payload)` extracts the hypothesis text from an interim payload.
+    Outgoing messages are either pre-serialized strings (provider passthrough)
+    or dicts to be JSON-encoded.
+    """
+
+    def __init__(self, text_of, delta=False, interim_hz=0.0):
+        self.text_of = text_of
+        self.delta = delta
+        self.interval = 1.0 / interim_hz if interim_hz > 0 else 0.0
+        self.sent_text = ""
+        self.last_interim_at = float("-inf")
+        self.pending = None
+
+        self.interims_in = 0
+        self.interims_out = 0
+
+    def encode_interim(self, payload):
+        if not self.delta:
+            return payload
+        text = self.text_of(payload)
+        keep = len(commonprefix((self.sent_text, text)))
+        self.sent_text = text
+        # Client keeps the first `keep` characters of its interim and appends `text`
+        return {"type": "interim_delta", "keep": keep, "text": text[keep:]}
+
+    def push(self, payload, kind, now) -> list:
+        """Messages to send now for this downlink item"""
+        if kind == FINAL:
+            # A final supersedes any interim still waiting for its slot
+            self.pending = None
+            self.sent_text = ""
+            return [payload]
+        if kind != INTERIM:
+            # Status, errors and entity matches leave the interim alone
+            return [payload]
+        self.interims_in += 1
+        if now - self.last_interim_at >= self.interval:
+            self.last_interim_at = now
+            self.interims_out += 1
+            return [self.encode_interim(payload)]
+        self.pending = payload
+        return []
+
+    def wait_time(self, now):
+        """Seconds until a held-back interim is due, or None if none is held"""
+        if self.pending is None:
+            return None
+        return max(0.0, self.last_interim_at + self.interval - now)
+
+    def flush(self, now) -> list:
+        """Release the held-back interim once its slot has come"""
+        if self.pending is None:
+            return []
+        payload, self.pending = self.pending, None
+        self.last_interim_at = now
+        self.interims_out += 1
+        return [self.encode_interim(payload)]
+
+    def stats(self) -> dict:
+        return {
+            "delta": self.delta,
+            "interim_hz": 1.0 / self.interval if self.interval else 0.0,
+            "interims_in": self.interims_in,
+            "interims_out": self.interims_out,
+        }
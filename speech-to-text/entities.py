@@ -0,0 +1,191 @@
+"""
+Streaming entity spotting
+A client pushes its vocabulary (names, projects, phrases) over the socket;
+it is compiled into an Aho-Corasick automaton, so a transcript is matched
+against every term in one pass whatever the vocabulary size. Interims mostly
+extend the previous hypothesis, so EntitySpotter keeps the automaton state
+at every character and only scans the part of the text that changed.
+"""
+
+import re
+from collections import OrderedDict, deque
+from os.path import commonprefix
+
+SEPARATORS = re.compile(r"[\W_]+")
+SHIFT = 21  # bits of a code point; goto keys are (state << SHIFT) | ord(char)
+
+
+def normalize(text: str) -> str:
+    """Casefolded words joined by single spaces"""
+    return SEPARATORS.sub(" ", text.casefold())
+
+
+class EntityAutomaton:
+    """Aho-Corasick automaton over whole-word, case-insensitive terms
+
+    `terms` are strings or dicts with a `term` and optional `kind` and `id`,
+    returned with every match. Patterns are the normalized term between
+    spaces, and the text is scanned as " " + normalized text, so a match
+    always starts and ends on a word boundary ("Ann" never matches
+    "planning"). Transitions live in one dict keyed by (state, char) rather
+    than a dict per state, which keeps thousands of terms to a few MB.
+    """
+
+    def __init__(self, terms):
+        self.terms = []
+        self.lengths = []
+        self.goto = {}
+        self.fail = [0]
+        self.out = {}  # state -> indexes of the terms ending there
+        for term in terms:
+            if isinstance(term, str):
+                term = {"term": term}
+            elif not isinstance(term, dict) or not isinstance(term.get("term"), str):
+                raise ValueError(f"invalid term {term!r}")
+            words = normalize(term["term"]).strip()
+            if not words:
+                continue
+            self.add(" " + words + " ", len(self.terms))
+            self.terms.append({key: term[key] for key in ("term", "kind", "id") if key in term})
+            self.lengths.append(len(words) + 2)
+        self.link()
+
+    def add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            key = state << SHIFT | ord(char)
+            nxt = self.goto.get(key)
+            if nxt is None:
+                nxt = self.goto[key] = len(self.fail)
+                self.fail.append(0)
+            state = nxt
+        self.out[state] = self.out.get(state, ()) + (index,)
+
+    def link(self):
+        """Failure links, breadth first, merging each state's outputs with its fallback's"""
+        children = {}
+        for key, child in self.goto.items():
+            children.setdefault(key >> SHIFT, []).append((key & ((1 << SHIFT) - 1), child))
+        queue = deque(child for _, child in children.get(0, ()))
+        while queue:
+            state = queue.popleft()
+            for code, child in children.get(state, ()):
+                fallback = self.fail[state]
+                while True:
+                    nxt = self.goto.get(fallback << SHIFT | code)
+                    if nxt is not None or fallback == 0:
+                        break
+                    fallback = self.fail[fallback]
+                self.fail[child] = nxt or 0
+                if self.fail[child] in self.out:
+                    self.out[child] = self.out.get(child, ()) + self.out[self.fail[child]]
+                queue.append(child)
+
+    def scan(self, text, state, states, matches):
+        """Feed `text` from `state`, appending the state after each character
+        to `states` and (end, term index) of each match to `matches`"""
+        goto, fail, out = self.goto, self.fail, self.out
+        end = len(states) - 1
+        for char in text:
+            code = ord(char)
+            while True:
+                nxt = goto.get(state << SHIFT | code)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            states.append(state)
+            if state in out:
+                matches.extend((end, index) for index in out[state])
+            end += 1
+        return state
+
+    def __len__(self):
+        return len(self.terms)
+
+
+class AutomatonCache:
+    """Compiled automata by vocabulary, so sessions pushing the same list
+    share one"""
+
+    def __init__(self, size=32):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, terms):
+        automaton = self.entries.get(repr(terms))
+        if automaton is not None:
+            self.entries.move_to_end(repr(terms))
+        return automaton
+
+    def put(self, terms, automaton: EntityAutomaton):
+        self.entries[repr(terms)] = automaton
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class EntitySpotter:
+    """Incremental matching of one session's transcripts
+
+    `update` takes each interim and final of the current utterance in turn.
+    The text is matched from where it first differs from the previous
+    hypothesis. A term at the very end of an interim is only reported once
+    the next word starts (or in the final), since the speaker may still be
+    saying a longer word. Interim matches are reported once per utterance;
+    a final reports every match in it.
+    """
+
+    def __init__(self, automaton: EntityAutomaton):
+        self.automaton = automaton
+        self.reset()
+        self.matched = 0
+
+    def reset(self):
+        self.text = ""
+        self.states = [0]
+        self.matches = []  # (end, term index) within self.text
+        self.reported = set()
+
+    def update(self, result: dict) -> list:
+        """`entity_match` payloads for a normalized provider result"""
+        is_final = result["is_final"]
+        text = " " + normalize(result["text"]).lstrip()
+        if is_final and not text.endswith(" "):
+            text += " "
+        keep = len(commonprefix((self.text, text)))
+        del self.states[keep + 1:]
+        while self.matches and self.matches[-1][0] >= keep:
+            self.matches.pop()
+        found = len(self.matches)
+        self.automaton.scan(text[keep:], self.states[keep], self.states, self.matches)
+        self.text = text
+
+        if is_final:
+            new = self.matches
+        else:
+            new = []
+            for end, index in self.matches[found:]:
+                start = end + 1 - self.automaton.lengths[index]
+                if (start, index) not in self.reported:
+                    self.reported.add((start, index))
+                    new.append((end, index))
+        payloads = [self.payload(index, result) for _, index in new]
+        self.matched += len(payloads)
+        if is_final:
+            self.reset()
+        return payloads
+
+    def payload(self, index, result) -> dict:
+        start = result["start_ms"]
+        return dict(
+            {"type": "entity_match"},
+            **self.automaton.terms[index],
+            is_final=result["is_final"],
+            start=start / 1000,
+            duration=(result["end_ms"] - start) / 1000,
+        )
+
+    def stats(self) -> dict:
+        return {"terms": len(self.automaton), "matches": self.matched}
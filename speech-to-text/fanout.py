@@ -0,0 +1,139 @@
+"""
+Transcript fan-out to read-only subscribers
+Live captions have many viewers per speaker. Every message a session sends
+its client is also published once to the session's Topic, already
+serialized; each subscriber socket is written that same str, or for binary
+subscribers the same UTF-8 bytes, encoded once per message. A viewer that
+falls behind never slows the session or the other viewers: its queue is
+small and keeps the newest messages, dropping the oldest.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from pipeline import INTERIM, QueueClosed
+
+
+class Message:
+    """A published message, shared by every subscriber"""
+
+    __slots__ = ("text", "kind", "published_at", "_data")
+
+    def __init__(self, text: str, kind: str):
+        self.text = text
+        self.kind = kind
+        self.published_at = time.perf_counter()
+        self._data = None
+
+    @property
+    def data(self) -> bytes:
+        """UTF-8 encoding, computed for the first binary subscriber only"""
+        if self._data is None:
+            self._data = self.text.encode()
+        return self._data
+
+
+class Subscriber:
+    """One viewer's bounded queue with drop-to-latest semantics
+
+    A newer interim replaces a queued one; past `max_items` the oldest
+    message is dropped, finals included, so a stalled viewer resumes at the
+    live edge.
+    """
+
+    def __init__(self, max_items=32):
+        self.items = deque(maxlen=max_items)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def offer(self, message: Message):
+        if message.kind == INTERIM and self.items and self.items[-1].kind == INTERIM:
+            self.items[-1] = message
+            self.coalesced += 1
+        else:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(message)
+        self.ready.set()
+
+    async def get(self) -> Message:
+        """Next message, raise QueueClosed once the topic ended and all are taken"""
+        while not self.items:
+            if self.closed:
+                raise QueueClosed("subscriber")
+            self.ready.clear()
+            await self.ready.wait()
+        self.delivered += 1
+        return self.items.popleft()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class Topic:
+    """A session's published messages and its subscribers"""
+
+    def __init__(self, name):
+        self.name = name
+        self.subscribers = set()
+        self.published = 0
+        self.dropped = 0  # by subscribers that have left
+
+    def publish(self, text: str, kind: str):
+        if not self.subscribers:
+            return
+        message = Message(text, kind)
+        self.published += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(message)
+
+    def subscribe(self, max_items=32) -> Subscriber:
+        subscriber = Subscriber(max_items)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self.dropped += subscriber.dropped
+
+    def close(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped + sum(s.dropped for s in self.subscribers),
+        }
+
+
+class BroadcastHub:
+    """Topics of the sessions live in this process, by session id"""
+
+    def __init__(self):
+        self.topics = {}
+
+    def open(self, name) -> Topic:
+        topic = self.topics[name] = Topic(name)
+        return topic
+
+    def close(self, name):
+        topic = self.topics.pop(name, None)
+        if topic:
+            topic.close()
+
+    def get(self, name):
+        return self.topics.get(name)
+
+    def subscribers(self) -> int:
+        return sum(len(topic.subscribers) for topic in self.topics.values())
+
+    def stats(self) -> dict:
+        return {name: topic.stats() for name, topic in self.topics.items() if topic.subscribers}
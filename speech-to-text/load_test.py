@@ -0,0 +1,174 @@
+"""
+Concurrent-session load generator for the ASR API
+Streams WAV files over N concurrent /ws/assemblyai and /ws/deepgram sessions
+and reports transcript latency percentiles plus relay cost per session.
+
+    python mock_provider.py --latency-ms 150 --jitter-ms 40 &
+    ASSEMBLYAI_URL=ws://localhost:8100/v3/ws python main.py &
+    python load_test.py --sessions 50 --wav sample.wav --server-pid $(pgrep -f main.py)
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import wave
+
+from audio_sources import FRAMES_PER_BUFFER, SAMPLE_RATE, BufferSource, synthetic_speech
+from test_asr import ASRTester, percentile
+from uplink_codecs import BITS, IMA_ADPCM, MULAW, PCM16, ima_encode, mulaw_encode
+
+
+def load_wav(path) -> bytes:
+    """Read a 16 kHz mono PCM16 WAV file"""
+    with wave.open(path, "rb") as wav:
+        if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit PCM")
+        return wav.readframes(wav.getnframes())
+
+
+def encode(pcm: bytes, encoding: str) -> bytes:
+    """PCM16 in a compressed uplink encoding"""
+    if encoding == MULAW:
+        return mulaw_encode(pcm)
+    if encoding == IMA_ADPCM:
+        return ima_encode(pcm)[0]
+    return pcm
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of the relay process from /proc (Linux)"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.peak_rss = 0
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/statm") as f:
+            rss = int(f.read().split()[1]) * self.page_size
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    async def watch(self, interval=0.25):
+        while True:
+            self.rss_bytes()
+            await asyncio.sleep(interval)
+
+
+class LoadSession(ASRTester):
+    """ASRTester that streams an audio buffer in real time and records latencies
+
+    `pcm` is already in `encoding` (see encode()); anything but PCM16 is
+    declared in a config message before the first frame.
+    """
+
+    def __init__(self, provider, api_url, pcm: bytes, frames_per_buffer=FRAMES_PER_BUFFER,
+                 encoding=PCM16):
+        source = BufferSource(pcm, frames_per_buffer=frames_per_buffer, encoding=encoding)
+        super().__init__(provider, source, api_url)
+
+    def handle_response(self, data):
+        self.record_latency(data)
+
+    async def run(self):
+        if not await self.connect():
+            self.errors += 1
+            return
+        try:
+            await asyncio.gather(self.send_audio(), self.receive_transcripts())
+        finally:
+            await self.websocket.close()
+
+
+async def run_load(args, pcm_buffers):
+    providers = ["assemblyai", "deepgram"] if args.provider == "both" else [args.provider]
+    sessions = [
+        LoadSession(
+            providers[i % len(providers)],
+            f"{args.url}/ws/{providers[i % len(providers)]}",
+            pcm_buffers[i % len(pcm_buffers)],
+            args.frames_per_buffer,
+            args.encoding,
+        )
+        for i in range(args.sessions)
+    ]
+
+    sampler = ProcessSampler(args.server_pid) if args.server_pid else None
+    watcher = None
+    if sampler:
+        baseline_rss = sampler.rss_bytes()
+        sampler.peak_rss = baseline_rss
+        cpu_before = sampler.cpu_seconds()
+        watcher = asyncio.create_task(sampler.watch())
+
+    async def staggered(i, session):
+        await asyncio.sleep(i * args.ramp_ms / 1000)
+        await session.run()
+
+    started = time.monotonic()
+    await asyncio.gather(*(staggered(i, s) for i, s in enumerate(sessions)))
+    wall = time.monotonic() - started
+
+    print(f"\n{'='*60}")
+    print(f"Sessions: {args.sessions} ({args.provider})  wall: {wall:.1f}s")
+    print(f"{'='*60}")
+    for provider in providers:
+        group = [s for s in sessions if s.provider == provider]
+        first_interim = [x for s in group for x in s.first_interim]
+        final = [x for s in group for x in s.final]
+        errors = sum(s.errors for s in group)
+        print(f"\n{provider}: {len(group)} sessions, {errors} errors")
+        for label, values in (("first interim", first_interim), ("final", final)):
+            print(
+                f"  {label:<14} n={len(values):<5} "
+                f"p50={percentile(values, 50)*1000:7.1f}ms "
+                f"p95={percentile(values, 95)*1000:7.1f}ms "
+                f"p99={percentile(values, 99)*1000:7.1f}ms"
+            )
+
+    if sampler:
+        watcher.cancel()
+        cores = (sampler.cpu_seconds() - cpu_before) / wall
+        print(f"\nRelay process {args.server_pid}:")
+        print(f"  CPU: {cores:.3f} cores")
+        if cores > 0:
+            print(f"  Sessions per core: {args.sessions / cores:.0f}")
+        rss_delta = sampler.peak_rss - baseline_rss
+        print(f"  RSS per session: {rss_delta / args.sessions / 1024:.1f} KiB "
+              f"(peak {sampler.peak_rss / 2**20:.1f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR API load generator")
+    parser.add_argument("--url", default="ws://localhost:8000", help="Relay base URL")
+    parser.add_argument("--provider", default="assemblyai",
+                        choices=["assemblyai", "deepgram", "race", "both"])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--wav", nargs="*", default=[],
+                        help="16 kHz mono PCM16 WAV files, assigned round-robin")
+    parser.add_argument("--duration", type=float, default=20.0,
+                        help="Seconds of synthetic audio when no WAV is given")
+    parser.add_argument("--frames-per-buffer", type=int, default=FRAMES_PER_BUFFER)
+    parser.add_argument("--encoding", default=PCM16, choices=sorted(BITS),
+                        help="Uplink encoding declared to the relay")
+    parser.add_argument("--ramp-ms", type=float, default=20.0,
+                        help="Delay between session starts")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="Relay PID for CPU/RSS accounting (Linux)")
+    args = parser.parse_args()
+
+    pcm_buffers = [load_wav(path) for path in args.wav] or [synthetic_speech(args.duration)]
+    pcm_buffers = [encode(pcm, args.encoding) for pcm in pcm_buffers]
+    asyncio.run(run_load(args, pcm_buffers))
+
+
+if __name__ == "__main__":
+    main()
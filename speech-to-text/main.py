@@ -1,14 +1,38 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from starlette.websockets import WebSocketState
 import asyncio
+import hmac
 import json
-import websockets
+import os
+import threading
+import time
 from typing import Optional
 import base64
-from deepgram import DeepgramClient
-from deepgram.core.events import EventType
-from urllib.parse import urlencode
+import tempfile
+import uuid
+from providers import Provider
+from provider_registry import ProviderRegistry, ProviderSpec
+from upstream_pool import UpstreamPool
+from pipeline import AUDIO, CONTROL, DROP_OLDEST, FINAL, INTERIM, BoundedQueue, QueueClosed
+from vad import VoiceActivityGate
+from audio_ingest import AudioIngest, ChannelSplitter
+from packet_sizing import PacketSizer
+from race import RaceArbiter, RaceStats
+from upstream_link import UpstreamLink
+from downstream import DownstreamEncoder
+from uplink_codecs import PCM16, make_decoder
+from multichannel import TranscriptMerger
+from fanout import BroadcastHub
+from transcript_store import TranscriptStore
+from capture import CaptureStore
+from entities import AutomatonCache, EntityAutomaton, EntitySpotter
+from admission import AdmissionController, Rejected
+from mux import StreamSocket, split_frame, stream_id_of, tag
+from diagnostics import ProfileError, SamplingProfiler, StallMonitor, TaskRegistry, current_session
+import batch
+from metrics import LAG_BUCKETS, AudioClock, Registry, StageLatency, probe_loop_lag
 
 app = FastAPI(title="ASR API Server")
 
@@ -30,156 +54,1447 @@ ASSEMBLYAI_PARAMS = {
     "sample_rate": 16000,
     "format_turns": True,
 }
-ASSEMBLYAI_ENDPOINT = f"wss://streaming.assemblyai.com/v3/ws?{urlencode(ASSEMBLYAI_PARAMS)}"
+# Point at mock_provider.py for local load tests: ASSEMBLYAI_URL=ws://localhost:8100/v3/ws
+ASSEMBLYAI_URL = os.getenv("ASSEMBLYAI_URL", "wss://streaming.assemblyai.com/v3/ws")
+
+# Deepgram Configuration
+DEEPGRAM_PARAMS = {
+    "model": "flux-general-en",
+    "encoding": "linear16",
+    "sample_rate": 16000,
+    "channels": 1,
+    "interim_results": True,
+}
+# Point at mock_provider.py for local load tests: DEEPGRAM_URL=ws://localhost:8100/v1/listen
+DEEPGRAM_URL = os.getenv("DEEPGRAM_URL", "wss://api.deepgram.com/v1/listen")
+
+# Upstream packet duration. With ADAPTIVE_PACKETS each /ws/{provider} and
+# /ws/mux session resizes its packets within the provider's limits (AssemblyAI
+# 50-1000 ms, Deepgram 25-250 ms) from measured send time and turnaround.
+ASSEMBLYAI_PACKET_MS = int(os.getenv("ASSEMBLYAI_PACKET_MS", "50"))
+DEEPGRAM_PACKET_MS = int(os.getenv("DEEPGRAM_PACKET_MS", "50"))
+ADAPTIVE_PACKETS = os.getenv("ADAPTIVE_PACKETS", "1") == "1"
+
+# Provider plugins, imported on first use. ENABLED_PROVIDERS limits a
+# deployment to a subset; the others are never loaded.
+ENABLED_PROVIDERS = [
+    name for name in os.getenv("ENABLED_PROVIDERS", "assemblyai,deepgram").split(",") if name
+]
+PROVIDERS = ProviderRegistry(
+    [
+        ProviderSpec(
+            "assemblyai", "AssemblyAI", "provider_assemblyai", "AssemblyAIProvider",
+            ASSEMBLYAI_URL, ASSEMBLYAI_PARAMS, ASSEMBLYAI_API_KEY,
+            sample_rate=ASSEMBLYAI_PARAMS["sample_rate"], packet_ms=ASSEMBLYAI_PACKET_MS,
+            min_packet_ms=50, max_packet_ms=1000
+        ),
+        ProviderSpec(
+            "deepgram", "Deepgram", "provider_deepgram", "DeepgramProvider",
+            DEEPGRAM_URL, DEEPGRAM_PARAMS, DEEPGRAM_API_KEY,
+            sample_rate=DEEPGRAM_PARAMS["sample_rate"], packet_ms=DEEPGRAM_PACKET_MS,
+            min_packet_ms=25, max_packet_ms=250
+        ),
+    ],
+    enabled=ENABLED_PROVIDERS
+)
+
+# Transparent reconnect: the last REPLAY_SECONDS of audio sent upstream are
+# kept per session and replayed when the provider socket drops
+REPLAY_SECONDS = float(os.getenv("REPLAY_SECONDS", "5"))
+RECONNECT_ATTEMPTS = int(os.getenv("RECONNECT_ATTEMPTS", "3"))
+
+# Providers streamed to concurrently by /ws/race
+RACE_PROVIDERS = [
+    name for name in os.getenv("RACE_PROVIDERS", "assemblyai,deepgram").split(",") if name in PROVIDERS
+]
+
+# Prometheus metrics (GET /metrics). Per-frame recording uses label children
+# created once per session, so it costs an add or a bucket lookup.
+metrics = Registry()
+BYTES = metrics.counter(
+    "asr_bytes_total",
+    "Bytes relayed by direction (client_in, upstream_out, upstream_in, client_out)",
+    ("provider", "direction")
+)
+HANDSHAKE_SECONDS = metrics.histogram(
+    "asr_upstream_handshake_seconds", "Upstream WebSocket handshake time", ("provider",)
+)
+STAGE_SECONDS = metrics.histogram(
+    "asr_stage_latency_seconds", "Latency added by each relay stage", ("provider", "stage")
+)
+LOOP_LAG_SECONDS = metrics.histogram(
+    "asr_event_loop_lag_seconds", "How late the event loop wakes a sleeping task", buckets=LAG_BUCKETS
+).labels()
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.05"))
+TRANSCRIPT_COMMIT_SECONDS = metrics.histogram(
+    "asr_transcript_commit_seconds", "Transcript log batch commit time"
+).labels()
+CAPTURE_WRITE_SECONDS = metrics.histogram(
+    "asr_capture_write_seconds", "Session capture batch write time"
+).labels()
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "asr_admission_wait_seconds", "Time a session waited for a provider slot", ("provider",)
+)
+FANOUT_SECONDS = metrics.histogram(
+    "asr_fanout_seconds", "Time from publishing a message to writing it to a subscriber"
+).labels()
+SLOW_CALLBACKS = metrics.counter(
+    "asr_slow_callbacks_total", "Event loop steps over DEBUG_SLOW_CALLBACK_MS, by handler", ("handler",)
+)
+
+# Pre-warmed upstream sessions. Idle provider sessions may be billed, so the
+# pool is off unless a size is configured.
+ASSEMBLYAI_POOL_SIZE = int(os.getenv("ASSEMBLYAI_POOL_SIZE", "0"))
+DEEPGRAM_POOL_SIZE = int(os.getenv("DEEPGRAM_POOL_SIZE", "0"))
+POOL_MAX_IDLE_SECONDS = float(os.getenv("POOL_MAX_IDLE_SECONDS", "15"))
+POOL_MAX_AGE_SECONDS = float(os.getenv("POOL_MAX_AGE_SECONDS", "300"))
+
+def make_pool(name, size):
+    """Pool for a provider; the plugin is loaded now only if it pre-warms"""
+    return UpstreamPool(
+        name,
+        lambda: PROVIDERS[name].connect(),
+        size=size,
+        max_idle=POOL_MAX_IDLE_SECONDS,
+        max_age=POOL_MAX_AGE_SECONDS,
+        keepalive=PROVIDERS[name].keepalive_message if size > 0 else None,
+        handshake_histogram=HANDSHAKE_SECONDS.labels(name),
+    )
+
+
+POOL_SIZES = {"assemblyai": ASSEMBLYAI_POOL_SIZE, "deepgram": DEEPGRAM_POOL_SIZE}
+pools = {name: make_pool(name, POOL_SIZES[name]) for name in PROVIDERS}
+
+# Bounded queues between client and upstream, per session and direction.
+# Policies: block, drop_oldest (audio/interims), coalesce (interims only).
+UPLINK_POLICY = os.getenv("UPLINK_POLICY", "block")
+UPLINK_MAX_BYTES = int(os.getenv("UPLINK_MAX_BYTES", str(10 * 16000 * 2)))  # 10 s of audio
+DOWNLINK_POLICY = os.getenv("DOWNLINK_POLICY", "coalesce")
+DOWNLINK_MAX_ITEMS = int(os.getenv("DOWNLINK_MAX_ITEMS", "64"))
+DOWNLINK_MAX_BYTES = int(os.getenv("DOWNLINK_MAX_BYTES", str(256 * 1024)))
+
+# Server-side voice activity detection: suppress long silences upstream
+VAD_ENABLED = os.getenv("VAD_ENABLED", "0") == "1"
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "500"))  # RMS of int16 samples
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "1000"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+
+# Default downstream mode; clients override with ?interim=delta&interim_hz=5.
+# "full" forwards every interim as-is, "delta" sends only the changed suffix.
+DOWNSTREAM_INTERIM = os.getenv("DOWNSTREAM_INTERIM", "full")
+DOWNSTREAM_INTERIM_HZ = float(os.getenv("DOWNSTREAM_INTERIM_HZ", "0"))  # 0 = unlimited
+
+# Worker processes for `python main.py` (see workers.py), and how long live
+# sessions get to finish when a worker is stopped or restarted
+WORKERS = int(os.getenv("WORKERS", "1"))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))
+
+# Offline transcription (POST /transcribe): upstream sessions open at once per
+# provider across all uploads, chunk length bounds, and streaming speed as a
+# multiple of real time (0 = as fast as the provider accepts)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MIN_CHUNK_SECONDS = float(os.getenv("BATCH_MIN_CHUNK_SECONDS", "20"))
+BATCH_MAX_CHUNK_SECONDS = float(os.getenv("BATCH_MAX_CHUNK_SECONDS", "40"))
+BATCH_SPEED = float(os.getenv("BATCH_SPEED", "4"))
+if not 0 < BATCH_MIN_CHUNK_SECONDS < BATCH_MAX_CHUNK_SECONDS:
+    raise ValueError("BATCH_MIN_CHUNK_SECONDS must be above 0 and below BATCH_MAX_CHUNK_SECONDS")
+batch_limits = {name: asyncio.Semaphore(BATCH_CONCURRENCY) for name in PROVIDERS}
+
+# Inbound audio formats accepted from clients (?sample_rate=48000&channels=2)
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 96000
+MAX_CHANNELS = 8
+
+# Multi-channel sessions (/ws/multichannel/{provider}): one upstream session
+# per channel, and how long a final may wait for the other channels so the
+# merged stream stays in spoken order
+MULTICHANNEL_MAX_CHANNELS = int(os.getenv("MULTICHANNEL_MAX_CHANNELS", "16"))
+MULTICHANNEL_HOLD_MS = float(os.getenv("MULTICHANNEL_HOLD_MS", "1500"))
+
+# Durable transcript log (GET /search): finals of /ws/assemblyai and
+# /ws/deepgram sessions are appended to this SQLite file, off unless set.
+# Writes are batched and group-committed every TRANSCRIPT_FLUSH_MS.
+TRANSCRIPT_DB = os.getenv("TRANSCRIPT_DB", "")
+TRANSCRIPT_FLUSH_MS = float(os.getenv("TRANSCRIPT_FLUSH_MS", "200"))
+TRANSCRIPT_BATCH_ROWS = int(os.getenv("TRANSCRIPT_BATCH_ROWS", "256"))
+
+# Session capture for replay.py: client audio and every upstream message of
+# sessions connecting with ?record=1 (or of every session with CAPTURE_ALL=1)
+# are written under CAPTURE_DIR, off unless set. Writes are batched every
+# CAPTURE_FLUSH_MS; past CAPTURE_MAX_PENDING_MB waiting, recordings are cut short.
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")
+CAPTURE_ALL = os.getenv("CAPTURE_ALL", "0") == "1"
+CAPTURE_FLUSH_MS = float(os.getenv("CAPTURE_FLUSH_MS", "200"))
+CAPTURE_MAX_PENDING_MB = float(os.getenv("CAPTURE_MAX_PENDING_MB", "64"))
+
+# Admission control: concurrent sessions each provider account allows (0 =
+# unlimited) and each tenant (?api_key=) may hold, tenant weights for the
+# fair queue ("key=3,other=2", default 1), and how long a session may wait
+# for a slot before being turned away with a retry-after
+ASSEMBLYAI_MAX_SESSIONS = int(os.getenv("ASSEMBLYAI_MAX_SESSIONS", "0"))
+DEEPGRAM_MAX_SESSIONS = int(os.getenv("DEEPGRAM_MAX_SESSIONS", "0"))
+TENANT_MAX_SESSIONS = int(os.getenv("TENANT_MAX_SESSIONS", "0"))
+TENANT_WEIGHTS = {
+    key: float(weight)
+    for key, weight in (
+        item.split("=") for item in os.getenv("TENANT_WEIGHTS", "").split(",") if item
+    )
+}
+ADMISSION_QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "5"))
+
+# Entity spotting: most terms a session may push in one vocabulary message,
+# and how many compiled vocabularies are kept for sessions sharing one
+ENTITY_MAX_TERMS = int(os.getenv("ENTITY_MAX_TERMS", "10000"))
+automata = AutomatonCache(int(os.getenv("ENTITY_CACHE_SIZE", "32")))
+
+# Multiplexed sockets (/ws/mux): most logical streams open at once on one socket
+MUX_MAX_STREAMS = int(os.getenv("MUX_MAX_STREAMS", "256"))
+
+# Read-only subscribers (/ws/sessions/{id}/subscribe): messages queued per
+# subscriber before the oldest are dropped
+SUBSCRIBER_QUEUE_ITEMS = int(os.getenv("SUBSCRIBER_QUEUE_ITEMS", "32"))
+
+# Diagnostics (/debug/*): sampling CPU profiles, logging of event loop steps
+# over DEBUG_SLOW_CALLBACK_MS and live tasks per session. Off unless
+# DEBUG_ENDPOINTS=1, and then only for requests with "Authorization: Bearer
+# <DEBUG_TOKEN>", or from loopback when no token is set.
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "0") == "1"
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+DEBUG_SLOW_CALLBACK_MS = float(os.getenv("DEBUG_SLOW_CALLBACK_MS", "50"))
+DEBUG_PROFILE_MAX_SECONDS = float(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "60"))
+
+
+class Session:
+    """Per-connection relay state"""
+    
+    def __init__(self, provider: Provider, ingest: AudioIngest, use_vad: bool = VAD_ENABLED,
+                 adaptive: bool = False, uplink_policy: str = UPLINK_POLICY):
+        self.id = uuid.uuid4().hex[:12]
+        self.provider = provider.name
+        self.terminate_message = provider.terminate_message
+        self.interrupted = False  # ended by a worker drain, not by the client
+        self.failed = False  # upstream gone for good (race and multichannel legs)
+        self.ingest = ingest
+        self.uplink = BoundedQueue(
+            "uplink",
+            max_items=1024,
+            max_bytes=UPLINK_MAX_BYTES,
+            policy=uplink_policy
+        )
+        self.downlink = BoundedQueue(
+            "downlink",
+            max_items=DOWNLINK_MAX_ITEMS,
+            max_bytes=DOWNLINK_MAX_BYTES,
+            policy=DOWNLINK_POLICY
+        )
+        self.link = None
+        self.encoder = None
+        self.decoder = None  # compressed uplink encoding, None = PCM16
+        self.audio_started = False
+        self.spotter = None  # entity spotting, once the client sends a vocabulary
+        self.recording = None  # capture for replay.py, if requested
+        self.vad = None
+        self.bytes_per_ms = provider.sample_rate * 2 / 1000
+        self.sizer = None  # adaptive packet sizing
+        if adaptive and ingest is not None:
+            self.sizer = PacketSizer(provider.packet_ms, provider.min_packet_ms, provider.max_packet_ms)
+            ingest.set_packet_ms(self.sizer.packet_ms)
+        # Tracing: when each packet was ingested/sent, and per-stage latency.
+        # Adaptive packets are a whole number of the smallest size.
+        self.clock = AudioClock(self.sizer.min_ms if self.sizer else provider.packet_ms, self.bytes_per_ms)
+        self.latency = StageLatency(STAGE_SECONDS, provider.name)
+        self.awaiting_interim = True
+        self.bytes_client_in = BYTES.labels(provider.name, "client_in")
+        self.bytes_upstream_out = BYTES.labels(provider.name, "upstream_out")
+        self.bytes_upstream_in = BYTES.labels(provider.name, "upstream_in")
+        self.bytes_client_out = BYTES.labels(provider.name, "client_out")
+        if use_vad:
+            self.vad = VoiceActivityGate(
+                threshold=VAD_THRESHOLD,
+                hangover_ms=VAD_HANGOVER_MS,
+                preroll_ms=VAD_PREROLL_MS,
+                keepalive=provider.keepalive_message
+            )
+    
+    async def send_audio(self, audio: bytes):
+        """Queue client audio for upstream: decode, ingest, then the VAD gate if enabled"""
+        if self.recording:
+            self.recording.audio(audio)
+        await self.send_packets(self.ingest.process(self.decode(audio)))
+    
+    def decode(self, audio: bytes):
+        """PCM16 for a client frame in the negotiated uplink encoding"""
+        self.audio_started = True
+        if self.decoder is None:
+            return audio
+        return self.decoder.decode(audio)
+    
+    async def flush_audio(self):
+        """Send the partial packet left in the ingest stage"""
+        await self.send_packets(self.ingest.flush())
+    
+    def fail(self):
+        """The provider is gone for good: stop queueing audio for it, and
+        release anyone blocked on a full uplink"""
+        self.failed = True
+        self.uplink.close()
+    
+    async def end_input(self):
+        """Stop forwarding audio and let the provider finalize and close"""
+        if self.uplink.closed:
+            return
+        await self.uplink.put(self.terminate_message)
+        self.uplink.close()
+    
+    async def send_packets(self, packets: list):
+        now = time.perf_counter()
+        for packet in packets:
+            if self.vad is None:
+                self.clock.ingest(now, len(packet))
+                await self.uplink.put(packet, len(packet), AUDIO)
+                continue
+            for payload in self.vad.process(packet):
+                # Silent keepalives are audio on the provider's clock too
+                if isinstance(payload, bytes):
+                    self.clock.ingest(now, len(payload))
+                    await self.uplink.put(payload, len(payload), AUDIO)
+                else:
+                    await self.uplink.put(payload, len(payload), CONTROL)
+    
+    def on_sent(self, payload, seconds: float = 0.0):
+        """Account for a payload just sent upstream, which took `seconds`"""
+        if isinstance(payload, bytes):
+            now = time.perf_counter()
+            self.clock.send(now, len(payload))
+            self.latency.observe("uplink_queue", self.uplink.last_wait)
+            self.bytes_upstream_out.inc(len(payload))
+            if self.sizer:
+                self.sizer.on_send(seconds, len(payload) / self.bytes_per_ms, self.uplink.bytes / self.bytes_per_ms)
+                packet_ms = self.sizer.update(now)
+                if packet_ms:
+                    self.ingest.set_packet_ms(packet_ms)
+    
+    def on_result(self, result: Optional[dict], size: int):
+        """Attribute the latency of a provider result to the audio it describes"""
+        self.bytes_upstream_in.inc(size)
+        if result is None:
+            return
+        now = time.perf_counter()
+        sent = self.clock.sent_at(result["end_ms"])
+        if sent is not None:
+            self.latency.observe("provider", now - sent)
+            if self.sizer:
+                self.sizer.on_turnaround(now - sent)
+        ingested = self.clock.ingested_at(result["end_ms"])
+        if ingested is None:
+            return
+        if result["is_final"]:
+            self.awaiting_interim = True
+            self.latency.observe("ingest_to_final", now - ingested)
+        elif self.awaiting_interim:
+            self.awaiting_interim = False
+            self.latency.observe("ingest_to_first_interim", now - ingested)
+    
+    @property
+    def encoding(self) -> str:
+        return self.decoder.ENCODING if self.decoder else PCM16
+    
+    def stats(self) -> dict:
+        stats = {
+            "provider": self.provider,
+            "encoding": self.encoding,
+            "uplink": self.uplink.stats(),
+            "downlink": self.downlink.stats()
+        }
+        if self.vad:
+            stats["vad"] = self.vad.stats()
+        if self.link:
+            stats["upstream"] = self.link.stats()
+        if self.encoder:
+            stats["downstream"] = self.encoder.stats()
+        if self.spotter:
+            stats["entities"] = self.spotter.stats()
+        if self.sizer:
+            stats["packets"] = self.sizer.stats()
+        stats["latency"] = self.latency.stats()
+        return stats
+
+
+active_sessions = {}
+admission = AdmissionController(
+    {
+        name: limit
+        for name, limit in (("assemblyai", ASSEMBLYAI_MAX_SESSIONS), ("deepgram", DEEPGRAM_MAX_SESSIONS))
+        if name in PROVIDERS
+    },
+    tenant_limit=TENANT_MAX_SESSIONS,
+    weights=TENANT_WEIGHTS,
+    queue_seconds=ADMISSION_QUEUE_SECONDS,
+    wait_histograms={name: ADMISSION_WAIT_SECONDS.labels(name) for name in PROVIDERS}
+)
+# Session id -> topic of the messages sent to its client, for subscribers
+hub = BroadcastHub()
+transcripts = None
+if TRANSCRIPT_DB:
+    transcripts = TranscriptStore(
+        TRANSCRIPT_DB,
+        flush_interval=TRANSCRIPT_FLUSH_MS / 1000,
+        batch_rows=TRANSCRIPT_BATCH_ROWS,
+        commit_histogram=TRANSCRIPT_COMMIT_SECONDS
+    )
+captures = None
+if CAPTURE_DIR:
+    captures = CaptureStore(
+        CAPTURE_DIR,
+        flush_interval=CAPTURE_FLUSH_MS / 1000,
+        max_pending_bytes=int(CAPTURE_MAX_PENDING_MB * 1024 * 1024),
+        write_histogram=CAPTURE_WRITE_SECONDS
+    )
+race_stats = RaceStats(RACE_PROVIDERS)
+reconnect_stats = {"reconnects": 0, "replayed_bytes": 0, "reconnect_seconds_total": 0.0}
+lag_probe = None
+# Set up at startup when DEBUG_ENDPOINTS is on
+debug_tasks = None
+profiler = None
+stall_monitor = None
+# Set while a worker shuts down gracefully (see workers.py)
+draining = False
+
+
+def sessions_by_provider() -> dict:
+    counts = {(name,): 0 for name in PROVIDERS}
+    for session in active_sessions.values():
+        counts[(session.provider,)] += 1
+    return counts
+
+
+def queue_depths() -> dict:
+    depths = {}
+    for name in PROVIDERS:
+        depths[(name, "uplink")] = depths[(name, "downlink")] = 0
+    for session in active_sessions.values():
+        depths[(session.provider, "uplink")] += len(session.uplink.items)
+        depths[(session.provider, "downlink")] += len(session.downlink.items)
+    return depths
+
+
+metrics.gauge(
+    "asr_sessions_active", "Open upstream sessions", ("provider",), collect=sessions_by_provider
+)
+metrics.gauge(
+    "asr_queue_depth", "Items waiting in session queues", ("provider", "queue"), collect=queue_depths
+)
+metrics.gauge(
+    "asr_pool_idle", "Pre-warmed upstream sessions ready", ("provider",),
+    collect=lambda: {(name,): len(pool.idle) for name, pool in pools.items()}
+)
+metrics.gauge(
+    "asr_subscribers", "Read-only subscribers connected", collect=lambda: {(): hub.subscribers()}
+)
+metrics.counter(
+    "asr_admission_total", "Session admission decisions by requested provider (admitted, spilled, rejected)",
+    ("provider", "outcome"), collect=lambda: dict(admission.outcomes)
+)
+metrics.gauge(
+    "asr_admission_waiting", "Sessions queued for a provider slot", ("provider",),
+    collect=lambda: {(name,): admission.waiting(name) for name in PROVIDERS}
+)
+metrics.counter(
+    "asr_transcripts_logged_total", "Finals committed to the transcript log",
+    collect=lambda: {(): transcripts.written if transcripts else 0}
+)
+metrics.counter(
+    "asr_upstream_reconnects_total", "Upstream sessions transparently reconnected",
+    collect=lambda: {(): reconnect_stats["reconnects"]}
+)
+
+
+def audio_format(websocket: WebSocket, max_channels: int = MAX_CHANNELS) -> tuple:
+    """Client audio format from the query string, e.g. ?sample_rate=48000&channels=2"""
+    return checked_format(websocket.query_params, max_channels)
+
+
+def checked_format(params, max_channels: int = MAX_CHANNELS) -> tuple:
+    """(sample_rate, channels) from a mapping with optional string or int values"""
+    sample_rate = int(params.get("sample_rate", 16000))
+    channels = int(params.get("channels", 1))
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE or not 1 <= channels <= max_channels:
+        raise ValueError(f"unsupported audio format {sample_rate} Hz x {channels}")
+    return sample_rate, channels
+
+
+def downstream_encoder(websocket: WebSocket, text_of) -> DownstreamEncoder:
+    """Downstream mode from the query string, e.g. ?interim=delta&interim_hz=5"""
+    mode = websocket.query_params.get("interim", DOWNSTREAM_INTERIM)
+    interim_hz = float(websocket.query_params.get("interim_hz", DOWNSTREAM_INTERIM_HZ))
+    if mode not in ("full", "delta") or interim_hz < 0:
+        raise ValueError(f"unsupported downstream mode interim={mode} interim_hz={interim_hz}")
+    return DownstreamEncoder(text_of, delta=mode == "delta", interim_hz=interim_hz)
+
+
+def channel_speakers(websocket: WebSocket, channels: int) -> list:
+    """Speaker name per channel, e.g. ?speakers=alice,bob (default speaker_1...)"""
+    speakers = websocket.query_params.get("speakers")
+    if not speakers:
+        return [f"speaker_{c + 1}" for c in range(channels)]
+    speakers = speakers.split(",")
+    if len(speakers) != channels:
+        raise ValueError(f"{len(speakers)} speakers for {channels} channels")
+    return speakers
+
+
+async def admit(websocket: WebSocket, providers: list, slots: int = 1, every: bool = False):
+    """Take `slots` provider slots for a session, trying `providers` in order,
+    or with `every` a list of grants for one slot of each; None if the client
+    was turned away"""
+    tenant = websocket.query_params.get("api_key") or "anonymous"
+    try:
+        if every:
+            return await admission.acquire_all(tenant, providers)
+        return await admission.acquire(tenant, providers, slots)
+    except Rejected as e:
+        await websocket.send_json({
+            "type": "error",
+            "message": f"Server busy: {str(e)}, retry in {e.retry_after} s",
+            "retry_after": e.retry_after
+        })
+        # 1013 Try Again Later
+        await websocket.close(code=1013)
+        return None
+
+
+async def configure_uplink(session: Session, msg: dict, channels: int):
+    """Apply a {"type": "config", "encoding": ...} handshake and acknowledge it"""
+    if session.audio_started:
+        raise ValueError("config must be sent before the first audio frame")
+    session.decoder = make_decoder(msg.get("encoding", PCM16), channels)
+    await session.downlink.put({"type": "config", "encoding": session.encoding})
+
+
+async def configure_vocabulary(session: Session, msg: dict):
+    """Apply a {"type": "vocabulary", "terms": [...]} message and acknowledge
+    it; a bad vocabulary is reported without ending the session"""
+    terms = msg.get("terms")
+    try:
+        if not isinstance(terms, list) or len(terms) > ENTITY_MAX_TERMS:
+            raise ValueError(f"terms must be a list of at most {ENTITY_MAX_TERMS}")
+        automaton = automata.get(terms)
+        if automaton is None:
+            # Thousands of terms take a few hundred ms to compile
+            automaton = await asyncio.to_thread(EntityAutomaton, terms)
+            automata.put(terms, automaton)
+    except ValueError as e:
+        await session.downlink.put({
+            "type": "error",
+            "message": f"Invalid vocabulary: {str(e)}"
+        })
+        return
+    session.spotter = EntitySpotter(automaton)
+    await session.downlink.put({"type": "vocabulary", "terms": len(automaton)})
+
+
+async def receive_from_client(websocket: WebSocket, session: Session, channels: int):
+    """Feed a browser's audio and control messages into a session until it
+    terminates or disconnects, then end the session's input"""
+    try:
+        while True:
+            # Receive audio data from browser
+            data = await websocket.receive()
+            
+            if data["type"] == "websocket.disconnect":
+                break
+            if data.get("bytes") is not None:
+                session.bytes_client_in.inc(len(data["bytes"]))
+                await session.send_audio(data["bytes"])
+            elif data.get("text") is not None:
+                if session.recording:
+                    session.recording.client(data["text"])
+                msg = json.loads(data["text"])
+                if msg.get("type") == "terminate":
+                    break
+                if msg.get("type") == "config":
+                    await configure_uplink(session, msg, channels)
+                elif msg.get("type") == "vocabulary":
+                    await configure_vocabulary(session, msg)
+    except WebSocketDisconnect:
+        pass
+    except ValueError as e:
+        await session.downlink.put({
+            "type": "error",
+            "message": f"Invalid config: {str(e)}"
+        })
+    # Let the provider finalize the last utterance and close
+    await session.flush_audio()
+    await session.end_input()
+
+
+async def send_downstream(websocket: WebSocket, session: Session):
+    """Write a session's downlink to the browser until the queue is drained,
+    publishing each message to the session's subscribers"""
+    downlink, encoder = session.downlink, session.encoder
+    topic = hub.open(session.id)
+    try:
+        while True:
+            wait = encoder.wait_time(time.monotonic())
+            try:
+                if wait is None:
+                    payload, kind = await downlink.get_item()
+                else:
+                    # An interim is being held back; send it when its slot comes
+                    payload, kind = await asyncio.wait_for(downlink.get_item(), wait)
+                session.latency.observe("downlink_queue", downlink.last_wait)
+                if topic.subscribers:
+                    # Serialized once for every subscriber, and for the
+                    # client too unless the encoder needs the dict for a delta
+                    text = payload
+                    if not isinstance(payload, str):
+                        text = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+                        if not (encoder.delta and kind == INTERIM):
+                            payload = text
+                    topic.publish(text, kind)
+                messages = encoder.push(payload, kind, time.monotonic())
+            except asyncio.TimeoutError:
+                messages = encoder.flush(time.monotonic())
+            for message in messages:
+                # Provider messages are forwarded verbatim, the rest encoded
+                # the way send_json would
+                if not isinstance(message, str):
+                    message = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+                session.bytes_client_out.inc(len(message))
+                await websocket.send_text(message)
+    except QueueClosed:
+        pass
+    except (WebSocketDisconnect, RuntimeError):
+        # Browser went away; nothing left to deliver to
+        pass
+    finally:
+        hub.close(session.id)
+
+
+async def send_upstream(session: Session):
+    """Send a session's uplink to its provider until the queue is closed"""
+    try:
+        while True:
+            payload = await session.uplink.get()
+            started = time.perf_counter()
+            await session.link.send(payload)
+            session.on_sent(payload, time.perf_counter() - started)
+    except QueueClosed:
+        pass
+
+
+async def receive_from_upstream(session: Session, provider: Provider):
+    """Queue a provider's results for the client, then close the downlink"""
+    encoder = session.encoder
+    # Reconnects and replay happen inside the link; only a failure it
+    # cannot recover from ends the session
+    try:
+        async for data, kind, size, raw in session.link.results():
+            result = provider.normalize(data)
+            session.on_result(result, size)
+            if transcripts and result and result["is_final"] and result["text"]:
+                transcripts.append(session.id, provider.name, result)
+            if session.recording and result and result["is_final"]:
+                session.recording.final(result)
+            # Forward the provider's text as-is unless the encoder needs the
+            # parsed interim for a delta
+            if raw is not None and not (encoder.delta and kind == INTERIM):
+                data = raw
+            await session.downlink.put(data, size, kind)
+            if session.spotter and result:
+                for match in session.spotter.update(result):
+                    await session.downlink.put(match)
+    except Exception as e:
+        await session.downlink.put({
+            "type": "error",
+            "message": str(e)
+        })
+    finally:
+        session.downlink.close()
+
+
+def start_recording(session: Session, params, sample_rate: int, channels: int, endpoint: str):
+    """Capture the session if the capture directory is set and it asked to
+    be recorded (?record=1), or every session is"""
+    if captures is None or not (CAPTURE_ALL or str(params.get("record")) in ("1", "True")):
+        return
+    session.recording = captures.record(
+        session.id,
+        provider=session.provider,
+        sample_rate=sample_rate,
+        channels=channels,
+        endpoint=endpoint,
+        interim="delta" if session.encoder.delta else "full",
+        interim_hz=session.encoder.stats()["interim_hz"],
+    )
+    session.link.on_message = session.recording.upstream
+
+
+def client_connected(websocket: WebSocket) -> bool:
+    """Whether the browser socket can still be written to"""
+    return (
+        websocket.client_state == WebSocketState.CONNECTED
+        and websocket.application_state == WebSocketState.CONNECTED
+    )
+
+
+async def close_client(websocket: WebSocket, interrupted: bool = False):
+    """Close the browser socket; if a drain cut the session short, tell the
+    client to reconnect"""
+    if not client_connected(websocket):
+        return
+    if interrupted:
+        await websocket.send_json({
+            "type": "status",
+            "message": "Server restarting, reconnect to continue"
+        })
+        # 1012 Service Restart: the client should reconnect, reaching another worker
+        await websocket.close(code=1012)
+    else:
+        await websocket.close()
+
+
+async def drain_sessions(timeout: float, finalize_timeout: float = 10.0):
+    """Refuse new sessions, give live ones `timeout` seconds to finish, then
+    end the rest: their providers finalize what was already sent and the
+    clients are told to reconnect"""
+    global draining
+    draining = True
+    deadline = time.monotonic() + timeout
+    while active_sessions and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if active_sessions:
+        print(f"Drain timeout: ending {len(active_sessions)} sessions")
+        for session in list(active_sessions.values()):
+            session.interrupted = True
+            await session.end_input()
+    deadline = time.monotonic() + finalize_timeout
+    while active_sessions and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
 
 
 class ASRManager:
     """Manages ASR connections for different providers"""
     
     @staticmethod
-    async def handle_assemblyai(websocket: WebSocket):
-        """Handle AssemblyAI streaming"""
+    async def handle(websocket: WebSocket, name: str):
+        """Stream to one provider, loading its plugin on first use"""
+        if name not in PROVIDERS:
+            await websocket.close(code=1008)
+            return
+        await ASRManager.relay(websocket, PROVIDERS[name])
+    
+    @staticmethod
+    async def relay(websocket: WebSocket, provider: Provider):
+        """Relay audio from the browser to a provider and transcripts back"""
+        if draining:
+            await websocket.close(code=1012)
+            return
         await websocket.accept()
-        assemblyai_ws = None
+        try:
+            sample_rate, channels = audio_format(websocket)
+            encoder = downstream_encoder(websocket, provider.transcript_text)
+        except ValueError as e:
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Invalid parameters: {str(e)}"
+            })
+            await websocket.close()
+            return
+        # ?spillover=1: use the other provider when this one is at its limit
+        providers = [provider.name]
+        if websocket.query_params.get("spillover") == "1":
+            providers += [name for name in PROVIDERS if name != provider.name]
+        grant = await admit(websocket, providers)
+        if grant is None:
+            return
+        provider = PROVIDERS[grant.provider]
+        encoder.text_of = provider.transcript_text
+        ingest = AudioIngest(sample_rate, channels, provider.sample_rate, provider.packet_ms,
+                             provider.min_packet_ms)
+        session = Session(provider, ingest, adaptive=ADAPTIVE_PACKETS)
+        session.encoder = encoder
+        session.link = UpstreamLink(provider, pools[provider.name], REPLAY_SECONDS, RECONNECT_ATTEMPTS)
+        active_sessions[session.id] = session
+        current_session.set(session.id)
+        start_recording(session, websocket.query_params, sample_rate, channels, f"/ws/{provider.name}")
         
         try:
-            # Connect to AssemblyAI
-            assemblyai_ws = await websockets.connect(
-                ASSEMBLYAI_ENDPOINT,
-                extra_headers={"Authorization": ASSEMBLYAI_API_KEY}
+            # Take a pre-warmed upstream session (or connect on a miss)
+            await session.link.open()
+            
+            await websocket.send_json({
+                "type": "status",
+                "message": f"Connected to {provider.label}",
+                "provider": provider.name,
+                "session": session.id
+            })
+            
+            # Each direction runs as a producer and a consumer joined by a
+            # bounded queue, so neither side can stall the other. Everything
+            # runs on the event loop; a single reader per socket keeps
+            # transcripts in provider order.
+            async def send_to_client():
+                # Forward transcription to browser
+                await send_downstream(websocket, session)
+            
+            workers = [
+                asyncio.create_task(receive_from_client(websocket, session, channels)),
+                asyncio.create_task(send_upstream(session)),
+                asyncio.create_task(receive_from_upstream(session, provider)),
+            ]
+            try:
+                # The session is over once everything from upstream is delivered
+                await send_to_client()
+            finally:
+                for task in workers:
+                    task.cancel()
+            
+        except Exception as e:
+            if client_connected(websocket):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"{provider.label} error: {str(e)}"
+                })
+        finally:
+            del active_sessions[session.id]
+            admission.release(grant)
+            if session.recording:
+                session.recording.close()
+            reconnect_stats["reconnects"] += session.link.reconnects
+            reconnect_stats["replayed_bytes"] += session.link.replayed_bytes
+            reconnect_stats["reconnect_seconds_total"] += session.link.reconnect_seconds_total
+            if session.vad:
+                print(f"Session {session.id} ({provider.name}): VAD suppressed "
+                      f"{session.vad.stats()['suppressed_pct']:.1f}% of audio")
+            if session.sizer and session.sizer.changes:
+                packets = session.sizer.stats()
+                print(f"Session {session.id} ({provider.name}): packets resized {packets['changes']} times "
+                      f"within {packets['min_ms']}-{packets['max_ms']} ms, ended at {packets['packet_ms']} ms")
+            await session.link.close()
+            await close_client(websocket, session.interrupted)
+
+
+    @staticmethod
+    async def race(websocket: WebSocket):
+        """Stream to several providers at once and forward the fastest final"""
+        if draining:
+            await websocket.close(code=1012)
+            return
+        if not RACE_PROVIDERS:
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        try:
+            sample_rate, channels = audio_format(websocket)
+            encoder = downstream_encoder(websocket, lambda payload: payload["text"])
+        except ValueError as e:
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Invalid parameters: {str(e)}"
+            })
+            await websocket.close()
+            return
+        
+        providers = [PROVIDERS[name] for name in RACE_PROVIDERS]
+        # A race holds a slot of every provider, taken together so it never
+        # sits on one provider's slot while queueing for another
+        grants = await admit(websocket, [provider.name for provider in providers], every=True)
+        if grants is None:
+            return
+        # One ingest stage feeds every leg: each packet is a single bytes
+        # object referenced from all uplink queues, so memory does not scale
+        # with the number of providers. VAD is off so every provider sees
+        # exactly the same audio clock.
+        ingest = AudioIngest(
+            sample_rate,
+            channels,
+            providers[0].sample_rate,
+            min(provider.packet_ms for provider in providers),
+            max(provider.min_packet_ms for provider in providers)
+        )
+        legs = [Session(provider, ingest, use_vad=False) for provider in providers]
+        downlink = legs[0].downlink
+        legs[0].encoder = encoder
+        # Client traffic is counted once for the race, not per leg
+        client_in = BYTES.labels("race", "client_in")
+        legs[0].bytes_client_out = BYTES.labels("race", "client_out")
+        arbiter = RaceArbiter(RACE_PROVIDERS)
+        upstreams = []
+        for leg in legs:
+            active_sessions[leg.id] = leg
+        current_session.set(legs[0].id)
+        
+        try:
+            connections = await asyncio.gather(
+                *(pools[provider.name].acquire_connection() for provider in providers)
             )
+            upstreams = [conn.ws for conn in connections]
             
             await websocket.send_json({
                 "type": "status",
-                "message": "Connected to AssemblyAI"
+                "message": "Racing " + ", ".join(provider.label for provider in providers),
+                "session": legs[0].id
             })
             
-            # Create tasks for bidirectional communication
             async def receive_from_client():
                 try:
                     while True:
-                        # Receive audio data from browser
                         data = await websocket.receive()
                         
-                        if "bytes" in data:
-                            # Forward audio to AssemblyAI
-                            await assemblyai_ws.send(data["bytes"])
-                        elif "text" in data:
+                        if data["type"] == "websocket.disconnect":
+                            break
+                        if data.get("bytes") is not None:
+                            client_in.inc(len(data["bytes"]))
+                            packets = ingest.process(legs[0].decode(data["bytes"]))
+                            for leg in legs:
+                                if not leg.failed:
+                                    await leg.send_packets(packets)
+                        elif data.get("text") is not None:
                             msg = json.loads(data["text"])
                             if msg.get("type") == "terminate":
-                                await assemblyai_ws.send(json.dumps({"type": "Terminate"}))
                                 break
+                            if msg.get("type") == "config":
+                                # Decoded once, in front of the shared ingest stage
+                                await configure_uplink(legs[0], msg, channels)
                 except WebSocketDisconnect:
                     pass
+                except ValueError as e:
+                    await downlink.put({
+                        "type": "error",
+                        "message": f"Invalid config: {str(e)}"
+                    })
+                packets = ingest.flush()
+                for leg in legs:
+                    if not leg.failed:
+                        await leg.send_packets(packets)
+                        await leg.end_input()
             
-            async def send_to_client():
+            async def send_upstream(leg, upstream_ws):
                 try:
-                    async for message in assemblyai_ws:
-                        # Forward transcription to browser
-                        await websocket.send_json(json.loads(message))
+                    while True:
+                        payload = await leg.uplink.get()
+                        await upstream_ws.send(payload)
+                        leg.on_sent(payload)
+                except QueueClosed:
+                    pass
+                except Exception:
+                    # Dead socket: the reader reports it; stop feeding this leg
+                    leg.fail()
+            
+            async def receive_from_upstream(leg, provider, conn):
+                # A failing provider drops out of the race; the others go on
+                # Keepalive silence a pooled socket got is on the provider's clock
+                lead_ms = conn.silence / leg.bytes_per_ms
+                try:
+                    async for message in conn.ws:
+                        for payload, kind in provider.translate(message):
+                            result = provider.normalize(payload)
+                            if result is not None and lead_ms:
+                                result["start_ms"] -= lead_ms
+                                result["end_ms"] -= lead_ms
+                            leg.on_result(result, len(message))
+                            if result is None:
+                                continue
+                            out = arbiter.on_result(provider.name, result, time.monotonic())
+                            if out is not None:
+                                kind = FINAL if out["is_final"] else INTERIM
+                                await downlink.put(out, len(out["text"]), kind)
                 except Exception as e:
-                    await websocket.send_json({
+                    leg.fail()
+                    await downlink.put({
                         "type": "error",
-                        "message": str(e)
+                        "message": f"{provider.label} error: {str(e)}"
                     })
             
-            # Run both tasks concurrently
-            await asyncio.gather(
-                receive_from_client(),
-                send_to_client()
-            )
+            async def receive_from_upstreams():
+                try:
+                    await asyncio.gather(*(
+                        receive_from_upstream(leg, provider, conn)
+                        for leg, provider, conn in zip(legs, providers, connections)
+                    ))
+                finally:
+                    downlink.close()
+            
+            async def send_to_client():
+                await send_downstream(websocket, legs[0])
             
+            workers = [
+                asyncio.create_task(receive_from_client()),
+                asyncio.create_task(receive_from_upstreams()),
+            ] + [
+                asyncio.create_task(send_upstream(leg, upstream_ws))
+                for leg, upstream_ws in zip(legs, upstreams)
+            ]
+            try:
+                await send_to_client()
+            finally:
+                for task in workers:
+                    task.cancel()
+        
         except Exception as e:
+            if client_connected(websocket):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"Race error: {str(e)}"
+                })
+        finally:
+            for leg in legs:
+                del active_sessions[leg.id]
+            for grant in grants:
+                admission.release(grant)
+            for upstream_ws in upstreams:
+                await upstream_ws.close()
+            race_stats.merge(arbiter.stats)
+            summary = ", ".join(
+                f"{name} won {result['wins']}" for name, result in arbiter.stats.summary().items()
+            )
+            print(f"Race {legs[0].id}: {summary}")
+            await close_client(websocket, any(leg.interrupted for leg in legs))
+
+    @staticmethod
+    async def multichannel(websocket: WebSocket, provider: Provider):
+        """One upstream session per channel, merged into a speaker-tagged stream"""
+        if draining:
+            await websocket.close(code=1012)
+            return
+        await websocket.accept()
+        try:
+            sample_rate, channels = audio_format(websocket, MULTICHANNEL_MAX_CHANNELS)
+            speakers = channel_speakers(websocket, channels)
+        except ValueError as e:
             await websocket.send_json({
                 "type": "error",
-                "message": f"AssemblyAI error: {str(e)}"
+                "message": f"Invalid parameters: {str(e)}"
             })
-        finally:
-            if assemblyai_ws:
-                await assemblyai_ws.close()
             await websocket.close()
-    
-    @staticmethod
-    async def handle_deepgram(websocket: WebSocket):
-        """Handle Deepgram streaming"""
-        await websocket.accept()
+            return
+        
+        # Channels are read out of the client frame by strided views and
+        # packetized together; each feeds its own session
+        grant = await admit(websocket, [provider.name], slots=channels)
+        if grant is None:
+            return
+        splitter = ChannelSplitter(sample_rate, channels, provider.sample_rate, provider.packet_ms,
+                                   provider.min_packet_ms)
+        legs = [Session(provider, None) for _ in range(channels)]
+        downlink = legs[0].downlink
+        # Interims of different speakers interleave, so no deltas here
+        legs[0].encoder = DownstreamEncoder(lambda payload: payload["text"])
+        client_in = BYTES.labels("multichannel", "client_in")
+        legs[0].bytes_client_out = BYTES.labels("multichannel", "client_out")
+        merger = TranscriptMerger(speakers, MULTICHANNEL_HOLD_MS)
+        for leg in legs:
+            leg.link = UpstreamLink(provider, pools[provider.name], REPLAY_SECONDS, RECONNECT_ATTEMPTS)
+            active_sessions[leg.id] = leg
+        current_session.set(legs[0].id)
         
         try:
-            client = DeepgramClient(DEEPGRAM_API_KEY)
-            
-            # Configure Deepgram connection
-            options = {
-                "model": "flux-general-en",
-                "encoding": "linear16",
-                "sample_rate": 16000,
-                "channels": 1,
-                "interim_results": True,
-            }
+            await asyncio.gather(*(leg.link.open() for leg in legs))
             
-            connection = client.listen.websocket.v("1")
+            await websocket.send_json({
+                "type": "status",
+                "message": f"Connected to {provider.label}, {channels} channels",
+                "session": legs[0].id
+            })
             
-            # Set up event handlers
-            def on_open(self, open_event, **kwargs):
-                asyncio.create_task(websocket.send_json({
-                    "type": "status",
-                    "message": "Connected to Deepgram"
-                }))
+            async def receive_from_client():
+                try:
+                    while True:
+                        data = await websocket.receive()
+                        
+                        if data["type"] == "websocket.disconnect":
+                            break
+                        if data.get("bytes") is not None:
+                            client_in.inc(len(data["bytes"]))
+                            packets = splitter.process(legs[0].decode(data["bytes"]))
+                            for leg, channel_packets in zip(legs, packets):
+                                if not leg.failed:
+                                    await leg.send_packets(channel_packets)
+                        elif data.get("text") is not None:
+                            msg = json.loads(data["text"])
+                            if msg.get("type") == "terminate":
+                                break
+                            if msg.get("type") == "config":
+                                await configure_uplink(legs[0], msg, channels)
+                except WebSocketDisconnect:
+                    pass
+                except ValueError as e:
+                    await downlink.put({
+                        "type": "error",
+                        "message": f"Invalid config: {str(e)}"
+                    })
+                for leg, channel_packets in zip(legs, splitter.flush()):
+                    if not leg.failed:
+                        await leg.send_packets(channel_packets)
+                        await leg.end_input()
             
-            def on_message(self, result, **kwargs):
+            async def send_upstream(leg):
                 try:
-                    transcript = result.channel.alternatives[0].transcript
-                    if transcript:
-                        is_final = result.is_final
-                        asyncio.create_task(websocket.send_json({
-                            "type": "transcript",
-                            "text": transcript,
-                            "is_final": is_final
-                        }))
-                except Exception as e:
-                    print(f"Message error: {e}")
+                    while True:
+                        payload = await leg.uplink.get()
+                        await leg.link.send(payload)
+                        leg.on_sent(payload)
+                except QueueClosed:
+                    pass
             
-            def on_error(self, error, **kwargs):
-                asyncio.create_task(websocket.send_json({
-                    "type": "error",
-                    "message": str(error)
-                }))
+            async def forward(payloads):
+                for out in payloads:
+                    await downlink.put(out, len(out["text"]), FINAL if out["is_final"] else INTERIM)
             
-            def on_close(self, close_event, **kwargs):
-                print("Deepgram connection closed")
+            async def receive_from_upstream(channel, leg):
+                # A failing channel drops out; the others go on
+                try:
+                    async for data, kind, size, raw in leg.link.results():
+                        result = provider.normalize(data)
+                        leg.on_result(result, size)
+                        if result is not None:
+                            await forward(merger.on_result(channel, result, time.monotonic()))
+                except Exception as e:
+                    # Reconnecting gave up: its sender would wait for a socket
+                    # forever and its uplink fill up, stalling every channel
+                    leg.fail()
+                    senders[channel].cancel()
+                    await downlink.put({
+                        "type": "error",
+                        "message": f"{provider.label} error on channel {channel} ({speakers[channel]}): {str(e)}"
+                    })
             
-            # Register handlers
-            connection.on(EventType.OPEN, on_open)
-            connection.on(EventType.TRANSCRIPT, on_message)
-            connection.on(EventType.ERROR, on_error)
-            connection.on(EventType.CLOSE, on_close)
+            async def release_held():
+                # Finals held for a silent channel go out when their wait is over
+                while True:
+                    await asyncio.sleep(MULTICHANNEL_HOLD_MS / 4000)
+                    await forward(merger.due(time.monotonic()))
             
-            # Start connection
-            if connection.start(options) is False:
-                raise Exception("Failed to start Deepgram connection")
+            async def receive_from_upstreams():
+                try:
+                    await asyncio.gather(*(
+                        receive_from_upstream(channel, leg) for channel, leg in enumerate(legs)
+                    ))
+                    await forward(merger.flush())
+                finally:
+                    downlink.close()
             
-            # Receive and forward audio
+            senders = [asyncio.create_task(send_upstream(leg)) for leg in legs]
+            workers = [
+                asyncio.create_task(receive_from_client()),
+                asyncio.create_task(receive_from_upstreams()),
+                asyncio.create_task(release_held()),
+            ] + senders
             try:
-                while True:
-                    data = await websocket.receive()
-                    
-                    if "bytes" in data:
-                        connection.send(data["bytes"])
-                    elif "text" in data:
-                        msg = json.loads(data["text"])
-                        if msg.get("type") == "terminate":
-                            break
-            except WebSocketDisconnect:
-                pass
+                await send_downstream(websocket, legs[0])
             finally:
-                connection.finish()
-            
+                for task in workers:
+                    task.cancel()
+        
         except Exception as e:
+            if client_connected(websocket):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"{provider.label} error: {str(e)}"
+                })
+        finally:
+            admission.release(grant)
+            for leg in legs:
+                del active_sessions[leg.id]
+                reconnect_stats["reconnects"] += leg.link.reconnects
+                reconnect_stats["replayed_bytes"] += leg.link.replayed_bytes
+                reconnect_stats["reconnect_seconds_total"] += leg.link.reconnect_seconds_total
+                await leg.link.close()
+            merged = merger.stats()
+            print(f"Multichannel {legs[0].id} ({provider.name}): {channels} channels, "
+                  f"{merged['finals']} finals, {merged['late']} out of order")
+            await close_client(websocket, any(leg.interrupted for leg in legs))
+
+    @staticmethod
+    async def mux(websocket: WebSocket):
+        """Many logical streams over one socket, each on its own provider session"""
+        if draining:
+            await websocket.close(code=1012)
+            return
+        await websocket.accept()
+        try:
+            # ?interim=delta&interim_hz=5 apply to every stream
+            downstream_encoder(websocket, None)
+        except ValueError as e:
             await websocket.send_json({
                 "type": "error",
-                "message": f"Deepgram error: {str(e)}"
+                "message": f"Invalid parameters: {str(e)}"
             })
+            await websocket.close()
+            return
+        tenant = websocket.query_params.get("api_key") or "anonymous"
+        streams = {}  # stream id -> Session
+        tasks = set()
+        unknown = set()  # stream ids audio arrived for, already reported
+        interrupted = False
+        client_in = BYTES.labels("mux", "client_in")
+
+        async def run_stream(stream_id: int, session: Session, provider: Provider):
+            nonlocal interrupted
+            client = StreamSocket(websocket, stream_id)
+            grant = None
+            try:
+                try:
+                    grant = await admission.acquire(tenant, [provider.name])
+                except Rejected as e:
+                    await client.send_json({
+                        "type": "error",
+                        "message": f"Server busy: {str(e)}, retry in {e.retry_after} s",
+                        "retry_after": e.retry_after
+                    })
+                    return
+                active_sessions[session.id] = session
+                current_session.set(session.id)
+                await session.link.open()
+                await client.send_json({
+                    "type": "status",
+                    "message": f"Connected to {provider.label}",
+                    "provider": provider.name,
+                    "session": session.id
+                })
+                workers = [
+                    asyncio.create_task(send_upstream(session)),
+                    asyncio.create_task(receive_from_upstream(session, provider)),
+                ]
+                try:
+                    await send_downstream(client, session)
+                finally:
+                    for task in workers:
+                        task.cancel()
+            except Exception as e:
+                if client_connected(websocket):
+                    await client.send_json({
+                        "type": "error",
+                        "message": f"{provider.label} error: {str(e)}"
+                    })
+            finally:
+                # Audio still arriving for this stream is dropped
+                session.uplink.close()
+                if streams.get(stream_id) is session:
+                    del streams[stream_id]
+                if session.recording:
+                    session.recording.close()
+                if grant is not None:
+                    del active_sessions[session.id]
+                    admission.release(grant)
+                    interrupted = interrupted or session.interrupted
+                    reconnect_stats["reconnects"] += session.link.reconnects
+                    reconnect_stats["replayed_bytes"] += session.link.replayed_bytes
+                    reconnect_stats["reconnect_seconds_total"] += session.link.reconnect_seconds_total
+                await session.link.close()
+                if client_connected(websocket):
+                    try:
+                        await client.send_json({"type": "closed"})
+                    except (WebSocketDisconnect, RuntimeError):
+                        pass
+
+        async def open_stream(stream_id: int, msg: dict):
+            if stream_id in streams:
+                raise ValueError(f"stream {stream_id} is already open")
+            if len(streams) >= MUX_MAX_STREAMS:
+                raise ValueError(f"at most {MUX_MAX_STREAMS} streams per socket")
+            if draining:
+                raise ValueError("server restarting, open streams on another connection")
+            name = msg.get("provider")
+            if name not in PROVIDERS:
+                raise ValueError(f"unknown provider {name}")
+            sample_rate, channels = checked_format(msg)
+            provider = PROVIDERS[name]
+            session = Session(
+                provider,
+                AudioIngest(sample_rate, channels, provider.sample_rate, provider.packet_ms,
+                            provider.min_packet_ms),
+                adaptive=ADAPTIVE_PACKETS,
+                # One socket reads for every stream: a stalled provider loses
+                # its own oldest audio instead of blocking the others
+                uplink_policy=DROP_OLDEST
+            )
+            session.encoder = downstream_encoder(websocket, provider.transcript_text)
+            session.link = UpstreamLink(provider, pools[provider.name], REPLAY_SECONDS, RECONNECT_ATTEMPTS)
+            start_recording(session, msg, sample_rate, channels, "/ws/mux")
+            streams[stream_id] = session
+            unknown.discard(stream_id)
+            task = asyncio.create_task(run_stream(stream_id, session, provider))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def end_stream(session: Session):
+            if session.uplink.closed:
+                return
+            if session.recording:
+                # Replayed on a single-stream socket, where this ends the session
+                session.recording.client(json.dumps({"type": "terminate"}))
+            await session.flush_audio()
+            await session.end_input()
+
+        async def control(msg: dict):
+            stream_id = stream_id_of(msg)
+            if msg.get("type") == "open":
+                await open_stream(stream_id, msg)
+                return
+            session = streams.get(stream_id)
+            if session is None:
+                raise ValueError(f"stream {stream_id} is not open")
+            if msg.get("type") == "close":
+                await end_stream(session)
+                return
+            if session.recording:
+                session.recording.client(json.dumps(msg))
+            if msg.get("type") == "config":
+                await configure_uplink(session, msg, session.ingest.channels)
+            elif msg.get("type") == "vocabulary":
+                await configure_vocabulary(session, msg)
+
+        await websocket.send_json({
+            "type": "status",
+            "message": "Multiplexer ready",
+            "max_streams": MUX_MAX_STREAMS
+        })
+        try:
+            while True:
+                data = await websocket.receive()
+
+                if data["type"] == "websocket.disconnect":
+                    break
+                if data.get("bytes") is not None:
+                    audio = data["bytes"]
+                    client_in.inc(len(audio))
+                    try:
+                        stream_id, audio = split_frame(audio)
+                    except ValueError:
+                        continue
+                    session = streams.get(stream_id)
+                    if session is not None:
+                        session.bytes_client_in.inc(len(audio))
+                        await session.send_audio(audio)
+                    elif stream_id not in unknown:
+                        unknown.add(stream_id)
+                        await websocket.send_text(tag({
+                            "type": "error",
+                            "message": f"Audio for stream {stream_id}, which is not open"
+                        }, stream_id))
+                elif data.get("text") is not None:
+                    try:
+                        msg = json.loads(data["text"])
+                        if not isinstance(msg, dict):
+                            raise ValueError("expected a JSON object")
+                    except ValueError as e:
+                        # A bad frame is the client's bug, not a reason to end every stream
+                        await websocket.send_json({
+                            "type": "error",
+                            "message": f"Invalid message: {str(e)}"
+                        })
+                        continue
+                    if msg.get("type") == "terminate":
+                        break
+                    try:
+                        await control(msg)
+                    except ValueError as e:
+                        error = {"type": "error", "message": f"Invalid {msg.get('type')}: {str(e)}"}
+                        if isinstance(msg.get("stream"), int):
+                            await websocket.send_text(tag(error, msg["stream"]))
+                        else:
+                            await websocket.send_json(error)
+        except WebSocketDisconnect:
+            pass
         finally:
+            # Every open stream finalizes with its provider before the socket closes
+            for session in list(streams.values()):
+                await end_stream(session)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await close_client(websocket, interrupted)
+
+    @staticmethod
+    async def subscribe(websocket: WebSocket, session_id: str):
+        """Send a live session's messages to a read-only viewer"""
+        await websocket.accept()
+        topic = hub.get(session_id)
+        if topic is None:
+            await websocket.send_json({
+                "type": "error",
+                "message": f"No live session {session_id}"
+            })
             await websocket.close()
+            return
+        # ?format=binary: the same UTF-8 bytes for every binary subscriber
+        binary = websocket.query_params.get("format") == "binary"
+        subscriber = topic.subscribe(SUBSCRIBER_QUEUE_ITEMS)
+        
+        async def send_to_subscriber():
+            try:
+                while True:
+                    message = await subscriber.get()
+                    if binary:
+                        await websocket.send_bytes(message.data)
+                    else:
+                        await websocket.send_text(message.text)
+                    FANOUT_SECONDS.observe(time.perf_counter() - message.published_at)
+            except QueueClosed:
+                pass
+        
+        async def watch_client():
+            # Viewers send nothing; this only notices them leaving
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        
+        tasks = [asyncio.create_task(send_to_subscriber()), asyncio.create_task(watch_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            topic.unsubscribe(subscriber)
+            if client_connected(websocket):
+                try:
+                    await websocket.close()
+                except RuntimeError:
+                    pass
+
+
+def start_diagnostics():
+    global debug_tasks, profiler, stall_monitor
+    loop = asyncio.get_running_loop()
+    thread_id = threading.get_ident()
+    debug_tasks = TaskRegistry()
+    debug_tasks.install(loop)
+    profiler = SamplingProfiler(loop, debug_tasks)
+    stall_monitor = StallMonitor(
+        loop, thread_id, debug_tasks,
+        threshold=DEBUG_SLOW_CALLBACK_MS / 1000,
+        counter=SLOW_CALLBACKS
+    )
+    stall_monitor.start()
+    print(f"Debug endpoints enabled, logging event loop steps over {DEBUG_SLOW_CALLBACK_MS:.0f} ms")
+
+
+@app.on_event("startup")
+async def start_pools():
+    global lag_probe
+    for pool in pools.values():
+        pool.start()
+    lag_probe = asyncio.create_task(probe_loop_lag(LOOP_LAG_SECONDS, LOOP_LAG_INTERVAL))
+    if DEBUG_ENDPOINTS:
+        start_diagnostics()
+    if transcripts:
+        await transcripts.start()
+    if captures:
+        await captures.start()
+
+
+@app.on_event("shutdown")
+async def close_pools():
+    if lag_probe:
+        lag_probe.cancel()
+    if stall_monitor:
+        stall_monitor.stop()
+    for pool in pools.values():
+        await pool.close()
+    if transcripts:
+        await transcripts.close()
+    if captures:
+        await captures.close()
 
 
 @app.get("/")
@@ -188,23 +1503,192 @@ async def root():
     return {
         "message": "ASR API Server",
         "endpoints": {
-            "/ws/assemblyai": "WebSocket endpoint for AssemblyAI",
-            "/ws/deepgram": "WebSocket endpoint for Deepgram",
+            **{
+                f"/ws/{name}": f"WebSocket endpoint for {PROVIDERS.spec(name).label}"
+                for name in PROVIDERS
+            },
+            "/ws/race": "WebSocket endpoint racing all providers, fastest final wins",
+            "/ws/mux": "WebSocket endpoint carrying many streams, each on its own provider session",
+            "/ws/multichannel/{provider}": "WebSocket endpoint for interleaved multi-channel audio, one speaker per channel",
+            "/ws/sessions/{id}/subscribe": "WebSocket endpoint following a live session's transcripts, read-only",
+            "/stats": "Relay statistics",
+            "/metrics": "Prometheus metrics",
+            "/transcribe": "POST a WAV or raw PCM16 recording for offline transcription",
+            "/search": "Full-text search over logged finals",
+            **({
+                "/debug/profile": "Sampling CPU profile of the event loop over ?seconds=",
+                "/debug/slow": "Recent event loop steps over the slow callback threshold",
+                "/debug/tasks": "Live tasks per session"
+            } if DEBUG_ENDPOINTS else {}),
             "/test": "Browser test interface"
         }
     }
 
 
-@app.websocket("/ws/assemblyai")
-async def websocket_assemblyai(websocket: WebSocket):
-    """WebSocket endpoint for AssemblyAI"""
-    await ASRManager.handle_assemblyai(websocket)
+@app.get("/stats")
+async def stats():
+    """Relay statistics"""
+    return {
+        "providers": PROVIDERS.stats(),
+        "pools": {
+            name: pool.stats()
+            for name, pool in pools.items()
+        },
+        "sessions": {
+            session_id: session.stats()
+            for session_id, session in active_sessions.items()
+        },
+        "subscribers": hub.stats(),
+        "admission": admission.stats(),
+        "race": race_stats.summary(),
+        "reconnects": reconnect_stats,
+        "transcripts": transcripts.stats() if transcripts else None,
+        "captures": captures.stats() if captures else None
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/transcribe")
+async def transcribe(request: Request, provider: str = "deepgram",
+                     sample_rate: int = 16000, channels: int = 1):
+    """Transcribe an uploaded recording (WAV, or raw PCM16 at ?sample_rate=&channels=)"""
+    if provider not in PROVIDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown provider {provider}")
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE or not 1 <= channels <= MAX_CHANNELS:
+        raise HTTPException(status_code=400, detail=f"Unsupported audio format {sample_rate} Hz x {channels}")
+    
+    # Spool to disk rather than memory; the file is then memory-mapped
+    with tempfile.TemporaryFile() as upload:
+        async for chunk in request.stream():
+            await asyncio.to_thread(upload.write, chunk)
+        upload.flush()
+        try:
+            audio = batch.AudioFile(upload, sample_rate, channels)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid audio: {str(e)}")
+        try:
+            # A WAV header's format replaces the query's, within the same limits
+            checked_format({"sample_rate": audio.sample_rate, "channels": audio.channels})
+        except ValueError as e:
+            audio.close()
+            raise HTTPException(status_code=400, detail=f"Invalid audio: {str(e)}")
+        try:
+            return await batch.transcribe(
+                audio,
+                PROVIDERS[provider],
+                batch_limits[provider],
+                min_chunk_seconds=BATCH_MIN_CHUNK_SECONDS,
+                max_chunk_seconds=BATCH_MAX_CHUNK_SECONDS,
+                speed=BATCH_SPEED
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"{PROVIDERS[provider].label} error: {str(e)}")
+        finally:
+            audio.close()
+
+
+@app.get("/search")
+async def search(q: str, session: Optional[str] = None, limit: int = 20):
+    """Logged finals matching a full-text query (FTS5 syntax), best match first"""
+    if transcripts is None:
+        raise HTTPException(status_code=503, detail="Transcript log is disabled (set TRANSCRIPT_DB)")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    try:
+        results = await transcripts.search(q, session, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    return {"query": q, "results": results}
 
 
-@app.websocket("/ws/deepgram")
-async def websocket_deepgram(websocket: WebSocket):
-    """WebSocket endpoint for Deepgram"""
-    await ASRManager.handle_deepgram(websocket)
+def check_debug_access(request: Request):
+    if DEBUG_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), DEBUG_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Debug endpoints need Authorization: Bearer <DEBUG_TOKEN>")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="Debug endpoints are loopback-only without DEBUG_TOKEN")
+
+
+# Only registered when enabled, so a disabled relay serves no /debug routes
+if DEBUG_ENDPOINTS:
+    @app.get("/debug/profile")
+    async def debug_profile(request: Request, seconds: float = 5.0, interval_ms: float = 5.0,
+                            format: str = "json"):
+        """Sampling CPU profile of the event loop thread (?format=folded for flame graphs)"""
+        check_debug_access(request)
+        if not 0 < seconds <= DEBUG_PROFILE_MAX_SECONDS:
+            raise HTTPException(status_code=400, detail=f"seconds must be in (0, {DEBUG_PROFILE_MAX_SECONDS:g}]")
+        if not 1 <= interval_ms <= 100:
+            raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 100")
+        if format not in ("json", "folded"):
+            raise HTTPException(status_code=400, detail="format must be json or folded")
+        try:
+            profile = await profiler.sample(seconds, interval_ms / 1000)
+        except ProfileError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if format == "folded":
+            return PlainTextResponse(SamplingProfiler.folded(profile))
+        return SamplingProfiler.report(profile, seconds, interval_ms / 1000)
+
+    @app.get("/debug/slow")
+    async def debug_slow(request: Request):
+        """Event loop steps over DEBUG_SLOW_CALLBACK_MS, with handler and session"""
+        check_debug_access(request)
+        return stall_monitor.stats()
+
+    @app.get("/debug/tasks")
+    async def debug_tasks_by_session(request: Request):
+        """Live tasks per session and where each is waiting"""
+        check_debug_access(request)
+        return {
+            "sessions": {
+                session_id or "relay": {
+                    "provider": active_sessions[session_id].provider if session_id in active_sessions else None,
+                    "tasks": tasks
+                }
+                for session_id, tasks in debug_tasks.snapshot(asyncio.get_running_loop()).items()
+            }
+        }
+
+
+@app.websocket("/ws/race")
+async def websocket_race(websocket: WebSocket):
+    """WebSocket endpoint racing all providers"""
+    await ASRManager.race(websocket)
+
+
+@app.websocket("/ws/multichannel/{provider}")
+async def websocket_multichannel(websocket: WebSocket, provider: str):
+    """WebSocket endpoint for multi-channel audio, one upstream session per channel"""
+    if provider not in PROVIDERS:
+        await websocket.close(code=1008)
+        return
+    await ASRManager.multichannel(websocket, PROVIDERS[provider])
+
+
+@app.websocket("/ws/mux")
+async def websocket_mux(websocket: WebSocket):
+    """WebSocket endpoint multiplexing many streams over one socket"""
+    await ASRManager.mux(websocket)
+
+
+# After /ws/race and /ws/mux so that they are not taken for provider names
+@app.websocket("/ws/{provider}")
+async def websocket_provider(websocket: WebSocket, provider: str):
+    """WebSocket endpoint for one provider (/ws/assemblyai, /ws/deepgram)"""
+    await ASRManager.handle(websocket, provider)
+
+
+@app.websocket("/ws/sessions/{session_id}/subscribe")
+async def websocket_subscribe(websocket: WebSocket, session_id: str):
+    """WebSocket endpoint for read-only viewers of a live session"""
+    await ASRManager.subscribe(websocket, session_id)
 
 
 @app.get("/test", response_class=HTMLResponse)
@@ -284,6 +1768,12 @@ async def test_page():
                 <select id="provider">
                     <option value="assemblyai">AssemblyAI</option>
                     <option value="deepgram">Deepgram</option>
+                    <option value="race">Race (fastest final)</option>
+                </select>
+                <select id="encoding">
+                    <option value="pcm16">PCM16</option>
+                    <option value="mulaw">μ-law (1/2 bandwidth)</option>
+                    <option value="ima_adpcm">IMA ADPCM (1/4 bandwidth)</option>
                 </select>
                 <button id="startBtn" onclick="startRecording()">Start Recording</button>
                 <button id="stopBtn" onclick="stopRecording()" disabled class="stop">Stop Recording</button>
@@ -307,23 +1797,32 @@ async def test_page():
             
             async function startRecording() {
                 const provider = document.getElementById('provider').value;
-                const wsUrl = `ws://localhost:8000/ws/${provider}`;
+                const encoding = document.getElementById('encoding').value;
+                adpcmState = { predictor: 0, index: 0 };
                 
                 try {
                     // Get microphone access
                     const stream = await navigator.mediaDevices.getUserMedia({ 
                         audio: {
                             channelCount: 1,
-                            sampleRate: 16000,
                             echoCancellation: true,
                             noiseSuppression: true
                         } 
                     });
                     
+                    // Capture at the device's native rate; the server resamples.
+                    // Interims arrive as deltas, at most 10 per second.
+                    audioContext = new AudioContext();
+                    const wsUrl = `ws://localhost:8000/ws/${provider}?sample_rate=${audioContext.sampleRate}&interim=delta&interim_hz=10`;
+                    
                     // Connect WebSocket
                     ws = new WebSocket(wsUrl);
                     
                     ws.onopen = () => {
+                        // Declare a compressed uplink before the first frame
+                        if (encoding !== 'pcm16') {
+                            ws.send(JSON.stringify({ type: 'config', encoding: encoding }));
+                        }
                         updateStatus('Connected to ' + provider);
                         document.getElementById('startBtn').disabled = true;
                         document.getElementById('stopBtn').disabled = false;
@@ -346,7 +1845,6 @@ async def test_page():
                     };
                     
                     // Set up audio processing
-                    audioContext = new AudioContext({ sampleRate: 16000 });
                     const source = audioContext.createMediaStreamSource(stream);
                     processor = audioContext.createScriptProcessor(4096, 1, 1);
                     
@@ -354,7 +1852,13 @@ async def test_page():
                         if (ws && ws.readyState === WebSocket.OPEN) {
                             const audioData = e.inputBuffer.getChannelData(0);
                             const pcm16 = convertFloat32ToInt16(audioData);
-                            ws.send(pcm16.buffer);
+                            if (encoding === 'mulaw') {
+                                ws.send(encodeMuLaw(pcm16).buffer);
+                            } else if (encoding === 'ima_adpcm') {
+                                ws.send(encodeImaAdpcm(pcm16).buffer);
+                            } else {
+                                ws.send(pcm16.buffer);
+                            }
                         }
                     };
                     
@@ -381,28 +1885,54 @@ async def test_page():
                 updateStatus('Stopped');
             }
             
+            // The current interim hypothesis is one element updated in
+            // place; finals are appended above it
+            let interimText = '';
+            let interimEl = null;
+            
+            function showInterim(text) {
+                const transcriptDiv = document.getElementById('transcript');
+                interimText = text;
+                if (!interimEl) {
+                    interimEl = document.createElement('p');
+                    interimEl.className = 'interim';
+                    transcriptDiv.appendChild(interimEl);
+                }
+                interimEl.textContent = text;
+            }
+            
+            function showFinal(text) {
+                const transcriptDiv = document.getElementById('transcript');
+                const p = document.createElement('p');
+                p.className = 'final';
+                p.textContent = text;
+                transcriptDiv.insertBefore(p, interimEl);
+                if (interimEl) {
+                    interimEl.remove();
+                    interimEl = null;
+                }
+                interimText = '';
+            }
+            
             function handleTranscript(data) {
                 const transcriptDiv = document.getElementById('transcript');
                 
-                if (data.type === 'Turn') {
+                if (data.type === 'interim_delta') {
+                    // Keep the unchanged prefix, append the new suffix
+                    showInterim(interimText.slice(0, data.keep) + data.text);
+                } else if (data.type === 'Turn') {
                     // AssemblyAI
-                    const text = data.transcript;
-                    const isFinal = data.turn_is_formatted;
-                    
-                    if (isFinal) {
-                        transcriptDiv.innerHTML += `<p class="final">${text}</p>`;
-                    } else {
-                        transcriptDiv.innerHTML += `<p class="interim">${text}</p>`;
+                    if (data.turn_is_formatted) {
+                        showFinal(data.transcript);
+                    } else if (!data.end_of_turn) {
+                        showInterim(data.transcript);
                     }
                 } else if (data.type === 'transcript') {
                     // Deepgram
-                    const text = data.text;
-                    const isFinal = data.is_final;
-                    
-                    if (isFinal) {
-                        transcriptDiv.innerHTML += `<p class="final">${text}</p>`;
+                    if (data.is_final) {
+                        showFinal(data.text);
                     } else {
-                        transcriptDiv.innerHTML += `<p class="interim">${text}</p>`;
+                        showInterim(data.text);
                     }
                 } else if (data.type === 'status') {
                     updateStatus(data.message);
@@ -420,6 +1950,55 @@ async def test_page():
                 }
                 return int16;
             }
+            
+            // G.711 mu-law, one byte per sample
+            function encodeMuLaw(pcm16) {
+                const out = new Uint8Array(pcm16.length);
+                for (let i = 0; i < pcm16.length; i++) {
+                    let x = pcm16[i];
+                    const sign = x < 0 ? 0x80 : 0;
+                    x = Math.min(Math.abs(x), 32635) + 0x84;
+                    const exponent = Math.max(0, Math.min(7, 31 - Math.clz32(x) - 7));
+                    const mantissa = (x >> (exponent + 3)) & 0x0F;
+                    out[i] = ~(sign | (exponent << 4) | mantissa) & 0xFF;
+                }
+                return out;
+            }
+            
+            // IMA ADPCM, two samples per byte (low nibble first). The state
+            // carries over between frames: the server decodes one stream.
+            const IMA_INDEX_ADJUST = [-1, -1, -1, -1, 2, 4, 6, 8];
+            const IMA_STEPS = [
+                7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+                50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+                253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+                1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+                3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+                11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+                32767
+            ];
+            let adpcmState = { predictor: 0, index: 0 };
+            
+            function encodeImaAdpcm(pcm16) {
+                const out = new Uint8Array(pcm16.length >> 1);
+                let { predictor, index } = adpcmState;
+                for (let i = 0; i < out.length * 2; i++) {
+                    const step = IMA_STEPS[index];
+                    let diff = pcm16[i] - predictor;
+                    let nibble = 0;
+                    if (diff < 0) { nibble = 8; diff = -diff; }
+                    let delta = step >> 3;
+                    if (diff >= step) { nibble |= 4; diff -= step; delta += step; }
+                    if (diff >= step >> 1) { nibble |= 2; diff -= step >> 1; delta += step >> 1; }
+                    if (diff >= step >> 2) { nibble |= 1; delta += step >> 2; }
+                    predictor += nibble & 8 ? -delta : delta;
+                    predictor = Math.max(-32768, Math.min(32767, predictor));
+                    index = Math.max(0, Math.min(88, index + IMA_INDEX_ADJUST[nibble & 7]));
+                    out[i >> 1] |= i & 1 ? nibble << 4 : nibble;
+                }
+                adpcmState = { predictor, index };
+                return out;
+            }
         </script>
     </body>
     </html>
@@ -428,7 +2007,7 @@ async def test_page():
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from workers import serve
     print("Starting ASR API Server...")
     print("Browser test interface: http://localhost:8000/test")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    serve(app, lambda: drain_sessions(DRAIN_TIMEOUT), host="0.0.0.0", port=8000, workers=WORKERS)
\ No newline at end of file
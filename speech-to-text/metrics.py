@@ -0,0 +1,222 @@
+"""
+Relay metrics
+Counters, gauges and histograms exported by GET /metrics in the Prometheus
+text format, plus the per-session clocks used to attribute latency to the
+relay's stages. Label children are created once per session and held by the
+caller, histogram buckets are preallocated and packet timestamps live in
+fixed-size arrays, so recording on the per-frame path allocates nothing.
+"""
+
+import asyncio
+import bisect
+import math
+import time
+from array import array
+
+# Seconds; covers queue waits of a millisecond up to slow provider finals
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Where latency accumulates, in the order audio moves through the relay
+STAGES = (
+    "uplink_queue",             # ingested -> sent upstream
+    "provider",                 # sent upstream -> result received for that audio
+    "ingest_to_first_interim",  # ingested -> first interim of an utterance
+    "ingest_to_final",          # ingested -> final covering that audio
+    "downlink_queue",           # result received -> taken for the browser
+)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation
+
+        None when there are no observations or it is past the last bucket.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return None
+
+
+class Metric:
+    """A metric family: one child per label set, or values collected at scrape time"""
+
+    def __init__(self, name, help, kind, labelnames=(), factory=None, collect=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.factory = factory
+        self.collect = collect
+        self.children = {}
+
+    def labels(self, *values):
+        """Child for these label values; hold on to it instead of calling per frame"""
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+    def samples(self):
+        if self.collect:
+            return self.collect().items()
+        return self.children.items()
+
+
+def format_labels(names, values, extra="") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=(), collect=None):
+        return self.add(Metric(name, help, "counter", labelnames, Counter, collect))
+
+    def gauge(self, name, help, labelnames=(), collect=None):
+        return self.add(Metric(name, help, "gauge", labelnames, Counter, collect))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.add(Metric(name, help, "histogram", labelnames, lambda: Histogram(buckets)))
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.samples():
+                if metric.kind != "histogram":
+                    value = child.value if isinstance(child, Counter) else child
+                    lines.append(f"{metric.name}{format_labels(metric.labelnames, values)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(child.buckets + (float("inf"),), child.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = format_labels(metric.labelnames, values, f'le="{le}"')
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = format_labels(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {child.sum}")
+                lines.append(f"{metric.name}_count{labels} {child.count}")
+        return "\n".join(lines) + "\n"
+
+
+class AudioClock:
+    """When each upstream audio packet of a session was ingested and sent
+
+    Packets are numbered in send order, so a provider timestamp on the
+    upstream audio clock maps back to the packet it describes. Packets of
+    several `packet_ms` (adaptive sizing) take one slot per `packet_ms`
+    they cover. The last `history_seconds` of slots are kept in
+    preallocated arrays.
+    """
+
+    def __init__(self, packet_ms, bytes_per_ms=32.0, history_seconds=30.0):
+        self.packet_ms = packet_ms
+        self.packet_bytes = packet_ms * bytes_per_ms
+        self.size = int(history_seconds * 1000 / packet_ms)
+        self.ingested = array("d", bytes(8 * self.size))
+        self.sent = array("d", bytes(8 * self.size))
+        self.ingested_count = 0
+        self.sent_count = 0
+
+    def slots(self, size):
+        return 1 if size is None else max(1, math.ceil(size / self.packet_bytes))
+
+    def ingest(self, now, size=None):
+        for _ in range(self.slots(size)):
+            self.ingested[self.ingested_count % self.size] = now
+            self.ingested_count += 1
+
+    def send(self, now, size=None):
+        for _ in range(self.slots(size)):
+            self.sent[self.sent_count % self.size] = now
+            self.sent_count += 1
+
+    def index(self, end_ms, count):
+        """Slot of the packet containing audio time `end_ms`, or None"""
+        index = max(0, int(-(-end_ms // self.packet_ms)) - 1)
+        if index >= count or count - index > self.size:
+            return None
+        return index % self.size
+
+    def ingested_at(self, end_ms):
+        index = self.index(end_ms, self.ingested_count)
+        return None if index is None else self.ingested[index]
+
+    def sent_at(self, end_ms):
+        index = self.index(end_ms, self.sent_count)
+        return None if index is None else self.sent[index]
+
+
+class StageLatency:
+    """Per-session stage latencies, also recorded into the shared family"""
+
+    def __init__(self, family: Metric, provider: str):
+        self.local = {stage: Histogram() for stage in STAGES}
+        self.shared = {stage: family.labels(provider, stage) for stage in STAGES}
+
+    def observe(self, stage, seconds):
+        self.local[stage].observe(seconds)
+        self.shared[stage].observe(seconds)
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else seconds * 1000
+
+        return {
+            stage: {
+                "count": histogram.count,
+                "avg_ms": ms(histogram.sum / histogram.count) if histogram.count else None,
+                # Bucket upper bounds
+                "p50_ms": ms(histogram.quantile(0.5)),
+                "p99_ms": ms(histogram.quantile(0.99)),
+            }
+            for stage, histogram in self.local.items()
+        }
+
+
+async def probe_loop_lag(histogram: Histogram, interval=0.05):
+    """Record how late the event loop wakes a sleeping task"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        histogram.observe(max(0.0, time.perf_counter() - started - interval))
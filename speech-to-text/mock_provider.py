@@ -0,0 +1,367 @@
+"""
+Local mock ASR provider
+Speaks the AssemblyAI v3 and Deepgram live streaming protocols so the relay
+can be load-tested without API keys, credits or a microphone.
+
+    python mock_provider.py --port 8100 --latency-ms 150 --jitter-ms 40
+    ASSEMBLYAI_URL=ws://localhost:8100/v3/ws python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+
+SAMPLE_RATE = 16000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+WORDS = (
+    "the quick brown fox jumps over the lazy dog while the team reviews "
+    "the quarterly roadmap and schedules a follow up meeting for friday"
+).split()
+
+
+class MockConfig:
+    """Tunable behaviour of the mock provider"""
+
+    def __init__(self, latency_ms=150.0, jitter_ms=0.0, word_ms=300,
+                 interim_ms=200, utterance_ms=2400, seed=None, fail_after_ms=None,
+                 message_ms=0.0, bandwidth_kbps=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # Network conditions: a fixed cost per message received and a cap on
+        # throughput (0 = none). Messages are taken in turn, so on a link
+        # that cannot keep up they queue and every result comes back later.
+        self.message_ms = message_ms
+        self.bandwidth_kbps = bandwidth_kbps
+        self.word_ms = word_ms
+        self.interim_ms = interim_ms
+        self.utterance_ms = utterance_ms
+        self.fail_after_ms = fail_after_ms
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        """Processing delay for one response, in seconds"""
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def transfer(self, size: int) -> float:
+        """Time to take in one message of `size` bytes, in seconds"""
+        seconds = self.message_ms / 1000
+        if self.bandwidth_kbps:
+            seconds += size * 8 / (self.bandwidth_kbps * 1000)
+        return seconds
+
+
+class MockSession:
+    """Fakes transcription for one upstream connection
+
+    The session keeps an audio clock driven by the number of PCM16 bytes
+    received. Every `interim_ms` of audio produces an interim hypothesis and
+    every `utterance_ms` closes the utterance with a final. Responses are
+    delivered after the configured latency/jitter but never out of order,
+    like a real provider.
+    """
+
+    def __init__(self, websocket, config: MockConfig):
+        self.websocket = websocket
+        self.config = config
+        self.audio_ms = 0
+        self.utterance_start_ms = 0
+        self.last_interim_ms = 0
+        self.word_index = 0
+        self.started = time.monotonic()
+        self.outbox = asyncio.Queue()
+        self.last_due = 0.0
+
+    def words_between(self, start_ms, end_ms):
+        """Fake word timings covering [start_ms, end_ms) of audio"""
+        words = []
+        t = start_ms
+        index = self.word_index
+        while t + self.config.word_ms <= end_ms:
+            words.append({
+                "text": WORDS[index % len(WORDS)],
+                "start": t,
+                "end": t + self.config.word_ms,
+                "confidence": 0.9,
+            })
+            index += 1
+            t += self.config.word_ms
+        return words
+
+    def schedule(self, message):
+        """Queue a response for delivery after the simulated processing delay"""
+        due = max(self.last_due, time.monotonic() + self.config.delay())
+        self.last_due = due
+        self.outbox.put_nowait((due, message))
+
+    async def deliver(self):
+        """Send scheduled responses in order once they are due"""
+        while True:
+            due, message = await self.outbox.get()
+            if message is None:
+                return
+            wait = due - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.websocket.send(json.dumps(message))
+
+    def on_audio(self, chunk: bytes):
+        """Advance the audio clock and emit interims/finals that became due"""
+        self.audio_ms += len(chunk) / BYTES_PER_MS
+        if self.audio_ms - self.utterance_start_ms >= self.config.utterance_ms:
+            self.finish_utterance()
+        elif self.audio_ms - self.last_interim_ms >= self.config.interim_ms:
+            self.last_interim_ms = self.audio_ms
+            words = self.words_between(self.utterance_start_ms, self.audio_ms)
+            if words:
+                self.schedule(self.interim(words))
+
+    def finish_utterance(self):
+        """Close the current utterance with a final"""
+        words = self.words_between(self.utterance_start_ms, self.audio_ms)
+        if words:
+            for message in self.final(words):
+                self.schedule(message)
+        self.word_index += len(words)
+        self.utterance_start_ms = self.audio_ms
+        self.last_interim_ms = self.audio_ms
+
+    def opening(self):
+        return []
+
+    def interim(self, words):
+        raise NotImplementedError
+
+    def final(self, words):
+        raise NotImplementedError
+
+    def on_control(self, message: dict) -> bool:
+        """Handle a JSON control message, return True when the stream ends"""
+        raise NotImplementedError
+
+    def closing(self):
+        return []
+
+    async def run(self):
+        deliverer = asyncio.create_task(self.deliver())
+        for message in self.opening():
+            self.schedule(message)
+        try:
+            async for frame in self.websocket:
+                transfer = self.config.transfer(len(frame))
+                if transfer:
+                    await asyncio.sleep(transfer)
+                if isinstance(frame, bytes):
+                    self.on_audio(frame)
+                    if self.config.fail_after_ms and self.audio_ms >= self.config.fail_after_ms:
+                        # Simulate a provider outage mid-stream
+                        await self.websocket.close(code=1011, reason="mock failure")
+                        return
+                elif self.on_control(json.loads(frame)):
+                    break
+            self.finish_utterance()
+            for message in self.closing():
+                self.schedule(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.outbox.put_nowait((0.0, None))
+            try:
+                await deliverer
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+
+class MockAssemblyAI(MockSession):
+    """AssemblyAI Universal Streaming v3: Begin / Turn / Termination"""
+
+    def __init__(self, websocket, config):
+        super().__init__(websocket, config)
+        self.turn_order = 0
+
+    def opening(self):
+        return [{
+            "type": "Begin",
+            "id": str(uuid.uuid4()),
+            "expires_at": int(time.time()) + 3600,
+        }]
+
+    def turn(self, words, end_of_turn=False, formatted=False):
+        text = " ".join(w["text"] for w in words)
+        if formatted:
+            text = text[:1].upper() + text[1:] + "."
+        return {
+            "type": "Turn",
+            "turn_order": self.turn_order,
+            "turn_is_formatted": formatted,
+            "end_of_turn": end_of_turn,
+            "transcript": text,
+            "end_of_turn_confidence": 0.9 if end_of_turn else 0.1,
+            "words": [dict(w, word_is_final=end_of_turn) for w in words],
+        }
+
+    def interim(self, words):
+        return self.turn(words)
+
+    def final(self, words):
+        messages = [
+            self.turn(words, end_of_turn=True),
+            self.turn(words, end_of_turn=True, formatted=True),
+        ]
+        self.turn_order += 1
+        return messages
+
+    def on_control(self, message):
+        return message.get("type") == "Terminate"
+
+    def closing(self):
+        return [{
+            "type": "Termination",
+            "audio_duration_seconds": round(self.audio_ms / 1000, 3),
+            "session_duration_seconds": round(time.monotonic() - self.started, 3),
+        }]
+
+
+class MockDeepgram(MockSession):
+    """Deepgram live transcription (/v1/listen): Results / Metadata"""
+
+    def __init__(self, websocket, config):
+        super().__init__(websocket, config)
+        self.request_id = str(uuid.uuid4())
+
+    def results(self, words, is_final):
+        start = words[0]["start"]
+        end = words[-1]["end"]
+        return {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": round((end - start) / 1000, 3),
+            "start": round(start / 1000, 3),
+            "is_final": is_final,
+            "speech_final": is_final,
+            "channel": {
+                "alternatives": [{
+                    "transcript": " ".join(w["text"] for w in words),
+                    "confidence": 0.9,
+                    "words": [
+                        {
+                            "word": w["text"],
+                            "start": w["start"] / 1000,
+                            "end": w["end"] / 1000,
+                            "confidence": w["confidence"],
+                        }
+                        for w in words
+                    ],
+                }],
+            },
+            "metadata": {"request_id": self.request_id},
+        }
+
+    def interim(self, words):
+        return self.results(words, is_final=False)
+
+    def final(self, words):
+        return [self.results(words, is_final=True)]
+
+    def on_control(self, message):
+        return message.get("type") == "CloseStream"
+
+    def closing(self):
+        return [{
+            "type": "Metadata",
+            "request_id": self.request_id,
+            "duration": round(self.audio_ms / 1000, 3),
+            "channels": 1,
+        }]
+
+
+ROUTES = {
+    "/v3/ws": MockAssemblyAI,
+    "/v1/listen": MockDeepgram,
+}
+
+
+def make_handler(config: MockConfig):
+    async def handler(websocket):
+        url = urlsplit(websocket.path)
+        session_class = ROUTES.get(url.path)
+        if session_class is None:
+            await websocket.close(code=4004, reason=f"Unknown path {url.path}")
+            return
+        # Per-connection overrides, e.g. /v3/ws?mock_latency_ms=400
+        query = parse_qs(url.query)
+        session_config = config
+        if "mock_latency_ms" in query or "mock_jitter_ms" in query:
+            session_config = MockConfig(
+                latency_ms=float(query.get("mock_latency_ms", [config.latency_ms])[0]),
+                jitter_ms=float(query.get("mock_jitter_ms", [config.jitter_ms])[0]),
+                word_ms=config.word_ms,
+                interim_ms=config.interim_ms,
+                utterance_ms=config.utterance_ms,
+                fail_after_ms=config.fail_after_ms,
+                message_ms=config.message_ms,
+                bandwidth_kbps=config.bandwidth_kbps,
+            )
+        await session_class(websocket, session_config).run()
+
+    return handler
+
+
+async def serve(host, port, config: MockConfig, reuse_port=False):
+    # reuse_port lets several mock processes share the port under heavy load
+    async with websockets.serve(make_handler(config), host, port, max_size=None,
+                                reuse_port=reuse_port):
+        print(f"Mock ASR provider listening on ws://{host}:{port}")
+        print(f"  AssemblyAI: ws://{host}:{port}/v3/ws")
+        print(f"  Deepgram:   ws://{host}:{port}/v1/listen")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock ASR provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=150.0,
+                        help="Processing delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="Uniform +/- jitter on the processing delay")
+    parser.add_argument("--interim-ms", type=int, default=200,
+                        help="Audio between interim hypotheses")
+    parser.add_argument("--utterance-ms", type=int, default=2400,
+                        help="Audio per utterance before a final is emitted")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fail-after-ms", type=int, default=None,
+                        help="Drop each connection after this much audio (reconnect testing)")
+    parser.add_argument("--message-ms", type=float, default=0.0,
+                        help="Simulated network cost per message received")
+    parser.add_argument("--bandwidth-kbps", type=float, default=0.0,
+                        help="Simulated uplink bandwidth (0 = unlimited)")
+    parser.add_argument("--reuse-port", action="store_true",
+                        help="Bind with SO_REUSEPORT so several mock processes can share the port")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        interim_ms=args.interim_ms,
+        utterance_ms=args.utterance_ms,
+        seed=args.seed,
+        fail_after_ms=args.fail_after_ms,
+        message_ms=args.message_ms,
+        bandwidth_kbps=args.bandwidth_kbps,
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, config, args.reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
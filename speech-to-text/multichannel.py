@@ -0,0 +1,80 @@
+"""
+Multi-channel sessions
+A meeting-room rig sends interleaved N-channel PCM16, one speaker per
+channel. Each channel gets its own upstream session; TranscriptMerger
+combines their results into one speaker-tagged stream with finals in order
+of when they were spoken.
+"""
+
+import heapq
+import itertools
+
+
+class TranscriptMerger:
+    """Orders finals from several channels on the shared audio clock
+
+    Results are normalized dicts with `text`, `is_final`, `start_ms` and
+    `end_ms`; every channel's clock starts with the same client frame.
+    Interims go out right away. A final is held until every other channel
+    has reported audio past its start, so nothing said earlier can still
+    arrive, or until it has waited `hold_ms` (a silent channel reports
+    nothing). A final that arrives after later ones were released is sent
+    at once and counted as late.
+    """
+
+    def __init__(self, speakers, hold_ms=1500.0):
+        self.speakers = speakers
+        self.hold = hold_ms / 1000
+        self.progress = [0.0] * len(speakers)  # end_ms of the latest result per channel
+        self.held = []  # (start_ms, seq, channel, payload, arrived)
+        self.seq = itertools.count()
+        self.released_until = 0.0
+        self.finals = 0
+        self.late = 0
+
+    def payload(self, channel, result) -> dict:
+        start, end = result["start_ms"], result["end_ms"]
+        return {
+            "type": "transcript",
+            "text": result["text"],
+            "is_final": result["is_final"],
+            "start": start / 1000,
+            "duration": (end - start) / 1000,
+            "speaker": self.speakers[channel],
+            "channel": channel,
+        }
+
+    def on_result(self, channel, result, now) -> list:
+        """Payloads to send for this result, in order"""
+        self.progress[channel] = max(self.progress[channel], result["end_ms"])
+        if not result["is_final"]:
+            return [self.payload(channel, result)] + self.due(now)
+        self.finals += 1
+        if result["start_ms"] < self.released_until:
+            self.late += 1
+            return [self.payload(channel, result)] + self.due(now)
+        heapq.heappush(self.held, (result["start_ms"], next(self.seq), channel,
+                                   self.payload(channel, result), now))
+        return self.due(now)
+
+    def due(self, now) -> list:
+        """Held finals that can be released"""
+        out = []
+        while self.held:
+            start, _, channel, payload, arrived = self.held[0]
+            caught_up = all(
+                progress >= start for c, progress in enumerate(self.progress) if c != channel
+            )
+            if not caught_up and now - arrived < self.hold:
+                break
+            heapq.heappop(self.held)
+            self.released_until = max(self.released_until, start)
+            out.append(payload)
+        return out
+
+    def flush(self) -> list:
+        """Everything still held, in order"""
+        return [heapq.heappop(self.held)[3] for _ in range(len(self.held))]
+
+    def stats(self) -> dict:
+        return {"finals": self.finals, "late": self.late, "held": len(self.held)}
@@ -0,0 +1,67 @@
+"""
+Multiplexed streams over one client WebSocket
+A gateway aggregating many microphones opens one socket to /ws/mux instead
+of one per stream. Binary frames start with a 2-byte big-endian stream id
+followed by the stream's audio; text messages open, configure and close
+logical streams, each on its own provider session. Audio is handed to its
+stream as a memoryview of the received frame, so routing copies nothing.
+Every message sent back carries the `stream` it belongs to.
+"""
+
+import json
+import struct
+
+HEADER = struct.Struct(">H")
+MAX_STREAM_ID = 0xFFFF
+
+
+def frame(stream_id: int, audio) -> bytes:
+    """A binary frame carrying `audio` for `stream_id` (client side)"""
+    return HEADER.pack(stream_id) + audio
+
+
+def split_frame(data: bytes) -> tuple:
+    """(stream id, audio view) of a binary frame"""
+    if len(data) < HEADER.size:
+        raise ValueError(f"frame of {len(data)} bytes has no stream header")
+    return HEADER.unpack_from(data)[0], memoryview(data)[HEADER.size:]
+
+
+def stream_id_of(msg: dict) -> int:
+    """Stream id of a control message"""
+    stream_id = msg.get("stream")
+    if not isinstance(stream_id, int) or not 0 <= stream_id <= MAX_STREAM_ID:
+        raise ValueError(f"stream must be an integer from 0 to {MAX_STREAM_ID}")
+    return stream_id
+
+
+def tag(message, stream_id: int) -> str:
+    """`message` (a JSON object, serialized or not) with its stream id added
+
+    Serialized messages (provider passthrough, or already encoded for
+    subscribers) get the field spliced in rather than being parsed again.
+    """
+    if not isinstance(message, str):
+        return json.dumps(dict(message, stream=stream_id), separators=(",", ":"), ensure_ascii=False)
+    body = message.lstrip()[1:]
+    if body.lstrip().startswith("}"):
+        return f'{{"stream":{stream_id}}}'
+    return f'{{"stream":{stream_id},{body}'
+
+
+class StreamSocket:
+    """One stream's view of the shared client socket
+
+    Stands in for the WebSocket in send_downstream: messages are tagged with
+    the stream id and written whole to the shared socket.
+    """
+
+    def __init__(self, websocket, stream_id: int):
+        self.websocket = websocket
+        self.stream_id = stream_id
+
+    async def send_text(self, message: str):
+        await self.websocket.send_text(tag(message, self.stream_id))
+
+    async def send_json(self, message: dict):
+        await self.websocket.send_text(tag(message, self.stream_id))
@@ -0,0 +1,134 @@
+"""
+Adaptive upstream packet sizing
+Client audio is re-framed into fixed packets before it goes upstream. Small
+packets reach the provider sooner, but every packet is a socket write and,
+at the provider, a message to process; on a slow or lossy link many small
+packets queue up and every result comes back later. PacketSizer picks the
+packet duration per session from what the session measures, within the
+provider's limits.
+"""
+
+import math
+
+
+class PacketSizer:
+    """Packet duration for one session, adjusted every `interval` seconds
+
+    Two measurements drive it:
+    - send time: how long writing packets to the upstream socket takes as
+      a share of the audio they carry, and audio left waiting in the uplink
+    - turnaround: audio sent until a result covering it comes back. The
+      lowest interval average is the link's baseline; staying more than
+      `slack` seconds above it without coming down means packets queue on
+      the way (a slow link, or a provider falling behind)
+
+    Under pressure the size doubles, up to `max_ms`. After `calm_intervals`
+    quiet intervals it shrinks by one step of `min_ms`, but not back to a
+    size that was under pressure in the last `retry_seconds`. Sizes are
+    multiples of `min_ms`.
+    """
+
+    def __init__(self, packet_ms=50, min_ms=25, max_ms=250, interval=1.0, slack=0.1,
+                 calm_intervals=3, retry_seconds=30.0, max_backlog_ms=250):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.packet_ms = min(max_ms, max(min_ms, round(packet_ms / min_ms) * min_ms))
+        self.interval = interval
+        self.slack = slack
+        self.calm_intervals = calm_intervals
+        self.retry_seconds = retry_seconds
+        self.max_backlog_ms = max_backlog_ms
+
+        self.evaluated_at = None
+        self.send_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.backlog = 0
+        self.turnaround_total = 0.0
+        self.turnaround_count = 0
+        self.baseline = math.inf
+        self.last_excess = None
+        self.calm = 0
+        self.congested_ms = 0
+        self.congested_at = -math.inf
+
+        self.changes = 0
+        self.smallest = self.largest = self.packet_ms
+
+    def on_send(self, seconds: float, audio_ms: float, backlog_ms: float):
+        """A packet carrying `audio_ms` took `seconds` to send, with
+        `backlog_ms` of audio still waiting behind it"""
+        self.send_seconds += seconds
+        self.audio_seconds += audio_ms / 1000
+        self.backlog = max(self.backlog, backlog_ms)
+
+    def on_turnaround(self, seconds: float):
+        self.turnaround_total += seconds
+        self.turnaround_count += 1
+
+    def update(self, now: float):
+        """The new packet duration in ms if it changes now, else None"""
+        if self.evaluated_at is None:
+            # Audio buffered while the upstream connected drains in a burst
+            self.evaluated_at = now
+            self.reset()
+            return None
+        if now - self.evaluated_at < self.interval:
+            return None
+        self.evaluated_at = now
+
+        busy = self.send_seconds / self.audio_seconds if self.audio_seconds else 0.0
+        backlog = self.backlog
+        excess = None
+        if self.turnaround_count:
+            turnaround = self.turnaround_total / self.turnaround_count
+            self.baseline = min(self.baseline, turnaround)
+            excess = turnaround - self.baseline
+        self.reset()
+
+        # Queueing that is already draining needs no bigger packets
+        queueing = (
+            excess is not None and excess > self.slack
+            and (self.last_excess is None or excess > 0.9 * self.last_excess)
+        )
+        if excess is not None:
+            self.last_excess = excess
+        if busy > 0.5 or backlog > self.max_backlog_ms or queueing:
+            self.calm = 0
+            self.congested_ms = self.packet_ms
+            self.congested_at = now
+            return self.resize(min(self.max_ms, self.packet_ms * 2))
+        if busy < 0.2 and backlog == 0 and (excess is None or excess < self.slack / 2):
+            self.calm += 1
+        else:
+            self.calm = 0
+        if self.calm < self.calm_intervals:
+            return None
+        self.calm = 0
+        smaller = self.packet_ms - self.min_ms
+        if smaller < self.min_ms:
+            return None
+        if smaller <= self.congested_ms and now - self.congested_at < self.retry_seconds:
+            return None
+        return self.resize(smaller)
+
+    def reset(self):
+        self.send_seconds = self.audio_seconds = self.turnaround_total = 0.0
+        self.backlog = self.turnaround_count = 0
+
+    def resize(self, packet_ms):
+        if packet_ms == self.packet_ms:
+            return None
+        self.packet_ms = packet_ms
+        self.changes += 1
+        self.smallest = min(self.smallest, packet_ms)
+        self.largest = max(self.largest, packet_ms)
+        return packet_ms
+
+    def stats(self) -> dict:
+        return {
+            "packet_ms": self.packet_ms,
+            "min_ms": self.smallest,
+            "max_ms": self.largest,
+            "changes": self.changes,
+            "baseline_ms": self.baseline * 1000 if self.baseline != math.inf else None,
+        }
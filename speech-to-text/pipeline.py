@@ -0,0 +1,137 @@
+"""
+Bounded queue stages between the client and upstream sockets
+Each direction of a relay session gets its own queue so a slow provider
+cannot stall reads from the browser and a slow browser cannot stall the
+provider. Queues are capped in items and bytes and count depth and drops.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+# Overflow policies
+BLOCK = "block"              # wait for room (backpressure to the producer)
+DROP_OLDEST = "drop_oldest"  # discard the oldest droppable item
+COALESCE = "coalesce"        # replace a queued interim with the newer one
+
+POLICIES = (BLOCK, DROP_OLDEST, COALESCE)
+
+# Item kinds. Audio and interims may be dropped or coalesced; finals and
+# control messages never are.
+AUDIO = "audio"
+INTERIM = "interim"
+FINAL = "final"
+CONTROL = "control"
+
+DROPPABLE = (AUDIO, INTERIM)
+
+
+class QueueClosed(Exception):
+    """Raised by BoundedQueue.get once the queue is closed and drained"""
+
+
+class BoundedQueue:
+    """Single-producer/single-consumer queue with an overflow policy"""
+
+    def __init__(self, name, max_items=256, max_bytes=1 << 20, policy=BLOCK):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {POLICIES}")
+        self.name = name
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.items = deque()
+        self.bytes = 0
+        self.closed = False
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.last_wait = 0.0  # seconds the last item taken spent queued
+
+        self.max_depth = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.coalesced = 0
+        self.blocked = 0
+
+    def full(self, size) -> bool:
+        # An item larger than max_bytes still goes into an empty queue;
+        # waiting for room would never end
+        if not self.items:
+            return False
+        return len(self.items) >= self.max_items or self.bytes + size > self.max_bytes
+
+    def drop_oldest(self) -> bool:
+        """Discard the oldest droppable item, return False if there is none"""
+        for i, (_, size, kind, _) in enumerate(self.items):
+            if kind in DROPPABLE:
+                del self.items[i]
+                self.bytes -= size
+                self.dropped += 1
+                self.dropped_bytes += size
+                return True
+        return False
+
+    async def put(self, payload, size=0, kind=CONTROL):
+        """Enqueue `payload`, applying the overflow policy when full"""
+        if self.closed:
+            return
+        if self.policy == COALESCE and kind == INTERIM and self.items and self.items[-1][2] == INTERIM:
+            # Only the newest hypothesis matters; overwrite the one not yet sent
+            _, old_size, _, _ = self.items[-1]
+            self.items[-1] = (payload, size, kind, time.perf_counter())
+            self.bytes += size - old_size
+            self.coalesced += 1
+            return
+        while self.full(size):
+            if self.policy != BLOCK and self.drop_oldest():
+                continue
+            if kind in DROPPABLE and self.policy != BLOCK:
+                # Nothing older to sacrifice: drop the new item instead
+                self.dropped += 1
+                self.dropped_bytes += size
+                return
+            self.blocked += 1
+            self.not_full.clear()
+            await self.not_full.wait()
+            if self.closed:
+                return
+        self.items.append((payload, size, kind, time.perf_counter()))
+        self.bytes += size
+        self.max_depth = max(self.max_depth, len(self.items))
+        self.not_empty.set()
+
+    async def get(self):
+        """Dequeue the next payload, raise QueueClosed when drained"""
+        payload, _ = await self.get_item()
+        return payload
+
+    async def get_item(self):
+        """Dequeue the next (payload, kind), raise QueueClosed when drained"""
+        while not self.items:
+            if self.closed:
+                raise QueueClosed(self.name)
+            self.not_empty.clear()
+            await self.not_empty.wait()
+        payload, size, kind, queued_at = self.items.popleft()
+        self.last_wait = time.perf_counter() - queued_at
+        self.bytes -= size
+        self.not_full.set()
+        return payload, kind
+
+    def close(self):
+        """Stop accepting items; the consumer drains what is left"""
+        self.closed = True
+        self.not_empty.set()
+        self.not_full.set()
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "depth": len(self.items),
+            "bytes": self.bytes,
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "dropped_bytes": self.dropped_bytes,
+            "coalesced": self.coalesced,
+            "blocked": self.blocked,
+        }
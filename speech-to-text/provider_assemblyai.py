@@ -0,0 +1,55 @@
+"""
+AssemblyAI provider plugin
+"""
+
+import json
+
+from pipeline import FINAL, INTERIM
+from providers import Provider
+
+
+class AssemblyAIProvider(Provider):
+    """AssemblyAI Universal Streaming v3, forwarded to clients verbatim"""
+
+    name = "assemblyai"
+    label = "AssemblyAI"
+    terminate_message = json.dumps({"type": "Terminate"})
+    session_start_types = ("Begin",)
+    # No keepalive message in v3; 50 ms of silence keeps the session active
+    keepalive_message = bytes(1600)
+    passthrough = True
+
+    def headers(self):
+        return {"Authorization": self.api_key}
+
+    def translate(self, message):
+        data = json.loads(message)
+        kind = INTERIM if data.get("type") == "Turn" and not data.get("end_of_turn") else FINAL
+        return [(data, kind)]
+
+    def normalize(self, payload):
+        words = payload.get("words")
+        if payload.get("type") != "Turn" or not words:
+            return None
+        # With format_turns the formatted Turn is the one clients treat as final
+        formatted = not self.params.get("format_turns") or payload.get("turn_is_formatted")
+        return {
+            "text": payload["transcript"],
+            "is_final": bool(payload.get("end_of_turn") and formatted),
+            "start_ms": words[0]["start"],
+            "end_ms": words[-1]["end"],
+        }
+
+    def transcript_text(self, payload):
+        return payload.get("transcript", "")
+
+    def rebase(self, payload, offset_ms, utterances_before):
+        if payload.get("type") != "Turn":
+            return payload
+        payload = dict(payload)
+        payload["turn_order"] = payload.get("turn_order", 0) + utterances_before
+        payload["words"] = [
+            dict(word, start=word["start"] + offset_ms, end=word["end"] + offset_ms)
+            for word in payload.get("words", [])
+        ]
+        return payload
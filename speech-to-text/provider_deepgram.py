@@ -0,0 +1,52 @@
+"""
+Deepgram provider plugin
+"""
+
+import json
+
+from pipeline import FINAL, INTERIM
+from providers import Provider
+
+
+class DeepgramProvider(Provider):
+    """Deepgram live transcription, normalized to `transcript` messages"""
+
+    name = "deepgram"
+    label = "Deepgram"
+    terminate_message = json.dumps({"type": "CloseStream"})
+    # Deepgram closes sockets that see no audio for ~10 s
+    keepalive_message = json.dumps({"type": "KeepAlive"})
+
+    def headers(self):
+        return {"Authorization": f"Token {self.api_key}"}
+
+    def translate(self, message):
+        data = json.loads(message)
+        if data.get("type") != "Results":
+            return []
+        transcript = data["channel"]["alternatives"][0]["transcript"]
+        if not transcript:
+            return []
+        is_final = data.get("is_final", False)
+        return [({
+            "type": "transcript",
+            "text": transcript,
+            "is_final": is_final,
+            "start": data.get("start"),
+            "duration": data.get("duration"),
+        }, FINAL if is_final else INTERIM)]
+
+    def normalize(self, payload):
+        start = payload.get("start") or 0.0
+        return {
+            "text": payload["text"],
+            "is_final": payload["is_final"],
+            "start_ms": start * 1000,
+            "end_ms": (start + (payload.get("duration") or 0.0)) * 1000,
+        }
+
+    def transcript_text(self, payload):
+        return payload["text"]
+
+    def rebase(self, payload, offset_ms, utterances_before):
+        return dict(payload, start=(payload.get("start") or 0.0) + offset_ms / 1000)
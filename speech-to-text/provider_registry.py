@@ -0,0 +1,88 @@
+"""
+Provider plugin registry
+Providers are declared up front (name, plugin module, endpoint, audio format
+and framing) but their modules are only imported, and the provider built,
+the first time a session, pool or upload needs them. A deployment can enable
+a subset; disabled providers are never imported and are rejected like
+unknown ones.
+"""
+
+import importlib
+
+
+class ProviderSpec:
+    """What the relay needs to know about a provider without loading it
+
+    `module` and `cls` name the plugin class. `sample_rate` is the audio the
+    provider is configured for, `packet_ms` the packet duration to send it
+    and `min_packet_ms`/`max_packet_ms` the range adaptive sizing may use,
+    all applied to the provider when it is loaded.
+    """
+
+    def __init__(self, name, label, module, cls, url, params, api_key, sample_rate=16000, packet_ms=50,
+                 min_packet_ms=None, max_packet_ms=None):
+        self.name = name
+        self.label = label
+        self.module = module
+        self.cls = cls
+        self.url = url
+        self.params = params
+        self.api_key = api_key
+        self.sample_rate = sample_rate
+        self.packet_ms = packet_ms
+        self.min_packet_ms = min_packet_ms or packet_ms
+        self.max_packet_ms = max_packet_ms or packet_ms
+
+
+class ProviderRegistry:
+    """Enabled providers by name, loaded on first lookup
+
+    Behaves like the dict of providers it replaces: `name in registry`,
+    iteration over enabled names and `registry[name]`.
+    """
+
+    def __init__(self, specs, enabled=None):
+        self.specs = {spec.name: spec for spec in specs}
+        if enabled is None:
+            enabled = list(self.specs)
+        unknown = [name for name in enabled if name not in self.specs]
+        if unknown:
+            raise ValueError(f"unknown providers: {', '.join(unknown)}")
+        self.enabled = list(dict.fromkeys(enabled))
+        self.providers = {}
+
+    def __contains__(self, name):
+        return name in self.enabled
+
+    def __iter__(self):
+        return iter(self.enabled)
+
+    def __len__(self):
+        return len(self.enabled)
+
+    def __getitem__(self, name):
+        provider = self.providers.get(name)
+        if provider is None:
+            if name not in self.enabled:
+                raise KeyError(name)
+            provider = self.providers[name] = self.load(self.specs[name])
+        return provider
+
+    def load(self, spec: ProviderSpec):
+        cls = getattr(importlib.import_module(spec.module), spec.cls)
+        provider = cls(spec.url, spec.params, spec.api_key)
+        provider.sample_rate = spec.sample_rate
+        provider.packet_ms = spec.packet_ms
+        provider.min_packet_ms = spec.min_packet_ms
+        provider.max_packet_ms = spec.max_packet_ms
+        print(f"Loaded provider plugin {spec.name} ({spec.module}.{spec.cls})")
+        return provider
+
+    def spec(self, name) -> ProviderSpec:
+        return self.specs[name]
+
+    def stats(self) -> dict:
+        return {
+            name: {"label": self.specs[name].label, "loaded": name in self.providers}
+            for name in self.enabled
+        }
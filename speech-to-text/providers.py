@@ -0,0 +1,73 @@
+"""
+Upstream provider protocols
+Everything the relay needs to stream to a provider over a plain WebSocket:
+how to connect, how to end or keep alive the stream, and how to turn provider
+messages into the messages browser clients expect. Each provider is a plugin
+module (provider_assemblyai.py, provider_deepgram.py) loaded on first use by
+provider_registry.py.
+"""
+
+from urllib.parse import urlencode
+
+import websockets
+
+
+def query_string(params: dict) -> str:
+    """URL-encode params, spelling booleans the way provider APIs expect"""
+    return urlencode({
+        key: str(value).lower() if isinstance(value, bool) else value
+        for key, value in params.items()
+    })
+
+
+class Provider:
+    """Base class for a streaming ASR provider"""
+
+    name = ""
+    label = ""
+    terminate_message = None
+    keepalive_message = None
+    # Messages a reconnected socket repeats that the client has already seen
+    session_start_types = ()
+    # Audio the provider is configured for, the packet duration to send, and
+    # the range adaptive packet sizing may choose from
+    sample_rate = 16000
+    packet_ms = 50
+    min_packet_ms = 50
+    max_packet_ms = 50
+    # Whether translated payloads are the provider message unchanged, so the
+    # original text can be forwarded without re-serializing it
+    passthrough = False
+
+    def __init__(self, url: str, params: dict, api_key: str):
+        self.endpoint = f"{url}?{query_string(params)}"
+        self.params = params
+        self.api_key = api_key
+
+    def headers(self) -> dict:
+        raise NotImplementedError
+
+    def connect(self):
+        """Open an upstream session (awaitable)"""
+        return websockets.connect(self.endpoint, extra_headers=self.headers(), max_size=None)
+
+    def translate(self, message):
+        """Turn one provider message into (client payload, kind) pairs"""
+        raise NotImplementedError
+
+    def normalize(self, payload):
+        """Provider-neutral view of a translated transcript payload
+
+        Returns a dict with `text`, `is_final`, `start_ms` and `end_ms` (on
+        the audio clock of what was sent upstream), or None for payloads that
+        are not transcripts.
+        """
+        raise NotImplementedError
+
+    def transcript_text(self, payload) -> str:
+        """Hypothesis text of a translated transcript payload"""
+        raise NotImplementedError
+
+    def rebase(self, payload, offset_ms: float, utterances_before: int):
+        """Shift a payload from a reconnected socket onto the session clock"""
+        raise NotImplementedError
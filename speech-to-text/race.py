@@ -0,0 +1,113 @@
+"""
+Provider racing
+Both providers transcribe the same audio; RaceArbiter lines their results up
+on the shared audio clock and lets through whichever provider finalizes each
+utterance first, recording win rates and how far behind the loser was.
+"""
+
+import statistics
+from collections import deque
+
+
+class Segment:
+    """A final that was forwarded to the client"""
+
+    __slots__ = ("provider", "start", "end", "at", "matched")
+
+    def __init__(self, provider, start, end, at):
+        self.provider = provider
+        self.start = start
+        self.end = end
+        self.at = at
+        self.matched = set()
+
+
+def overlap(a_start, a_end, b_start, b_end) -> float:
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+
+class RaceStats:
+    """Win counts and latency deltas, per session or aggregated"""
+
+    def __init__(self, providers):
+        self.wins = {name: 0 for name in providers}
+        self.deltas = {name: deque(maxlen=1000) for name in providers}
+
+    def record_win(self, provider):
+        self.wins[provider] += 1
+
+    def record_delta(self, winner, seconds):
+        self.deltas[winner].append(seconds)
+
+    def merge(self, other: "RaceStats"):
+        for name, wins in other.wins.items():
+            self.wins[name] = self.wins.get(name, 0) + wins
+            self.deltas.setdefault(name, deque(maxlen=1000)).extend(other.deltas[name])
+
+    def summary(self) -> dict:
+        total = sum(self.wins.values())
+        return {
+            name: {
+                "wins": wins,
+                "win_rate": wins / total if total else 0.0,
+                # How long the other provider took to catch up when this one won
+                "lead_ms_p50": (
+                    statistics.median(self.deltas[name]) * 1000 if self.deltas[name] else None
+                ),
+            }
+            for name, wins in self.wins.items()
+        }
+
+
+class RaceArbiter:
+    """Chooses which provider's results reach the client
+
+    Results are normalized dicts with `text`, `is_final`, `start_ms` and
+    `end_ms` on the shared audio clock. A final is forwarded unless most of
+    it is already covered by a final from another provider, in which case it
+    is the losing side of that utterance. Interims are forwarded only while
+    they describe audio that has not been finalized yet.
+    """
+
+    def __init__(self, providers, min_overlap=0.5, history=64):
+        self.min_overlap = min_overlap
+        self.segments = deque(maxlen=history)
+        self.finalized_until = 0.0
+        self.stats = RaceStats(providers)
+
+    def covering(self, provider, start, end):
+        """The forwarded segment from another provider that covers [start, end]"""
+        best, best_overlap = None, 0.0
+        for segment in self.segments:
+            if segment.provider == provider or provider in segment.matched:
+                continue
+            shared = overlap(start, end, segment.start, segment.end)
+            if shared > best_overlap:
+                best, best_overlap = segment, shared
+        if best and best_overlap >= self.min_overlap * max(end - start, 1.0):
+            return best
+        return None
+
+    def on_result(self, provider, result, now):
+        """Return the client payload for this result, or None to suppress it"""
+        start, end = result["start_ms"], result["end_ms"]
+        if not result["is_final"]:
+            if end <= self.finalized_until:
+                return None
+        else:
+            winner = self.covering(provider, start, end)
+            if winner:
+                winner.matched.add(provider)
+                self.stats.record_delta(winner.provider, now - winner.at)
+                return None
+            self.segments.append(Segment(provider, start, end, now))
+            self.finalized_until = max(self.finalized_until, end)
+            self.stats.record_win(provider)
+        return {
+            "type": "transcript",
+            "text": result["text"],
+            "is_final": result["is_final"],
+            "start": start / 1000,
+            "duration": (end - start) / 1000,
+            "provider": provider,
+        }
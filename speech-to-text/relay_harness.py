@@ -0,0 +1,64 @@
+"""
+The relay in a subprocess, for benchmarks and replays
+Scripts start it on a free port against the local mock provider (pointed at
+it through the environment) and talk to it over HTTP/WebSocket. The
+subprocess also runs an event-loop lag probe, read from /bench/lag.
+
+    python relay_harness.py <port>
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import time
+import urllib.request
+
+PROBE_INTERVAL = 0.005
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def relay_command(port) -> list:
+    """Command line running the relay on `port`, for subprocess.Popen"""
+    return [sys.executable, __file__, str(port)]
+
+
+def serve_relay(port):
+    """Subprocess mode: the relay plus a loop-lag probe"""
+    import uvicorn
+    import main
+
+    samples = []
+
+    async def probe():
+        # perf_counter rather than loop.time(): uvloop's clock has 1 ms resolution
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            samples.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+    @main.app.on_event("startup")
+    async def start_probe():
+        asyncio.create_task(probe())
+
+    @main.app.get("/bench/lag")
+    async def lag():
+        values = samples[:]
+        samples.clear()
+        return values
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def fetch_lag(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/bench/lag") as response:
+        return json.load(response)
+
+
+if __name__ == "__main__":
+    serve_relay(int(sys.argv[1]))
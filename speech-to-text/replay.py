@@ -0,0 +1,251 @@
+"""
+Replay a captured session through the relay
+Sends a recording made with CAPTURE_DIR (see capture.py) to the relay as the
+original client did: the same audio frames and text messages, in order, at
+their recorded times (--speed 1) or as fast as the relay takes them
+(--speed 0). Reports the finals against the recorded ones, and final
+latency of the replay against the original session.
+
+    python replay.py captures/3f2a9c0b1d4e --url ws://localhost:8000
+    python replay.py captures/3f2a9c0b1d4e --speed 0 --mock
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import subprocess
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import websockets
+
+from test_asr import percentile
+
+
+class Recording:
+    """A capture's events and audio, loaded from `<path>.jsonl` and `<path>.pcm`"""
+
+    def __init__(self, path):
+        path = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+        with open(path + ".jsonl") as f:
+            self.events = [json.loads(line) for line in f if line.strip()]
+        with open(path + ".pcm", "rb") as f:
+            self.audio = f.read()
+        if not self.events or self.events[0]["event"] != "start":
+            raise ValueError(f"{path}.jsonl does not start with a start event")
+        self.meta = self.events[0]
+        self.truncated = any(e["event"] == "end" and e.get("truncated") for e in self.events)
+        self.encoding = "pcm16"
+        for event in self.events:
+            if event["event"] == "client":
+                msg = json.loads(event["message"])
+                if msg.get("type") == "config":
+                    self.encoding = msg.get("encoding", "pcm16")
+
+    @property
+    def bytes_per_ms(self):
+        """PCM16 bytes per ms of client audio, None for compressed uplinks"""
+        if self.encoding != "pcm16":
+            return None
+        return self.meta["sample_rate"] * self.meta["channels"] * 2 / 1000
+
+    def frames(self):
+        """(t, audio bytes or text message) to send, in order"""
+        for event in self.events:
+            if event["event"] == "audio":
+                yield event["t"], self.audio[event["offset"]:event["offset"] + event["bytes"]]
+            elif event["event"] == "client":
+                yield event["t"], event["message"]
+
+    def finals(self):
+        """Recorded (text, end_ms, t) of every final"""
+        return [(e["text"], e["end_ms"], e["t"]) for e in self.events if e["event"] == "final"]
+
+
+class AudioTimeline:
+    """When the audio up to each point of the stream was sent"""
+
+    def __init__(self, bytes_per_ms):
+        self.bytes_per_ms = bytes_per_ms
+        self.points = []  # (stream ms at the end of a frame, sent at)
+        self.sent = 0
+
+    def add(self, size, at):
+        self.sent += size
+        self.points.append((self.sent / self.bytes_per_ms, at))
+
+    def sent_at(self, end_ms):
+        for stream_ms, at in self.points:
+            if stream_ms >= end_ms:
+                return at
+        return None
+
+
+def final_of(data):
+    """(text, end_ms) of a final transcript message from the relay, else None"""
+    if data.get("type") == "Turn" and data.get("turn_is_formatted"):
+        words = data.get("words") or []
+        return data.get("transcript", ""), words[-1]["end"] if words else None
+    if data.get("type") == "transcript" and data.get("is_final"):
+        end_ms = None
+        if "start" in data and "duration" in data:
+            end_ms = (data["start"] + data["duration"]) * 1000
+        return data.get("text", ""), end_ms
+    return None
+
+
+def latencies(finals, timeline):
+    """Seconds from sending the audio a final ends with to receiving it"""
+    values = []
+    for _, end_ms, received_at in finals:
+        if end_ms is None:
+            continue
+        sent = timeline.sent_at(end_ms)
+        if sent is not None:
+            values.append(received_at - sent)
+    return values
+
+
+async def replay(recording, url, speed, provider):
+    query = {
+        "sample_rate": recording.meta["sample_rate"],
+        "channels": recording.meta["channels"],
+        "interim": recording.meta.get("interim", "full"),
+        "interim_hz": recording.meta.get("interim_hz", 0),
+    }
+    bytes_per_ms = recording.bytes_per_ms or 1
+    timeline = AudioTimeline(bytes_per_ms)
+    finals, errors = [], []
+    async with websockets.connect(f"{url}/ws/{provider}?{urlencode(query)}", max_size=None) as ws:
+        status = json.loads(await ws.recv())
+        if status.get("type") == "error":
+            raise RuntimeError(status["message"])
+
+        async def receive():
+            async for message in ws:
+                data = json.loads(message)
+                if data.get("type") == "error":
+                    errors.append(data["message"])
+                final = final_of(data)
+                if final is not None:
+                    finals.append((*final, time.monotonic()))
+
+        receiving = asyncio.create_task(receive())
+        started = time.monotonic()
+        terminated = False
+        for t, payload in recording.frames():
+            if speed > 0:
+                await asyncio.sleep(max(0.0, started + t / speed - time.monotonic()))
+            await ws.send(payload)
+            if isinstance(payload, bytes):
+                timeline.add(len(payload), time.monotonic())
+            elif json.loads(payload).get("type") == "terminate":
+                terminated = True
+        if not terminated:
+            await ws.send(json.dumps({"type": "terminate"}))
+        await receiving
+    return finals, errors, timeline
+
+
+def recorded_latencies(recording):
+    timeline = AudioTimeline(recording.bytes_per_ms or 1)
+    for event in recording.events:
+        if event["event"] == "audio":
+            timeline.add(event["bytes"], event["t"])
+    return latencies(recording.finals(), timeline)
+
+
+def word_match(recorded, replayed) -> float:
+    """Share of the recorded final words the replay reproduced, in order"""
+    a = " ".join(text for text, *_ in recorded).split()
+    b = " ".join(text for text, *_ in replayed).split()
+    if not a:
+        return 1.0 if not b else 0.0
+    matched = sum(block.size for block in difflib.SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+    return matched / len(a)
+
+
+async def with_mock_relay(run):
+    """Run `run(url)` against a fresh relay and mock provider"""
+    import mock_provider
+    import relay_harness
+
+    mock_port = relay_harness.free_port()
+    relay_port = relay_harness.free_port()
+    mock = asyncio.create_task(mock_provider.serve("127.0.0.1", mock_port, mock_provider.MockConfig()))
+    env = dict(
+        os.environ,
+        ASSEMBLYAI_URL=f"ws://127.0.0.1:{mock_port}/v3/ws",
+        DEEPGRAM_URL=f"ws://127.0.0.1:{mock_port}/v1/listen",
+        CAPTURE_DIR="",
+    )
+    relay = subprocess.Popen(
+        relay_harness.relay_command(relay_port), env=env
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{relay_port}/stats").close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("relay did not start")
+                await asyncio.sleep(0.1)
+        return await run(f"ws://127.0.0.1:{relay_port}")
+    finally:
+        relay.terminate()
+        relay.wait()
+        mock.cancel()
+
+
+async def main_async(args):
+    recording = Recording(args.recording)
+    provider = args.provider or recording.meta["provider"]
+    recorded = recording.finals()
+    seconds = len(recording.audio) / recording.bytes_per_ms / 1000 if recording.bytes_per_ms else None
+    print(f"Recording {recording.meta['session']}: {recording.meta['provider']} via "
+          f"{recording.meta['endpoint']}, {recording.meta['sample_rate']} Hz x "
+          f"{recording.meta['channels']} {recording.encoding}"
+          + (f", {seconds:.1f} s of audio" if seconds else "")
+          + f", {len(recorded)} finals" + (" (truncated)" if recording.truncated else ""))
+
+    async def run(url):
+        return [await replay(recording, url, args.speed, provider) for _ in range(args.runs)]
+
+    results = await with_mock_relay(run) if args.mock else await run(args.url)
+
+    before = recorded_latencies(recording)
+    print(f"\n{'':<12} {'finals':>7} {'words':>6} {'final p50':>10} {'final p99':>10}")
+    print(f"{'recorded':<12} {len(recorded):>7} {'':>6} "
+          f"{percentile(before, 50)*1000:>8.0f}ms {percentile(before, 99)*1000:>8.0f}ms")
+    for run_number, (finals, errors, timeline) in enumerate(results, 1):
+        after = latencies(finals, timeline) if recording.bytes_per_ms else []
+        print(f"{f'replay {run_number}':<12} {len(finals):>7} {word_match(recorded, finals):>6.0%} "
+              f"{percentile(after, 50)*1000:>8.0f}ms {percentile(after, 99)*1000:>8.0f}ms")
+        for error in errors:
+            print(f"  error: {error}")
+    if args.verbose:
+        for (text, *_), (replayed, *_) in zip(recorded, results[-1][0]):
+            marker = " " if text == replayed else "*"
+            print(f"{marker} {text!r}\n  {replayed!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured session through the relay")
+    parser.add_argument("recording", help="Capture path without extension, e.g. captures/3f2a9c0b1d4e")
+    parser.add_argument("--url", default="ws://localhost:8000", help="Relay base URL")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiple of real time, 0 = as fast as possible")
+    parser.add_argument("--provider", help="Replay on another provider than the recorded one")
+    parser.add_argument("--mock", action="store_true", help="Start a relay against the mock provider")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Print recorded and replayed finals")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,63 @@
 """
 Local test script for ASR API
-Captures audio from microphone and sends to local API server
+Captures audio from microphone (or replays a WAV file / synthetic speech)
+and sends to local API server, reporting end-to-end latency per transcript
 """
 
+import argparse
 import asyncio
 import websockets
-import pyaudio
 import json
-import sys
-from datetime import datetime
+import math
+import signal
+import time
+from urllib.parse import urlencode
+
+from audio_sources import FRAMES_PER_BUFFER, SAMPLE_RATE, MicSource, SyntheticSource, WavSource
+from uplink_codecs import PCM16
 
 # Configuration
 API_URL_ASSEMBLYAI = "ws://localhost:8000/ws/assemblyai"
 API_URL_DEEPGRAM = "ws://localhost:8000/ws/deepgram"
 
-# Audio settings
-FRAMES_PER_BUFFER = 3200  # 0.2 seconds at 16kHz
-SAMPLE_RATE = 16000
-CHANNELS = 1
-FORMAT = pyaudio.paInt16
+
+def percentile(values, p):
+    """Nearest-rank percentile"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
 
 
 class ASRTester:
-    def __init__(self, provider="assemblyai"):
+    """Streams an audio source to the relay and times each transcript
+
+    Latency is measured from when the audio a transcript ends on was
+    captured (see audio_sources.py) to when the transcript arrived.
+    """
+    
+    def __init__(self, provider="assemblyai", source=None, api_url=None):
         self.provider = provider
-        self.api_url = API_URL_ASSEMBLYAI if provider == "assemblyai" else API_URL_DEEPGRAM
-        self.audio = None
-        self.stream = None
+        self.source = source or MicSource()
+        self.api_url = api_url or self.default_url()
         self.websocket = None
         self.running = False
+        # Capture and send time of every frame sent
+        self.captured_at = []
+        self.sent_at = []
+        self.first_interim = []
+        self.final = []
+        self.seen_interim = set()
+        self.finals_received = 0
+        self.errors = 0
+    
+    def default_url(self):
+        url = API_URL_ASSEMBLYAI if self.provider == "assemblyai" else API_URL_DEEPGRAM
+        if (self.source.sample_rate, self.source.channels) != (SAMPLE_RATE, 1):
+            url += "?" + urlencode({"sample_rate": self.source.sample_rate,
+                                    "channels": self.source.channels})
+        return url
         
     async def connect(self):
         """Connect to the API server"""
@@ -41,15 +70,65 @@ class ASRTester:
             return False
     
     async def send_audio(self):
-        """Send audio data to API"""
+        """Send frames as the source captures them, then end the session"""
         try:
-            while self.running:
-                audio_data = self.stream.read(FRAMES_PER_BUFFER, exception_on_overflow=False)
-                await self.websocket.send(audio_data)
-                await asyncio.sleep(0.01)  # Small delay to prevent overwhelming
+            if self.source.encoding != PCM16:
+                await self.websocket.send(json.dumps({"type": "config", "encoding": self.source.encoding}))
+            async for frame, captured_at in self.source.frames():
+                await self.websocket.send(frame)
+                self.captured_at.append(captured_at)
+                self.sent_at.append(time.monotonic())
+            # Let the provider finalize the last utterance and close
+            await self.websocket.send(json.dumps({"type": "terminate"}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
         except Exception as e:
             print(f"Audio sending error: {e}")
     
+    def audio_captured_at(self, end_ms):
+        """When the audio ending at `end_ms` of the stream was captured"""
+        if end_ms is None or not self.captured_at:
+            return None
+        frame_ms = self.source.frame_seconds * 1000
+        index = min(len(self.captured_at) - 1, max(0, math.ceil(end_ms / frame_ms) - 1))
+        return self.captured_at[index]
+    
+    def record_latency(self, data):
+        """End-to-end latency of a transcript message, None for other messages"""
+        now = time.monotonic()
+        msg_type = data.get("type")
+        
+        if msg_type == "Turn":
+            words = data.get("words") or []
+            end_ms = words[-1]["end"] if words else None
+            key = data.get("turn_order")
+            is_interim = not data.get("end_of_turn")
+            is_final = data.get("turn_is_formatted")
+        elif msg_type == "transcript":
+            end_ms = None
+            if "start" in data and "duration" in data:
+                end_ms = (data["start"] + data["duration"]) * 1000
+            key = self.finals_received
+            is_final = data.get("is_final")
+            is_interim = not is_final
+            if is_final:
+                self.finals_received += 1
+        else:
+            if msg_type == "error":
+                self.errors += 1
+            return None
+        
+        captured = self.audio_captured_at(end_ms)
+        if captured is None:
+            return None
+        latency = now - captured
+        if is_interim and key not in self.seen_interim:
+            self.seen_interim.add(key)
+            self.first_interim.append(latency)
+        elif is_final:
+            self.final.append(latency)
+        return latency
+    
     async def receive_transcripts(self):
         """Receive and display transcripts from API"""
         try:
@@ -64,6 +143,8 @@ class ASRTester:
     def handle_response(self, data):
         """Handle different response types"""
         msg_type = data.get('type', '')
+        latency = self.record_latency(data)
+        took = f"  ({latency*1000:.0f} ms)" if latency is not None else ""
         
         if msg_type == 'status':
             print(f"Status: {data.get('message')}")
@@ -78,7 +159,7 @@ class ASRTester:
             is_formatted = data.get('turn_is_formatted', False)
             
             if is_formatted:
-                print(f"\n[FINAL] {transcript}")
+                print(f"\n[FINAL] {transcript}{took}")
             else:
                 print(f"\r[INTERIM] {transcript}", end='', flush=True)
         
@@ -88,7 +169,7 @@ class ASRTester:
             is_final = data.get('is_final', False)
             
             if is_final:
-                print(f"\n[FINAL] {text}")
+                print(f"\n[FINAL] {text}{took}")
             else:
                 print(f"\r[INTERIM] {text}", end='', flush=True)
         
@@ -100,38 +181,32 @@ class ASRTester:
             print(f"\n✗ Error: {data.get('message')}")
     
     def start_audio_stream(self):
-        """Initialize and start audio stream"""
+        """Start the audio source"""
         try:
-            self.audio = pyaudio.PyAudio()
-            self.stream = self.audio.open(
-                input=True,
-                frames_per_buffer=FRAMES_PER_BUFFER,
-                channels=CHANNELS,
-                format=FORMAT,
-                rate=SAMPLE_RATE,
-            )
-            print("✓ Microphone stream started")
+            self.source.open()
+            print("✓ Audio source started")
             return True
         except Exception as e:
-            print(f"✗ Failed to open microphone: {e}")
+            print(f"✗ Failed to open audio source: {e}")
             return False
     
     def stop_audio_stream(self):
-        """Stop and cleanup audio stream"""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-        if self.audio:
-            self.audio.terminate()
-        print("✓ Audio stream stopped")
+        """Stop the audio source; the session ends once its frames are sent"""
+        self.running = False
+        self.source.stop()
     
-    async def terminate_session(self):
-        """Send termination message to server"""
-        try:
-            await self.websocket.send(json.dumps({"type": "terminate"}))
-            await asyncio.sleep(1)  # Wait for final responses
-        except Exception as e:
-            print(f"Termination error: {e}")
+    def report(self):
+        """Latency percentiles for the session"""
+        print(f"\nEnd-to-end latency ({len(self.sent_at)} frames sent):")
+        send_delay = [sent - captured for captured, sent in zip(self.captured_at, self.sent_at)]
+        for label, values in (("first interim", self.first_interim),
+                              ("final", self.final),
+                              ("capture->send", send_delay)):
+            print(
+                f"  {label:<14} n={len(values):<5} "
+                f"p50={percentile(values, 50)*1000:7.1f}ms "
+                f"p95={percentile(values, 95)*1000:7.1f}ms"
+            )
     
     async def run(self):
         """Main test loop"""
@@ -139,7 +214,7 @@ class ASRTester:
         print(f"ASR API Test - Provider: {self.provider.upper()}")
         print(f"{'='*60}\n")
         
-        # Start audio stream
+        # Start audio source
         if not self.start_audio_stream():
             return
         
@@ -148,34 +223,42 @@ class ASRTester:
             self.stop_audio_stream()
             return
         
+        # The first Ctrl+C stops capture and waits for the last finals; a
+        # second one exits right away
+        loop = asyncio.get_running_loop()
+        
+        def on_interrupt():
+            print("\n\n⏹ Stopping recording...")
+            loop.remove_signal_handler(signal.SIGINT)
+            self.stop_audio_stream()
+        
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
         print("\n🎤 Recording started. Press Ctrl+C to stop.\n")
         self.running = True
         
         try:
-            # Run audio sending and transcript receiving concurrently
+            # Capture runs off the event loop, so receiving is never stalled
             await asyncio.gather(
                 self.send_audio(),
                 self.receive_transcripts()
             )
-        except KeyboardInterrupt:
-            print("\n\n⏹ Stopping recording...")
-            self.running = False
-            await self.terminate_session()
         finally:
+            loop.remove_signal_handler(signal.SIGINT)
             if self.websocket:
                 await self.websocket.close()
             self.stop_audio_stream()
+            self.report()
             print("\n✓ Test completed")
 
 
-async def test_both_providers():
+async def test_both_providers(make_source):
     """Test both providers sequentially"""
     print("\n" + "="*60)
     print("TESTING BOTH ASR PROVIDERS")
     print("="*60)
     
     for provider in ["assemblyai", "deepgram"]:
-        tester = ASRTester(provider)
+        tester = ASRTester(provider, make_source())
         print(f"\n\n--- Testing {provider.upper()} ---")
         await tester.run()
         print("\nWaiting 2 seconds before next test...")
@@ -184,24 +267,32 @@ async def test_both_providers():
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="ASR API local tester")
+    parser.add_argument("provider", nargs="?", default="assemblyai",
+                        choices=["assemblyai", "deepgram", "both"])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--wav", help="Replay a PCM16 WAV file in real time instead of the microphone")
+    source.add_argument("--synthetic", type=float, metavar="SECONDS",
+                        help="Send synthetic speech instead of the microphone")
+    parser.add_argument("--frames-per-buffer", type=int, default=FRAMES_PER_BUFFER)
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print("ASR API LOCAL TESTER")
     print("="*60)
     
-    if len(sys.argv) > 1:
-        provider = sys.argv[1].lower()
-        if provider not in ["assemblyai", "deepgram", "both"]:
-            print("\nUsage: python test_asr.py [assemblyai|deepgram|both]")
-            print("Default: assemblyai")
-            return
-    else:
-        provider = "assemblyai"
+    def make_source():
+        if args.wav:
+            return WavSource(args.wav, args.frames_per_buffer)
+        if args.synthetic:
+            return SyntheticSource(args.synthetic, args.frames_per_buffer)
+        return MicSource(frames_per_buffer=args.frames_per_buffer)
     
     try:
-        if provider == "both":
-            asyncio.run(test_both_providers())
+        if args.provider == "both":
+            asyncio.run(test_both_providers(make_source))
         else:
-            tester = ASRTester(provider)
+            tester = ASRTester(args.provider, make_source())
             asyncio.run(tester.run())
     except Exception as e:
         print(f"\n✗ Fatal error: {e}")
@@ -210,4 +301,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,192 @@
+"""
+Durable transcript log
+Finals are appended to a SQLite database with a full-text index (FTS5),
+updated by a trigger in the same transaction as each insert. Live sessions
+only append to an in-memory batch; a writer task commits the batch on a
+dedicated thread every `flush_interval` seconds, or sooner once `batch_rows`
+are waiting, so one fsync covers every final of that interval and the event
+loop never waits on the disk.
+"""
+
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    start_ms REAL,
+    end_ms REAL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS utterances_session ON utterances (session, start_ms);
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5 (
+    text, content='utterances', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_index AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+INSERT = ("INSERT INTO utterances (session, provider, start_ms, end_ms, text, created_at) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+
+SEARCH = """
+SELECT u.session, u.provider, u.start_ms, u.end_ms, u.text, u.created_at
+FROM utterances_fts JOIN utterances u ON u.id = utterances_fts.rowid
+WHERE utterances_fts MATCH ? {where}
+ORDER BY rank LIMIT ?
+"""
+
+
+class TranscriptStore:
+    """Append-only utterance log with batched, group-committed writes
+
+    `append` never blocks and never touches the database. Up to
+    `max_pending` rows wait for the writer; past that new rows are dropped
+    and counted rather than letting memory grow while the disk is stalled.
+    Commit times are recorded into `commit_histogram` if given.
+    """
+
+    def __init__(self, path, flush_interval=0.2, batch_rows=256, max_pending=100_000,
+                 commit_histogram=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self.max_pending = max_pending
+        self.commit_histogram = commit_histogram
+        self.pending = []
+        self.wake = asyncio.Event()
+        self.closing = False
+        self.task = None
+        # One thread owns the write connection, so commits never overlap
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcripts")
+        self.db = None
+
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.commit_seconds_total = 0.0
+        self.commit_seconds_max = 0.0
+
+    async def start(self):
+        """Open the database and start the writer (call from a running loop)"""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.open)
+        self.task = asyncio.create_task(self.write_batches())
+
+    def open(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL: readers (search) never block the writer. NORMAL syncs the WAL
+        # at checkpoints only; a power cut may lose the last batches, never
+        # corrupt the log.
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA busy_timeout=5000")  # other workers share the file
+        self.db.executescript(SCHEMA)
+
+    def append(self, session: str, provider: str, result: dict):
+        """Queue a normalized final for the log"""
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append((session, provider, result["start_ms"], result["end_ms"],
+                             result["text"], time.time()))
+        self.appended += 1
+        if len(self.pending) >= self.batch_rows:
+            self.wake.set()
+
+    def commit(self, rows):
+        with self.db:
+            self.db.executemany(INSERT, rows)
+
+    async def write_batches(self):
+        loop = asyncio.get_running_loop()
+        while not (self.closing and not self.pending):
+            if len(self.pending) < self.batch_rows and not self.closing:
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if not self.pending:
+                continue
+            rows, self.pending = self.pending, []
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(self.executor, self.commit, rows)
+            except sqlite3.Error as e:
+                self.failed += len(rows)
+                print(f"Transcript log write failed, {len(rows)} finals lost: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            self.written += len(rows)
+            self.batches += 1
+            self.commit_seconds_total += elapsed
+            self.commit_seconds_max = max(self.commit_seconds_max, elapsed)
+            if self.commit_histogram:
+                self.commit_histogram.observe(elapsed)
+
+    async def close(self):
+        """Write what is still pending, then close the database"""
+        if self.task:
+            self.closing = True
+            self.wake.set()
+            await self.task
+            self.task = None
+        if self.db:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.db.close)
+            self.db = None
+        self.executor.shutdown()
+
+    def query(self, match, session, limit) -> list:
+        # A connection per query: WAL lets it read while the writer commits
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            params = [match]
+            where = ""
+            if session:
+                where = "AND u.session = ?"
+                params.append(session)
+            rows = db.execute(SEARCH.format(where=where), params + [limit]).fetchall()
+        finally:
+            db.close()
+        return [
+            {
+                "session": session,
+                "provider": provider,
+                "start": start_ms / 1000,
+                "duration": (end_ms - start_ms) / 1000,
+                "text": text,
+                "time": created_at,
+            }
+            for session, provider, start_ms, end_ms, text, created_at in rows
+        ]
+
+    async def search(self, match: str, session: str = None, limit: int = 20) -> list:
+        """Utterances matching an FTS5 query, best first
+
+        Raises ValueError for a malformed query.
+        """
+        try:
+            return await asyncio.to_thread(self.query, match, session, limit)
+        except sqlite3.OperationalError as e:
+            raise ValueError(str(e))
+
+    def stats(self) -> dict:
+        return {
+            "appended": self.appended,
+            "written": self.written,
+            "pending": len(self.pending),
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "rows_per_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "commit_avg_ms": round(self.commit_seconds_total / self.batches * 1000, 2) if self.batches else 0.0,
+            "commit_max_ms": round(self.commit_seconds_max * 1000, 2),
+        }
@@ -0,0 +1,262 @@
+"""
+Compressed uplink encodings
+Clients on slow links can send G.711 mu-law (8 bits per sample) or IMA ADPCM
+(4 bits per sample) instead of PCM16 by declaring it in a JSON handshake
+before the first audio frame:
+
+    {"type": "config", "encoding": "mulaw"}
+
+The relay decodes to PCM16 with NumPy into buffers reused across frames and
+forwards PCM16 upstream as before. The encoders here are for test clients
+and benchmarks; browsers do the same in JavaScript (see /test).
+"""
+
+import numpy as np
+
+PCM16 = "pcm16"
+MULAW = "mulaw"
+IMA_ADPCM = "ima_adpcm"
+
+# Bits per sample on the wire
+BITS = {PCM16: 16, MULAW: 8, IMA_ADPCM: 4}
+
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+
+def mulaw_table() -> np.ndarray:
+    """PCM16 value of every mu-law byte"""
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+    return np.where(u & 0x80, -magnitude, magnitude).astype("<i2")
+
+
+def mulaw_encode(pcm: bytes) -> bytes:
+    x = np.frombuffer(pcm, dtype="<i2").astype(np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    x = np.minimum(np.abs(x), MULAW_CLIP) + MULAW_BIAS
+    exponent = np.clip(np.floor(np.log2(x)).astype(np.int32) - 7, 0, 7)
+    mantissa = (x >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+class MuLawDecoder:
+    """G.711 mu-law to PCM16 by table lookup"""
+
+    ENCODING = MULAW
+    TABLE = mulaw_table()
+
+    def __init__(self, channels=1):
+        self.out = np.empty(0, dtype="<i2")
+
+    def decode(self, data) -> memoryview:
+        """PCM16 bytes for `data`; valid until the next call"""
+        codes = np.frombuffer(data, dtype=np.uint8)
+        if len(codes) > len(self.out):
+            self.out = np.empty(len(codes), dtype="<i2")
+        out = self.out[:len(codes)]
+        np.take(self.TABLE, codes, out=out)
+        return memoryview(out).cast("B")
+
+
+IMA_INDEX_ADJUST = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int64)
+IMA_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+], dtype=np.int64)
+
+
+def ima_encode(pcm: bytes, channels=1, state=None) -> tuple:
+    """IMA ADPCM nibbles for interleaved PCM16, low nibble first
+
+    Returns (bytes, state); pass `state` back in to continue the stream.
+    Plain Python, one sample at a time: meant for test clients.
+    """
+    samples = np.frombuffer(pcm, dtype="<i2").tolist()
+    state = state or [(0, 0)] * channels
+    predictors = [p for p, _ in state]
+    indexes = [i for _, i in state]
+    nibbles = []
+    steps = IMA_STEPS.tolist()
+    for n, sample in enumerate(samples):
+        c = n % channels
+        predictor, index = predictors[c], indexes[c]
+        step = steps[index]
+        diff = sample - predictor
+        nibble = 0
+        if diff < 0:
+            nibble = 8
+            diff = -diff
+        delta = step >> 3
+        if diff >= step:
+            nibble |= 4
+            diff -= step
+            delta += step
+        if diff >= step >> 1:
+            nibble |= 2
+            diff -= step >> 1
+            delta += step >> 1
+        if diff >= step >> 2:
+            nibble |= 1
+            delta += step >> 2
+        predictor = predictor - delta if nibble & 8 else predictor + delta
+        predictors[c] = max(-32768, min(32767, predictor))
+        indexes[c] = max(0, min(88, index + int(IMA_INDEX_ADJUST[nibble])))
+        nibbles.append(nibble)
+    if len(nibbles) % 2:
+        nibbles.append(0)
+    packed = np.array(nibbles, dtype=np.uint8)
+    return (packed[0::2] | (packed[1::2] << 4)).tobytes(), list(zip(predictors, indexes))
+
+
+class ImaAdpcmDecoder:
+    """Streaming IMA ADPCM to PCM16, one predictor/step index per channel
+
+    The decoder is a running sum that saturates at each step, which does
+    not vectorize directly. The step index walk saturates at 0 all the
+    time (silence), so the lower bound is applied in closed form (Lindley
+    recursion: the walk plus the deepest dip below the bound so far); the
+    upper bound is rare and is handled by restarting the sum where it is
+    first crossed. Input that clamps on most samples (noise, or a client
+    whose encoder state drifted) would restart constantly, so after
+    MAX_RESTARTS the rest of the frame is decoded one sample at a time. The
+    result matches the sample-by-sample decoder exactly.
+    """
+
+    ENCODING = IMA_ADPCM
+    MAX_RESTARTS = 4
+
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.predictors = [0] * channels
+        self.indexes = [0] * channels
+        self.carry = np.empty(0, dtype=np.uint8)  # nibbles of an incomplete frame
+        self.size = 0
+        self.reserve(4096)
+
+    def reserve(self, n):
+        if n <= self.size:
+            return
+        self.size = n
+        self.nibbles = np.empty(n, dtype=np.uint8)
+        self.out = np.empty(n, dtype="<i2")
+        # Per-channel work buffers
+        self.adjust = np.empty(n, dtype=np.int64)
+        self.walk = np.empty(n, dtype=np.int64)
+        self.lift = np.empty(n, dtype=np.int64)
+        self.steps = np.empty(n, dtype=np.int64)
+        self.delta = np.empty(n, dtype=np.int64)
+        self.part = np.empty(n, dtype=np.int64)
+        self.bits = np.empty(n, dtype=np.uint8)
+
+    def saturating_sum(self, start, deltas, lo, hi, out):
+        """out[k] = clamp(out[k-1] + deltas[k], lo, hi), out[-1] = start"""
+        n = len(deltas)
+        pos = 0
+        for _ in range(self.MAX_RESTARTS):
+            if pos >= n:
+                return
+            y = self.walk[pos:n]
+            lift = self.lift[pos:n]
+            np.cumsum(deltas[pos:], out=y)
+            y += start
+            # Lower bound in closed form
+            np.minimum.accumulate(y, out=lift)
+            np.subtract(lo, lift, out=lift)
+            np.maximum(lift, 0, out=lift)
+            y += lift
+            over = np.flatnonzero(y > hi)
+            if not over.size:
+                out[pos:n] = y
+                return
+            first = over[0]
+            out[pos:pos + first] = y[:first]
+            out[pos + first] = hi
+            start = hi
+            pos += first + 1
+        value = start
+        rest = deltas[pos:].tolist()
+        for k, delta in enumerate(rest):
+            value = min(hi, max(lo, value + delta))
+            rest[k] = value
+        out[pos:n] = rest
+
+    def decode_channel(self, c, nibbles, out):
+        n = len(nibbles)
+        adjust = self.adjust[:n]
+        steps = self.steps[:n]
+        delta = self.delta[:n]
+        part = self.part[:n]
+        bits = self.bits[:n]
+
+        # Step index in effect for each sample: the walk before it
+        np.take(IMA_INDEX_ADJUST, nibbles, out=adjust)
+        index = self.steps[:n]  # reused: steps are looked up from it below
+        index[0] = self.indexes[c]
+        if n > 1:
+            self.saturating_sum(self.indexes[c], adjust[:n - 1], 0, 88, index[1:])
+        last_index = min(88, max(0, int(index[-1]) + int(IMA_INDEX_ADJUST[nibbles[-1]])))
+        np.take(IMA_STEPS, index, out=steps)
+
+        # delta = step/8 + step*b2 + step/2*b1 + step/4*b0, negated by b3
+        np.right_shift(steps, 3, out=delta)
+        np.bitwise_and(nibbles, 4, out=bits)
+        np.multiply(steps, bits != 0, out=part)
+        delta += part
+        np.right_shift(steps, 1, out=part)
+        np.bitwise_and(nibbles, 2, out=bits)
+        part *= bits != 0
+        delta += part
+        np.right_shift(steps, 2, out=part)
+        np.bitwise_and(nibbles, 1, out=bits)
+        part *= bits
+        delta += part
+        np.bitwise_and(nibbles, 8, out=bits)
+        np.negative(delta, out=delta, where=bits != 0)
+
+        self.saturating_sum(self.predictors[c], delta, -32768, 32767, part)
+        out[:] = part
+        self.predictors[c] = int(part[-1])
+        self.indexes[c] = last_index
+
+    def decode(self, data) -> memoryview:
+        """PCM16 bytes for `data`; valid until the next call"""
+        codes = np.frombuffer(data, dtype=np.uint8)
+        total = len(self.carry) + 2 * len(codes)
+        self.reserve(total)
+        nibbles = self.nibbles[:total]
+        start = len(self.carry)
+        nibbles[:start] = self.carry
+        np.bitwise_and(codes, 0x0F, out=nibbles[start::2])
+        np.right_shift(codes, 4, out=nibbles[start + 1::2])
+
+        frames = total // self.channels
+        used = frames * self.channels
+        self.carry = nibbles[used:].copy()
+        out = self.out[:used]
+        if frames:
+            for c in range(self.channels):
+                self.decode_channel(c, nibbles[c:used:self.channels], out[c::self.channels])
+        return memoryview(out).cast("B")
+
+
+DECODERS = {
+    MULAW: MuLawDecoder,
+    IMA_ADPCM: ImaAdpcmDecoder,
+}
+
+
+def make_decoder(encoding: str, channels=1):
+    """Decoder for a client's declared encoding, None for plain PCM16"""
+    if encoding == PCM16:
+        return None
+    if encoding not in DECODERS:
+        raise ValueError(f"unsupported encoding {encoding!r}, expected one of {sorted(BITS)}")
+    return DECODERS[encoding](channels)
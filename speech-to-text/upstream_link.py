@@ -0,0 +1,220 @@
+"""
+Upstream sessions that survive provider disconnects
+Audio sent upstream is kept in a fixed-size ring buffer. When the provider
+socket drops, UpstreamLink reconnects (from the warm pool when possible),
+replays the audio that has not been finalized yet and hides the seam from
+the client: timestamps are rebased onto the session clock and results for
+audio that was already finalized are dropped.
+"""
+
+import asyncio
+import time
+
+import websockets
+
+
+class AudioRingBuffer:
+    """Last `capacity` bytes of a byte stream in a preallocated buffer
+
+    Offsets are absolute positions in the stream, so callers can ask for
+    "everything since offset N" without tracking wrap-around themselves.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        """Oldest offset still held"""
+        return max(0, self.end - self.capacity)
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        size = len(data)
+        if size >= self.capacity:
+            data = data[size - self.capacity:]
+            self.end += size - self.capacity
+            size = self.capacity
+        pos = self.end % self.capacity
+        first = min(size, self.capacity - pos)
+        self.view[pos:pos + first] = data[:first]
+        if size > first:
+            self.view[:size - first] = data[first:]
+        self.end += size
+
+    def read(self, offset: int, chunk: int):
+        """The bytes from `offset` to the end in packets of `chunk` bytes
+
+        A tail shorter than `chunk` goes out with the packet before it, so
+        no packet is shorter than the provider accepts (unless there is
+        less than one in all). Packets are views, or copies when they wrap.
+        """
+        offset = max(offset, self.start)
+        while offset < self.end:
+            size = self.end - offset
+            if size >= 2 * chunk:
+                size = chunk
+            pos = offset % self.capacity
+            if pos + size <= self.capacity:
+                yield self.view[pos:pos + size]
+            else:
+                yield bytes(self.view[pos:]) + self.view[:pos + size - self.capacity]
+            offset += size
+
+
+class UpstreamLink:
+    """One logical provider session, possibly spanning several sockets"""
+
+    def __init__(self, provider, pool, replay_seconds=5.0, max_attempts=3):
+        self.provider = provider
+        self.pool = pool
+        self.max_attempts = max_attempts
+        self.bytes_per_ms = provider.sample_rate * 2 / 1000
+        self.packet_bytes = int(provider.packet_ms * self.bytes_per_ms)
+        self.ring = AudioRingBuffer(int(replay_seconds * 1000 * self.bytes_per_ms))
+        self.ws = None
+        self.generation = 0
+        self.ready = asyncio.Event()
+        self.terminated = False
+        self.on_message = None  # called with every provider message, e.g. to record it
+
+        self.base = 0         # stream offset where the current socket's audio starts
+        self.lead = 0         # keepalive silence the current socket got before it (pool)
+        self.acked = 0        # stream offset covered by finals
+        self.finals = 0       # finals received over the whole session
+        self.finals_base = 0  # finals received before the current socket
+
+        self.reconnects = 0
+        self.reconnect_seconds_total = 0.0
+        self.reconnect_seconds_max = 0.0
+        self.replayed_bytes = 0
+
+    async def open(self):
+        conn = await self.pool.acquire_connection()
+        self.ws = conn.ws
+        self.lead = conn.silence
+        self.ready.set()
+
+    async def close(self):
+        if self.ws:
+            await self.ws.close()
+
+    async def send(self, payload):
+        """Send audio or a control message on the current socket"""
+        await self.ready.wait()
+        generation = self.generation
+        if isinstance(payload, str):
+            if payload == self.provider.terminate_message:
+                self.terminated = True
+        else:
+            # Recorded before sending: if the send fails it is replayed
+            self.ring.write(payload)
+        try:
+            await self.ws.send(payload)
+        except Exception:
+            # The reader notices the dead socket and reconnects; anything
+            # sent from here on waits for it
+            if generation == self.generation:
+                self.ready.clear()
+
+    async def reconnect(self, error):
+        """Replace the socket and replay the unfinalized tail of the audio"""
+        self.ready.clear()
+        self.generation += 1
+        started = time.perf_counter()
+        old_ws = self.ws
+        asyncio.create_task(old_ws.close())
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+            ws = None
+            try:
+                conn = await self.pool.acquire_connection()
+                ws = conn.ws
+                # From a packet boundary: finals end anywhere, but the
+                # replay must start on a sample and send whole packets
+                start = max(self.acked, self.ring.start)
+                start -= start % self.packet_bytes
+                if start < self.ring.start:
+                    start += self.packet_bytes
+                replayed = 0
+                for chunk in self.ring.read(start, self.packet_bytes):
+                    await ws.send(chunk)
+                    replayed += len(chunk)
+                if self.terminated:
+                    await ws.send(self.provider.terminate_message)
+            except Exception as e:
+                # A socket that failed during replay still holds a provider session
+                if ws is not None:
+                    asyncio.create_task(ws.close())
+                error = e
+                continue
+            self.ws = ws
+            self.base = start
+            self.lead = conn.silence
+            self.finals_base = self.finals
+            self.replayed_bytes += replayed
+            elapsed = time.perf_counter() - started
+            self.reconnects += 1
+            self.reconnect_seconds_total += elapsed
+            self.reconnect_seconds_max = max(self.reconnect_seconds_max, elapsed)
+            print(f"{self.provider.label} reconnected in {elapsed*1000:.0f} ms, "
+                  f"replayed {replayed} bytes")
+            self.ready.set()
+            return
+        raise error
+
+    def accept(self, payload):
+        """Rebase a result onto the session clock, or None if it is a duplicate"""
+        result = self.provider.normalize(payload)
+        if result is None:
+            if self.reconnects and payload.get("type") in self.provider.session_start_types:
+                return None
+            return payload
+        end = self.base + result["end_ms"] * self.bytes_per_ms - self.lead
+        if self.base and end <= self.acked:
+            return None
+        if result["is_final"]:
+            self.acked = max(self.acked, int(end))
+            self.finals += 1
+        if self.base or self.lead or self.finals_base:
+            offset_ms = (self.base - self.lead) / self.bytes_per_ms
+            payload = self.provider.rebase(payload, offset_ms, self.finals_base)
+        return payload
+
+    async def results(self):
+        """Translated (payload, kind, size, raw) results across reconnects
+
+        `raw` is the provider message text when the payload is that message
+        unchanged (passthrough providers, no rebasing), otherwise None.
+        """
+        while True:
+            try:
+                async for message in self.ws:
+                    if self.on_message:
+                        self.on_message(message)
+                    for payload, kind in self.provider.translate(message):
+                        accepted = self.accept(payload)
+                        if accepted is None:
+                            continue
+                        raw = message if self.provider.passthrough and accepted is payload else None
+                        yield accepted, kind, len(message), raw
+                if self.terminated:
+                    return
+                error = ConnectionError(f"{self.provider.label} closed the session")
+            except websockets.exceptions.ConnectionClosed as e:
+                error = e
+            await self.reconnect(error)
+
+    def stats(self) -> dict:
+        return {
+            "reconnects": self.reconnects,
+            "reconnect_avg_ms": (
+                self.reconnect_seconds_total / self.reconnects * 1000 if self.reconnects else 0.0
+            ),
+            "reconnect_max_ms": self.reconnect_seconds_max * 1000,
+            "replayed_bytes": self.replayed_bytes,
+        }
@@ -0,0 +1,190 @@
+"""
+Pre-warmed upstream connection pool
+Keeps idle, already-authenticated provider sessions ready so a client can be
+handed one without waiting for the TLS and WebSocket handshake.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class PooledConnection:
+    """An idle upstream socket, when it was opened and the silence it was sent
+
+    `silence` counts the bytes of audio keepalives: the provider's audio
+    clock has already advanced by them when a session gets the socket.
+    """
+
+    __slots__ = ("ws", "opened_at", "pinged_at", "silence")
+
+    def __init__(self, ws, opened_at):
+        self.ws = ws
+        self.opened_at = opened_at
+        self.pinged_at = opened_at
+        self.silence = 0
+
+
+class UpstreamPool:
+    """Pool of idle upstream sessions for one provider
+
+    `connect` is a zero-argument callable returning an awaitable websocket,
+    e.g. `lambda: websockets.connect(url, extra_headers=...)`. A background
+    task keeps `size` sessions idle, evicting ones that have been idle longer
+    than `max_idle` seconds, are older than `max_age` seconds or were closed
+    by the provider. With `size=0` the pool just opens a fresh connection per
+    acquire and records handshake metrics. Providers that drop silent
+    sessions get `keepalive` sent to idle ones every `keepalive_interval`.
+    Handshake times are also recorded into `handshake_histogram` if given.
+    """
+
+    def __init__(self, name, connect, size=0, max_idle=15.0, max_age=300.0,
+                 refill_interval=1.0, keepalive=None, keepalive_interval=5.0,
+                 handshake_histogram=None):
+        self.name = name
+        self.connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.refill_interval = refill_interval
+        self.keepalive = keepalive
+        self.keepalive_interval = keepalive_interval
+        self.handshake_histogram = handshake_histogram
+        self.idle = deque()
+        self.pending = 0
+        self.wake = asyncio.Event()
+        self.task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.handshakes = 0
+        self.handshake_failures = 0
+        self.handshake_seconds_total = 0.0
+        self.handshake_seconds_max = 0.0
+        self.evicted = 0
+
+    def start(self):
+        """Start refilling in the background (call from a running loop)"""
+        if self.size > 0 and self.task is None:
+            self.task = asyncio.create_task(self.maintain())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        while self.idle:
+            await self.idle.popleft().ws.close()
+
+    async def handshake(self):
+        """Open a new upstream session, timing the handshake"""
+        started = time.perf_counter()
+        try:
+            ws = await self.connect()
+        except Exception:
+            self.handshake_failures += 1
+            raise
+        elapsed = time.perf_counter() - started
+        self.handshakes += 1
+        self.handshake_seconds_total += elapsed
+        self.handshake_seconds_max = max(self.handshake_seconds_max, elapsed)
+        if self.handshake_histogram:
+            self.handshake_histogram.observe(elapsed)
+        return ws
+
+    def usable(self, conn: PooledConnection, now: float) -> bool:
+        return conn.ws.open and now - conn.opened_at < min(self.max_idle, self.max_age)
+
+    async def acquire(self):
+        """Return a connected upstream socket, from the pool when possible"""
+        return (await self.acquire_connection()).ws
+
+    async def acquire_connection(self) -> PooledConnection:
+        """Like acquire, with the keepalive silence the socket was sent"""
+        now = time.monotonic()
+        while self.idle:
+            conn = self.idle.popleft()
+            if self.usable(conn, now):
+                self.hits += 1
+                self.wake.set()
+                return conn
+            self.evicted += 1
+            asyncio.create_task(conn.ws.close())
+        self.misses += 1
+        self.wake.set()
+        return PooledConnection(await self.handshake(), time.monotonic())
+
+    def evict_stale(self):
+        now = time.monotonic()
+        keep = deque()
+        while self.idle:
+            conn = self.idle.popleft()
+            if self.usable(conn, now):
+                keep.append(conn)
+            else:
+                self.evicted += 1
+                asyncio.create_task(conn.ws.close())
+        self.idle = keep
+
+    async def ping_idle(self):
+        """Keep idle sessions from being closed by the provider"""
+        now = time.monotonic()
+        for conn in list(self.idle):
+            if now - conn.pinged_at >= self.keepalive_interval:
+                conn.pinged_at = now
+                try:
+                    await conn.ws.send(self.keepalive)
+                    if isinstance(self.keepalive, bytes):
+                        conn.silence += len(self.keepalive)
+                except Exception:
+                    pass  # Evicted as closed on the next pass
+
+    async def add_one(self):
+        self.pending += 1
+        try:
+            ws = await self.handshake()
+            self.idle.append(PooledConnection(ws, time.monotonic()))
+        finally:
+            self.pending -= 1
+
+    async def maintain(self):
+        """Evict stale sessions and top the pool back up to `size`"""
+        backoff = self.refill_interval
+        while True:
+            self.evict_stale()
+            if self.keepalive:
+                await self.ping_idle()
+            missing = self.size - len(self.idle) - self.pending
+            if missing > 0:
+                results = await asyncio.gather(
+                    *(self.add_one() for _ in range(missing)),
+                    return_exceptions=True,
+                )
+                failed = [r for r in results if isinstance(r, Exception)]
+                if failed:
+                    print(f"{self.name} pool refill failed: {failed[0]}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+                backoff = self.refill_interval
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        acquired = self.hits + self.misses
+        return {
+            "size": self.size,
+            "idle": len(self.idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquired if acquired else 0.0,
+            "handshakes": self.handshakes,
+            "handshake_failures": self.handshake_failures,
+            "handshake_avg_ms": (
+                self.handshake_seconds_total / self.handshakes * 1000 if self.handshakes else 0.0
+            ),
+            "handshake_max_ms": self.handshake_seconds_max * 1000,
+            "evicted": self.evicted,
+        }
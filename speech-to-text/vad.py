@@ -0,0 +1,97 @@
+"""
+Voice activity gate for inbound PCM16 audio
+A vectorized energy / zero-crossing detector that stops long stretches of
+silence from being sent upstream. A short pre-roll is replayed at speech
+onset so word beginnings are not clipped, and a hangover keeps trailing
+silence flowing long enough for providers to detect the end of a turn.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class VoiceActivityGate:
+    """Decides, chunk by chunk, which audio is worth forwarding
+
+    All timing is on the audio clock (samples received), so decisions do not
+    depend on how fast the client happens to deliver frames. While audio is
+    being suppressed `keepalive` (bytes or text, provider specific) is emitted
+    every `keepalive_ms` so the upstream session is not closed for inactivity.
+    """
+
+    def __init__(self, sample_rate=16000, window_ms=20, threshold=500.0,
+                 zcr_max=0.35, hangover_ms=1000, preroll_ms=300,
+                 keepalive=None, keepalive_ms=5000):
+        self.window = sample_rate * window_ms // 1000
+        self.threshold_sq = threshold * threshold
+        self.zcr_max = zcr_max
+        self.hangover = sample_rate * hangover_ms // 1000
+        self.preroll_bytes = sample_rate * preroll_ms // 1000 * 2
+        self.keepalive = keepalive
+        self.keepalive_samples = sample_rate * keepalive_ms // 1000
+
+        self.clock = 0
+        self.last_speech = None
+        self.last_forward = 0
+        self.preroll = deque()
+        self.preroll_size = 0
+
+        self.total_bytes = 0
+        self.suppressed_bytes = 0
+        self.keepalives = 0
+
+    def is_speech(self, chunk: bytes) -> bool:
+        """True when any window in the chunk looks like voiced audio"""
+        samples = np.frombuffer(chunk, dtype="<i2")
+        if samples.size == 0:
+            return False
+        window = min(self.window, samples.size)
+        count = samples.size // window
+        frames = samples[:count * window].reshape(count, window).astype(np.float32)
+        energy = np.einsum("ij,ij->i", frames, frames) / window
+        crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / window
+        # Loud windows count regardless of ZCR (fricatives); quieter ones must
+        # look voiced rather than like broadband noise
+        voiced = (energy > self.threshold_sq) & (crossings < self.zcr_max)
+        loud = energy > 9 * self.threshold_sq
+        return bool(np.any(voiced | loud))
+
+    def process(self, chunk: bytes) -> list:
+        """Return the payloads to forward for this chunk (possibly none)"""
+        samples = len(chunk) // 2
+        self.clock += samples
+        self.total_bytes += len(chunk)
+
+        if self.is_speech(chunk):
+            self.last_speech = self.clock
+        if self.last_speech is not None and self.clock - self.last_speech <= self.hangover:
+            out = list(self.preroll)
+            out.append(chunk)
+            self.preroll.clear()
+            self.preroll_size = 0
+            self.last_forward = self.clock
+            return out
+
+        # Silence: remember it as pre-roll for the next onset
+        self.preroll.append(chunk)
+        self.preroll_size += len(chunk)
+        while self.preroll_size - len(self.preroll[0]) >= self.preroll_bytes:
+            dropped = self.preroll.popleft()
+            self.preroll_size -= len(dropped)
+            self.suppressed_bytes += len(dropped)
+        if self.keepalive is not None and self.clock - self.last_forward >= self.keepalive_samples:
+            self.last_forward = self.clock
+            self.keepalives += 1
+            return [self.keepalive]
+        return []
+
+    def stats(self) -> dict:
+        # Pre-roll that is still held back has not been sent either
+        suppressed = self.suppressed_bytes + self.preroll_size
+        return {
+            "total_bytes": self.total_bytes,
+            "suppressed_bytes": suppressed,
+            "suppressed_pct": 100.0 * suppressed / self.total_bytes if self.total_bytes else 0.0,
+            "keepalives": self.keepalives,
+        }
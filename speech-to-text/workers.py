@@ -0,0 +1,196 @@
+"""
+Multi-process relay with graceful drain
+Runs several copies of the relay, each in its own process and bound to the
+same port with SO_REUSEPORT, so the kernel spreads new connections across
+cores. Sessions are long-lived, so restarts drain instead of cutting them:
+
+- SIGTERM / SIGINT: every worker stops accepting, lets live sessions finish
+  (up to DRAIN_TIMEOUT seconds, then ends them cleanly) and exits.
+- SIGHUP: rolling restart. A fresh worker starts listening before each old
+  one drains, so new sessions keep being accepted throughout.
+
+    WORKERS=4 python main.py
+    python workers.py --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))
+# How long a new worker gets to start listening during a rolling restart
+WORKER_STARTUP_SECONDS = 2.0
+
+
+def listen_socket(host: str, port: int) -> socket.socket:
+    """A listening socket other workers can bind too"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains sessions on the first SIGTERM/SIGINT
+
+    uvicorn's own shutdown closes open WebSockets right away; here the
+    listening socket is closed first and `drain()` decides when the live
+    sessions are done. A second signal exits immediately.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain):
+        super().__init__(config)
+        self.drain = drain
+        self.drain_requested = False
+        self.drain_task = None
+
+    def handle_exit(self, sig, frame):
+        if self.drain_requested:
+            super().handle_exit(sig, frame)
+        else:
+            self.drain_requested = True
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.drain_requested and self.drain_task is None:
+            self.drain_task = asyncio.create_task(self.drain_and_exit())
+        return await super().on_tick(counter)
+
+    async def drain_and_exit(self):
+        # With SO_REUSEPORT the kernel now routes new connections to the
+        # other workers
+        for server in self.servers:
+            server.close()
+        print(f"Worker {os.getpid()} draining")
+        await self.drain()
+        print(f"Worker {os.getpid()} drained")
+        self.should_exit = True
+
+
+def run_worker(app, drain, host: str, port: int):
+    """Serve `app` in this process until drained"""
+    server = DrainingServer(uvicorn.Config(app), drain)
+    server.run(sockets=[listen_socket(host, port)])
+
+
+class Supervisor:
+    """Keeps `workers` relay processes running and drains them on shutdown"""
+
+    def __init__(self, workers: int, host: str, port: int, drain_timeout=DRAIN_TIMEOUT):
+        self.count = workers
+        self.host = host
+        self.port = port
+        self.drain_timeout = drain_timeout
+        self.workers = []
+        self.retiring = []
+        self.stopping = False
+        self.restart_requested = False
+
+    def spawn(self) -> subprocess.Popen:
+        # Own session so a terminal Ctrl+C reaches only the supervisor, which
+        # then drains the workers exactly once
+        return subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__), "--worker",
+                "--host", self.host,
+                "--port", str(self.port),
+                "--drain-timeout", str(self.drain_timeout),
+            ],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            start_new_session=True,
+        )
+
+    def on_stop(self, sig, frame):
+        self.stopping = True
+
+    def on_restart(self, sig, frame):
+        self.restart_requested = True
+
+    def rolling_restart(self):
+        print(f"Rolling restart of {len(self.workers)} workers")
+        for i, old in enumerate(list(self.workers)):
+            self.workers[i] = self.spawn()
+            time.sleep(WORKER_STARTUP_SECONDS)
+            old.send_signal(signal.SIGTERM)
+            self.retiring.append(old)
+            if self.stopping:
+                return
+
+    def reap(self):
+        """Replace crashed workers and forget drained ones"""
+        self.retiring = [proc for proc in self.retiring if proc.poll() is None]
+        for i, proc in enumerate(self.workers):
+            if proc.poll() is not None and not self.stopping:
+                print(f"Worker {proc.pid} exited with {proc.returncode}, restarting")
+                self.workers[i] = self.spawn()
+
+    def run(self):
+        if self.count > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            raise SystemExit("Multiple workers need SO_REUSEPORT (Linux, BSD, macOS)")
+        signal.signal(signal.SIGTERM, self.on_stop)
+        signal.signal(signal.SIGINT, self.on_stop)
+        signal.signal(signal.SIGHUP, self.on_restart)
+        self.workers = [self.spawn() for _ in range(self.count)]
+        print(f"Supervisor {os.getpid()}: {self.count} workers on {self.host}:{self.port}")
+
+        while not self.stopping:
+            time.sleep(0.5)
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+            self.reap()
+
+        print("Draining workers")
+        procs = self.workers + self.retiring
+        for proc in procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        # Drain timeout, plus time for providers to finalize
+        deadline = time.monotonic() + self.drain_timeout + 15
+        for proc in procs:
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def serve(app, drain, host: str, port: int, workers: int = 1):
+    """Run the relay in this process, or supervise `workers` processes"""
+    if workers > 1:
+        Supervisor(workers, host, port).run()
+    else:
+        run_worker(app, drain, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process relay")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT,
+                        help="Seconds live sessions get to finish on shutdown")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        import main as relay
+        run_worker(
+            relay.app,
+            lambda: relay.drain_sessions(args.drain_timeout),
+            args.host,
+            args.port,
+        )
+    else:
+        Supervisor(args.workers, args.host, args.port, args.drain_timeout).run()
+
+
+if __name__ == "__main__":
+    main()